@@ -1,3 +1,10 @@
-from .main import setup_addon
+try:
+    from aqt import mw
+except ImportError:
+    mw = None
 
-setup_addon()
\ No newline at end of file
+# Chỉ đăng ký menu/hook khi chạy bên trong Anki (CLI không cần GUI)
+if mw is not None:
+    from .main import setup_addon
+    
+    setup_addon()
\ No newline at end of file
@@ -0,0 +1,255 @@
+import bisect
+from array import array
+from aqt import mw
+from aqt.operations import CollectionOp
+from aqt.utils import tooltip
+from anki.collection import Collection, OpChanges
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+from .batch import BatchJob, get_profiles
+from .config import QuizConfig, get_config
+from .generator import QuizGenerator, resolve_target_deck
+from .queries import QUIZ_TAG, ModelCache, filter_notes_in_deck
+from .quiz_index import get_index
+from .sampler import DistractorSampler
+from .writer import BulkNoteWriter
+
+AUTO_UNDO_LABEL = "Auto-create Quiz Cards"
+
+@dataclass
+class AutoGenerateResult:
+    """Kết quả một lô tự tạo quiz"""
+    notes: int = 0
+    created: int = 0
+    failed: int = 0
+    changes: OpChanges = field(default_factory=OpChanges)
+
+class AutoGenerator:
+    """Tự tạo quiz note cho note mới thêm vào các deck được theo dõi, gom theo lô"""
+    
+    def __init__(self):
+        # Note id lớn nhất đã xét; chỉ note thêm sau khi mở profile được tự tạo quiz
+        self.last_seen_id = 0
+        # Note có từ khi mở profile (sắp xếp theo id) và note đã xét sau đó: không phải note mới
+        self.known_ids = array("q")
+        self.seen_ids: Set[int] = set()
+        # mod lớn nhất đã xét và các note có đúng mod đó, để không xét lại note cũ
+        self.last_mod = 0
+        self.edge_ids: Set[int] = set()
+        # Chỉ theo dõi khi config có auto_generate_profile
+        self.tracking = False
+        # Job (theo nhãn) → note id mới đang chờ
+        self.queue: Dict[str, Set[int]] = {}
+        self.jobs: Dict[str, BatchJob] = {}
+        # Pool từ gây nhiễu đã dựng, chỉ thêm note mới vào giữa các lô
+        self.samplers: Dict[Hashable, DistractorSampler] = {}
+        self.timer_pending = False
+        self.running = False
+        
+    def reset(self, col: Optional[Collection] = None):
+        """Bắt đầu theo dõi từ note mới nhất hiện có"""
+        self.queue.clear()
+        self.samplers.clear()
+        self.tracking = False
+        if col is not None and self.watched_jobs(get_config()):
+            self.load_known(col)
+        
+    def load_known(self, col: Optional[Collection]):
+        """Ghi nhận mọi note hiện có là đã xét"""
+        self.known_ids = array("q", col.db.list("SELECT id FROM notes ORDER BY id")) if col else array("q")
+        self.seen_ids.clear()
+        self.last_seen_id = self.known_ids[-1] if self.known_ids else 0
+        self.last_mod = col.db.scalar("SELECT coalesce(max(mod), 0) FROM notes") if col else 0
+        self.edge_ids.clear()
+        self.tracking = col is not None
+        
+    def is_known(self, note_id: int) -> bool:
+        i = bisect.bisect_left(self.known_ids, note_id)
+        return (i < len(self.known_ids) and self.known_ids[i] == note_id) or note_id in self.seen_ids
+        
+    def watched_jobs(self, config: QuizConfig) -> List[BatchJob]:
+        if not config.auto_generate_profile:
+            return []
+        # Danh sách job được cache, đọc lại khi lưu/xóa profile; tên profile lấy từ config hiện tại
+        return get_profiles().get(config.auto_generate_profile, [])
+        
+    def scan(self, col: Collection):
+        """Tìm note mới từ lần xét trước và đưa vào hàng đợi của từng job"""
+        config = get_config()
+        jobs = self.watched_jobs(config)
+        if not jobs:
+            self.tracking = False
+            return
+        if not self.tracking:
+            # Vừa bật tự tạo quiz: chỉ note thêm từ bây giờ
+            self.load_known(col)
+            return
+        max_id = col.db.scalar("SELECT coalesce(max(id), 0) FROM notes")
+        # Note mới theo khoảng id (khóa chính), hoặc note chưa đồng bộ vừa thêm/sửa (chỉ mục usn):
+        # import .apkg giữ id cũ của note nên không nằm sau last_seen_id. Bỏ qua quiz note do addon tạo
+        rows = col.db.all("SELECT id, mid, mod FROM notes WHERE (id > ? OR (usn = -1 AND mod >= ?)) "
+                          "AND tags NOT LIKE ?", self.last_seen_id, self.last_mod, f"% {QUIZ_TAG} %")
+        self.last_seen_id = max(self.last_seen_id, max_id)
+        
+        new_rows: List[Tuple[int, int]] = []
+        edited = False
+        last_mod, edge_ids = self.last_mod, self.edge_ids
+        for nid, mid, mod in rows:
+            if mod == self.last_mod and nid in self.edge_ids:
+                # Đã xét ở lần trước, chưa sửa thêm
+                continue
+            if mod > last_mod:
+                last_mod, edge_ids = mod, set()
+            if mod == last_mod:
+                edge_ids.add(nid)
+            if self.is_known(nid):
+                edited = True
+            else:
+                self.seen_ids.add(nid)
+                new_rows.append((nid, mid))
+        self.last_mod, self.edge_ids = last_mod, edge_ids
+        if edited:
+            # Note nguồn bị sửa: dựng lại pool ở lô sau
+            self.samplers.clear()
+        if not new_rows:
+            return
+        rows = new_rows
+        
+        for job in jobs:
+            deck_id = col.decks.id_for_name(job.source_deck)
+            model_id = col.models.id_for_name(job.note_type)
+            if not deck_id or not model_id:
+                continue
+            note_ids = filter_notes_in_deck(col, [nid for nid, mid in rows if mid == model_id], deck_id)
+            if note_ids:
+                label = job.label()
+                self.jobs[label] = job
+                self.queue.setdefault(label, set()).update(note_ids)
+            
+        queued = sum(len(note_ids) for note_ids in self.queue.values())
+        if queued >= config.auto_generate_batch_size:
+            self.flush()
+        elif queued and not self.timer_pending:
+            self.timer_pending = True
+            mw.progress.single_shot(config.auto_generate_delay * 1000, self.on_timer)
+        
+    def on_timer(self):
+        self.timer_pending = False
+        self.flush()
+        
+    def flush(self):
+        """Tạo quiz cho các note đang chờ trong một thao tác nền"""
+        if not self.queue or mw.col is None:
+            return
+        if self.running:
+            # Lô trước chưa xong, chạy lại sau khi nó kết thúc
+            return
+        batches = [(self.jobs[label], sorted(note_ids)) for label, note_ids in self.queue.items()]
+        self.queue = {}
+        config = get_config()
+        self.running = True
+        
+        op = CollectionOp(parent=mw, op=lambda col: self.generate(col, batches, config))
+        op.success(self.on_finished)
+        op.failure(self.on_failed)
+        op.run_in_background()
+        
+    def generate(self, col: Collection, batches: List[Tuple[BatchJob, List[int]]],
+                 config: QuizConfig) -> AutoGenerateResult:
+        """Tạo quiz note cho từng job (chạy ngoài GUI thread), cả lô là một bước undo"""
+        result = AutoGenerateResult()
+        models = ModelCache(col)
+        writer = BulkNoteWriter(col, config.bulk_chunk_size, undo_label=AUTO_UNDO_LABEL)
+        
+        for job, note_ids in batches:
+            result.notes += len(note_ids)
+            try:
+                source_deck_id = col.decks.id_for_name(job.source_deck)
+                source_model_id = col.models.id_for_name(job.note_type)
+                target_model_id = (col.models.id_for_name(job.target_note_type)
+                                   if job.target_note_type else source_model_id)
+                if not source_deck_id or not source_model_id or not target_model_id:
+                    result.failed += len(note_ids)
+                    continue
+                    
+                generator = QuizGenerator(
+                    col,
+                    source_deck_id=source_deck_id,
+                    source_model_id=source_model_id,
+                    vocab_field=job.vocab_field,
+                    meaning_field=job.meaning_field,
+                    target_model_id=target_model_id,
+                    target_deck_id=resolve_target_deck(col, job.target_deck or config.default_quiz_deck_name),
+                    random_count=config.max_random_cards,
+                    skip_existing=config.skip_existing_cards,
+                    config=config,
+                    model_cache=models,
+                    writer=writer,
+                )
+                if not generator.ensure_quiz_field():
+                    result.failed += len(note_ids)
+                    continue
+                    
+                # Pool của deck nguồn được dựng ở lô đầu tiên, các lô sau chỉ đọc note mới
+                key = (col.path, job.label(), config.distractor_strategy, config.prevent_duplicates,
+                       config.normalize_rules)
+                prepared = generator.prepare_notes(note_ids, self.samplers.get(key))
+                self.samplers[key] = prepared.sampler
+                run = generator.run(prepared=prepared)
+                # Job sau không dựng lại chỉ mục quiz vì chữ ký đổi
+                get_index(col, generator.quiz_field_name).commit_changes()
+                result.created += run.created
+                result.failed += run.failed
+                
+            except Exception as e:
+                result.failed += len(note_ids)
+                print(f"Error auto-creating quiz cards for {job.label()}: {str(e)}")
+            
+        writer.finish()
+        result.changes = col.merge_undo_entries(writer.undo_entry)
+        return result
+        
+    def on_finished(self, result: AutoGenerateResult):
+        self.running = False
+        if result.created:
+            tooltip(f"Created {result.created} quiz cards for {result.notes} new notes")
+        self.reschedule()
+        
+    def on_failed(self, error: Exception):
+        self.running = False
+        print(f"Error auto-creating quiz cards: {str(error)}")
+        self.reschedule()
+        
+    def reschedule(self):
+        """Note được thêm trong lúc lô trước đang chạy: chờ lô tiếp theo"""
+        if self.queue and not self.timer_pending:
+            self.timer_pending = True
+            mw.progress.single_shot(get_config().auto_generate_delay * 1000, self.on_timer)
+
+_auto = AutoGenerator()
+
+def on_profile_did_open():
+    _auto.reset(mw.col)
+
+def on_profile_will_close():
+    _auto.reset()
+
+def on_operation_did_execute(changes: OpChanges, handler: Optional[object]):
+    """Hook: sau mỗi thao tác có thêm/sửa note (kể cả import), tìm note mới"""
+    if not changes.note or mw.col is None:
+        return
+    try:
+        _auto.scan(mw.col)
+    except Exception as e:
+        print(f"Error checking new notes for quiz cards: {str(e)}")
+
+def on_notes_will_be_deleted(col: Collection, note_ids):
+    # Note nguồn bị xóa: dựng lại pool ở lô sau
+    _auto.samplers.clear()
+
+def on_sync_did_finish():
+    # Note tải về từ máy khác không được tự tạo quiz; pool được dựng lại ở lô sau
+    if mw.col is not None:
+        _auto.samplers.clear()
+        if _auto.tracking:
+            _auto.load_known(mw.col)
\ No newline at end of file
@@ -0,0 +1,186 @@
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass, field, fields
+from anki.collection import Collection, OpChanges
+from typing import Any, Callable, Dict, List, Optional
+from .config import USER_FILES_DIR, QuizConfig
+from .generator import GenerationResult, QuizGenerator, resolve_target_deck
+from .queries import ModelCache
+from .quiz_index import get_index
+from .stats import RunStats
+from .writer import BulkNoteWriter
+
+# File lưu các danh sách job đã đặt tên
+PROFILES_PATH = os.path.join(USER_FILES_DIR, "batch_profiles.json")
+
+BATCH_UNDO_LABEL = "Create Quiz Cards (Batch)"
+
+@dataclass
+class BatchJob:
+    """Một job deck nguồn → deck đích, lưu theo tên để dùng lại giữa các phiên"""
+    source_deck: str
+    note_type: str
+    vocab_field: str
+    meaning_field: str
+    target_deck: str
+    target_note_type: str = ""
+    
+    def label(self) -> str:
+        return f"{self.source_deck} [{self.note_type}: {self.vocab_field}/{self.meaning_field}] → {self.target_deck}"
+        
+    def to_dict(self) -> Dict[str, str]:
+        return asdict(self)
+        
+    @classmethod
+    def from_dict(cls, raw: Dict[str, Any]) -> Optional["BatchJob"]:
+        """Đọc job từ dict, None nếu thiếu trường bắt buộc"""
+        try:
+            return cls(**{f.name: str(raw[f.name]) for f in fields(cls) if f.name in raw})
+        except TypeError:
+            return None
+
+@dataclass
+class BatchJobResult:
+    job: BatchJob
+    result: Optional[GenerationResult] = None
+    error: str = ""
+
+@dataclass
+class BatchResult:
+    """Kết quả cả batch"""
+    jobs: List[BatchJobResult] = field(default_factory=list)
+    cancelled: bool = False
+    changes: OpChanges = field(default_factory=OpChanges)
+    stats: Optional[RunStats] = None
+    
+    def total(self, name: str) -> int:
+        return sum(getattr(item.result, name) for item in self.jobs if item.result)
+        
+    @property
+    def errors(self) -> int:
+        return sum(1 for item in self.jobs if item.error)
+
+def load_profiles(path: str = PROFILES_PATH) -> Dict[str, List[BatchJob]]:
+    """Đọc các danh sách job đã lưu"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    profiles = {}
+    for name, jobs in raw.items() if isinstance(raw, dict) else ():
+        parsed = [BatchJob.from_dict(job) for job in jobs if isinstance(job, dict)]
+        profiles[name] = [job for job in parsed if job is not None]
+    return profiles
+
+# Danh sách job đã đọc theo đường dẫn file, xóa khi lưu/xóa profile
+_cached_profiles: Dict[str, Dict[str, List[BatchJob]]] = {}
+
+def get_profiles(path: str = PROFILES_PATH) -> Dict[str, List[BatchJob]]:
+    """Như load_profiles nhưng chỉ đọc file một lần cho tới khi profile được lưu hoặc xóa"""
+    profiles = _cached_profiles.get(path)
+    if profiles is None:
+        profiles = _cached_profiles[path] = load_profiles(path)
+    return profiles
+
+def invalidate_profiles(*args):
+    _cached_profiles.clear()
+
+def _write_profiles(profiles: Dict[str, List[BatchJob]], path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({name: [job.to_dict() for job in jobs] for name, jobs in profiles.items()},
+                  f, indent=2, ensure_ascii=False)
+    invalidate_profiles()
+
+def save_profile(name: str, jobs: List[BatchJob], path: str = PROFILES_PATH):
+    """Lưu danh sách job dưới một tên, ghi đè nếu đã có"""
+    profiles = load_profiles(path)
+    profiles[name] = list(jobs)
+    _write_profiles(profiles, path)
+
+def delete_profile(name: str, path: str = PROFILES_PATH):
+    profiles = load_profiles(path)
+    if profiles.pop(name, None) is not None:
+        _write_profiles(profiles, path)
+
+def run_batch(col: Collection, jobs: List[BatchJob], config: QuizConfig,
+              progress: Optional[Callable] = None,
+              cancel_event: Optional[threading.Event] = None,
+              stats: Optional[RunStats] = None, **options) -> BatchResult:
+    """Chạy lần lượt các job trong một luồng, dùng chung cache note type và bộ ghi theo lô"""
+    # options được chuyển cho QuizGenerator (random_count, seed, skip_existing, ...)
+    stats = stats or RunStats()
+    result = BatchResult(stats=stats)
+    models = ModelCache(col)
+    # Mỗi lô ghi là một lần gọi backend, cả batch là một bước undo
+    writer = BulkNoteWriter(col, config.bulk_chunk_size, undo_label=BATCH_UNDO_LABEL)
+    
+    for job_index, job in enumerate(jobs):
+        if cancel_event is not None and cancel_event.is_set():
+            result.cancelled = True
+            break
+            
+        item = BatchJobResult(job)
+        result.jobs.append(item)
+        try:
+            source_deck_id = col.decks.id_for_name(job.source_deck)
+            source_model_id = col.models.id_for_name(job.note_type)
+            target_model_id = (col.models.id_for_name(job.target_note_type)
+                               if job.target_note_type else source_model_id)
+            if not source_deck_id:
+                item.error = f"Deck not found: {job.source_deck}"
+                continue
+            if not source_model_id or not target_model_id:
+                item.error = f"Note type not found: {job.target_note_type or job.note_type}"
+                continue
+                
+            generator = QuizGenerator(
+                col,
+                source_deck_id=source_deck_id,
+                source_model_id=source_model_id,
+                vocab_field=job.vocab_field,
+                meaning_field=job.meaning_field,
+                target_model_id=target_model_id,
+                target_deck_id=resolve_target_deck(col, job.target_deck or config.default_quiz_deck_name),
+                config=config,
+                model_cache=models,
+                writer=writer,
+                **options,
+            )
+            if not generator.ensure_quiz_field():
+                item.error = "Failed to add Quiz field to target note type"
+                continue
+                
+            # progress(job_index, job_count, done, total, created, skipped)
+            job_progress = None
+            if progress:
+                job_progress = (lambda done, total, created, skipped, index=job_index:
+                                progress(index, len(jobs), done, total, created, skipped))
+            # Mỗi job có thống kê riêng (info, bộ đếm, thời gian), cộng dồn vào thống kê của batch
+            job_stats = RunStats()
+            job_stats.info["job"] = job.label()
+            try:
+                item.result = generator.run(job_progress, cancel_event, job_stats)
+            finally:
+                stats.add_child(job_stats)
+            # Note của job đã vào chỉ mục qua hook: ghi nhận chữ ký mới để job sau không dựng lại chỉ mục
+            get_index(col, generator.quiz_field_name).commit_changes()
+            if item.result.cancelled:
+                result.cancelled = True
+                break
+            
+        except Exception as e:
+            item.error = str(e)
+            print(f"Error running batch job {job.label()}: {str(e)}")
+        
+    writer.finish()
+    result.changes = col.merge_undo_entries(writer.undo_entry)
+    
+    stats.info["jobs"] = len(jobs)
+    stats.info.update(options)
+    for name in ("total", "created", "skipped", "failed", "refreshed"):
+        stats.counters[name] = result.total(name)
+    stats.counters["job_errors"] = result.errors
+    return result
\ No newline at end of file
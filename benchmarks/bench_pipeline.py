@@ -0,0 +1,189 @@
+"""Benchmark các bước tạo quiz trên collection tổng hợp.
+
+Chạy từ thư mục chứa addon (cần gói anki):
+    
+    python -m QuizCardCreator.benchmarks.bench_pipeline --sizes 1000 10000 100000 \
+        --output bench_results.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+from anki.collection import AddNoteRequest, Collection
+from anki.notes import Note
+from .. import quiz_index
+from ..config import QuizConfig
+from ..generator import PreparedRun, QuizGenerator, ensure_quiz_field, resolve_target_deck
+from ..queries import deck_note_ids, iter_note_records
+from ..sampler import make_sampler
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+# Tỉ lệ note thuộc note type khác trong deck nguồn
+OTHER_MODEL_RATIO = 0.2
+
+@contextmanager
+def timed(results: Dict[str, float], stage: str):
+    """Ghi thời gian chạy (giây) của một bước vào results"""
+    start = time.perf_counter()
+    yield
+    results[stage] = round(time.perf_counter() - start, 4)
+
+def add_vocab_model(col: Collection, name: str, field_names: List[str]) -> int:
+    """Tạo note type đơn giản với các trường cho trước"""
+    models = col.models
+    model = models.new(name)
+    for field_name in field_names:
+        models.add_field(model, models.new_field(field_name))
+    template = models.new_template("Card 1")
+    template['qfmt'] = "{{%s}}" % field_names[0]
+    template['afmt'] = "{{FrontSide}}<hr id=answer>{{%s}}" % field_names[1]
+    models.add_template(model, template)
+    models.add(model)
+    return model['id']
+
+def build_collection(path: str, size: int, seed: int) -> Dict:
+    """Tạo collection tạm với deck con lồng nhau và nhiều note type"""
+    rng = random.Random(seed)
+    col = Collection(path)
+    vocab_model_id = add_vocab_model(col, "Bench Vocab", ["Vocab", "Meaning", "Example"])
+    other_model_id = add_vocab_model(col, "Bench Other", ["Front", "Back"])
+    
+    # Deck nguồn có 3 cấp deck con
+    deck_ids = [col.decks.id(f"Bench::Level{a}::Unit{b}", create=True)
+                for a in range(4) for b in range(5)]
+    source_deck_id = col.decks.id_for_name("Bench")
+    
+    vocab_model = col.models.get(vocab_model_id)
+    other_model = col.models.get(other_model_id)
+    requests = []
+    for i in range(size):
+        if rng.random() < OTHER_MODEL_RATIO:
+            note = Note(col, other_model)
+            note['Front'] = f"other {i}"
+            note['Back'] = f"back {i}"
+        else:
+            note = Note(col, vocab_model)
+            # Một phần từ vựng bị lặp để kiểm tra loại trùng
+            note['Vocab'] = f"word{rng.randrange(int(size * 0.9) or 1)}"
+            note['Meaning'] = f"meaning <b>{i}</b>"
+            note['Example'] = f"example sentence {i}"
+        requests.append(AddNoteRequest(note=note, deck_id=rng.choice(deck_ids)))
+        if len(requests) >= 5000:
+            col.add_notes(requests)
+            requests = []
+    if requests:
+        col.add_notes(requests)
+        
+    return {
+        "col": col,
+        "source_deck_id": source_deck_id,
+        "vocab_model_id": vocab_model_id,
+    }
+
+def bench_size(workdir: str, size: int, random_count: int, seed: int) -> Dict:
+    """Đo từng bước cho một kích thước deck"""
+    stages: Dict[str, float] = {}
+    path = os.path.join(workdir, f"bench_{size}.anki2")
+    
+    with timed(stages, "build_collection"):
+        setup = build_collection(path, size, seed)
+    col = setup["col"]
+    source_deck_id = setup["source_deck_id"]
+    model_id = setup["vocab_model_id"]
+    config = QuizConfig()
+    
+    try:
+        target_deck_id = resolve_target_deck(col, config.default_quiz_deck_name)
+        ensure_quiz_field(col, model_id, config.quiz_field_name)
+        
+        with timed(stages, "discovery"):
+            note_ids = deck_note_ids(col, source_deck_id, model_id)
+            
+        with timed(stages, "extraction"):
+            records = list(iter_note_records(col, note_ids, model_id, "Vocab", "Meaning"))
+            
+        generator = QuizGenerator(
+            col, source_deck_id, model_id, "Vocab", "Meaning", model_id, target_deck_id,
+            random_count=random_count, seed=seed, config=config,
+        )
+        # Đúng đường bốc của QuizGenerator: pool như prepare(), bốc từng note qua pick_distractors
+        with timed(stages, "sampling"):
+            sampler = make_sampler(records, random.Random(seed), generator.distractor_strategy,
+                                   None, generator.make_normalizer())
+            prepared = PreparedRun(sampler=sampler)
+            for nid, vocab, _ in records:
+                generator.pick_distractors(prepared, nid, vocab)
+            
+        # Tạo quiz note bằng đúng đường ghi của QuizGenerator (plan, mẫu Quiz, bộ ghi theo lô),
+        # deck đích còn trống nên mọi từ đều được tạo
+        with timed(stages, "insertion"):
+            inserted_run = generator.run()
+        inserted = inserted_run.created
+        
+        with timed(stages, "existing_vocab_scan_cold"):
+            generator.get_existing_quiz_notes(sampler.vocab_counts)
+        with timed(stages, "existing_vocab_scan_warm"):
+            generator.get_existing_quiz_notes(sampler.vocab_counts)
+            
+        # Chạy lại toàn bộ pipeline (mọi từ đã có quiz nên chủ yếu đo bước quét và bỏ qua)
+        with timed(stages, "full_run_skip_existing"):
+            result = generator.run()
+            
+        return {
+            "size": size,
+            "source_notes": len(note_ids),
+            "inserted": inserted,
+            "full_run_created": result.created,
+            "full_run_skipped": result.skipped,
+            "stages": stages,
+        }
+    finally:
+        col.close()
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the quiz generation pipeline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="number of notes per synthetic collection")
+    parser.add_argument("--random-count", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default="bench_results.json", help="JSON results file")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary collections")
+    args = parser.parse_args(argv)
+    
+    workdir = tempfile.mkdtemp(prefix="quiz_bench_")
+    # Chỉ mục tạm nằm cùng collection tạm, không ghi vào user_files
+    quiz_index.USER_FILES_DIR = workdir
+    runs = []
+    try:
+        for size in args.sizes:
+            run = bench_size(workdir, size, args.random_count, args.seed)
+            runs.append(run)
+            print(f"{size:>8} notes: " + ", ".join(f"{k}={v:.3f}s" for k, v in run["stages"].items()))
+    finally:
+        quiz_index.close_indexes()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+        
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "random_count": args.random_count,
+        "seed": args.seed,
+        "runs": runs,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
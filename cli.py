@@ -0,0 +1,176 @@
+"""Chạy Quiz Card Creator không cần giao diện Anki.
+
+Ví dụ (chạy từ thư mục chứa addon):
+    
+    python -m QuizCardCreator.cli collection.anki2 --source-deck "Japanese::Vocab" \
+        --note-type "Basic" --vocab-field Front --meaning-field Back --seed 42
+"""
+import argparse
+import sys
+from anki.collection import Collection
+from typing import List, Optional
+from .config import load_config_file
+from .convert import QuizFormatConverter
+from .export import EXPORT_FORMATS, QuizExporter
+from .generator import QuizGenerator, resolve_target_deck
+from .progress import ThrottledProgress
+from .quiz_format import QUIZ_FORMATS
+from .refresh import QuizRefresher
+from .sampler import DISTRACTOR_STRATEGIES
+from .stats import RunStats
+
+def build_parser() -> argparse.ArgumentParser:
+    """Tạo parser tham số dòng lệnh"""
+    parser = argparse.ArgumentParser(
+        prog="quiz-card-creator",
+        description="Generate quiz notes in an .anki2 collection without the Anki GUI",
+    )
+    parser.add_argument("collection", help="path to the .anki2 collection file")
+    parser.add_argument("--source-deck", required=True, help="source deck name (subdecks included)")
+    parser.add_argument("--note-type", required=True, help="source note type name")
+    parser.add_argument("--vocab-field", required=True, help="field containing the vocabulary")
+    parser.add_argument("--meaning-field", required=True, help="field containing the meaning")
+    parser.add_argument("--target-note-type", help="note type for quiz notes (default: source note type)")
+    parser.add_argument("--target-deck", help="deck for quiz notes (default: default_quiz_deck_name)")
+    parser.add_argument("--random-count", type=int, help="number of distractors per quiz note")
+    parser.add_argument("--strategy", choices=DISTRACTOR_STRATEGIES,
+                        help="distractor selection: random, similar spelling or balanced (default from config)")
+    parser.add_argument("--seed", type=int, help="random seed for reproducible runs")
+    parser.add_argument("--no-skip-existing", action="store_true",
+                        help="also generate for vocabulary that already has quiz notes")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only process notes added or changed since the last run")
+    parser.add_argument("--refresh-changed", action="store_true",
+                        help="with --incremental, update quiz notes whose source note changed")
+    parser.add_argument("--refresh-existing", action="store_true",
+                        help="update existing quiz notes from their source notes instead of creating new ones")
+    parser.add_argument("--convert-format", choices=QUIZ_FORMATS,
+                        help="rewrite existing quiz notes to this Quiz field format instead of creating new ones")
+    parser.add_argument("--size-report", action="store_true",
+                        help="with --convert-format, only report the Quiz field size before/after")
+    parser.add_argument("--export", metavar="PATH",
+                        help="write quiz records to a .jsonl or .csv file (add .gz to compress) "
+                             "instead of creating notes; the collection is not modified")
+    parser.add_argument("--export-format", choices=EXPORT_FORMATS,
+                        help="with --export, file format (default: from the file extension)")
+    parser.add_argument("--config", help="path to a config.json file")
+    parser.add_argument("--quiet", action="store_true", help="do not print progress")
+    parser.add_argument("--stats", action="store_true", help="print per-stage timings")
+    parser.add_argument("--profile", action="store_true", help="profile the run with cProfile")
+    parser.add_argument("--report", help="write the run statistics as JSON to this directory")
+    return parser
+
+def print_progress(done: int, total: int, created: int, skipped: int):
+    sys.stderr.write(f"\rProcessing: {done}/{total} - Created: {created}, Skipped: {skipped}")
+    sys.stderr.flush()
+
+def print_statistics(args: argparse.Namespace, stats: RunStats):
+    """In thống kê và lưu báo cáo nếu được yêu cầu"""
+    if args.stats or args.profile:
+        print("\n".join(stats.summary_lines()))
+        if stats.profile_text:
+            print(stats.profile_text)
+    if args.report:
+        print(f"Report: {stats.save_report(args.report)}")
+
+def run(args: argparse.Namespace) -> int:
+    """Mở collection, tạo quiz note và đóng collection"""
+    config = load_config_file(args.config)
+    col = Collection(args.collection)
+    try:
+        source_deck_id = col.decks.id_for_name(args.source_deck)
+        if not source_deck_id:
+            print(f"Deck not found: {args.source_deck}", file=sys.stderr)
+            return 2
+            
+        source_model_id = col.models.id_for_name(args.note_type)
+        if not source_model_id:
+            print(f"Note type not found: {args.note_type}", file=sys.stderr)
+            return 2
+            
+        target_model_id = source_model_id
+        if args.target_note_type:
+            target_model_id = col.models.id_for_name(args.target_note_type)
+            if not target_model_id:
+                print(f"Note type not found: {args.target_note_type}", file=sys.stderr)
+                return 2
+            
+        target_deck_name = args.target_deck or config.default_quiz_deck_name
+        if args.export or args.refresh_existing or args.convert_format:
+            # Xuất file, cập nhật và đổi dạng chỉ đọc/sửa quiz đã có nên không tạo deck đích
+            target_deck_id = col.decks.id_for_name(target_deck_name) or 0
+            if not target_deck_id and not args.export:
+                print(f"Deck not found: {target_deck_name}", file=sys.stderr)
+                return 2
+        else:
+            target_deck_id = resolve_target_deck(col, target_deck_name)
+        random_count = args.random_count or config.max_random_cards
+        
+        generator = QuizGenerator(
+            col,
+            source_deck_id=source_deck_id,
+            source_model_id=source_model_id,
+            vocab_field=args.vocab_field,
+            meaning_field=args.meaning_field,
+            target_model_id=target_model_id,
+            target_deck_id=target_deck_id,
+            random_count=random_count,
+            seed=args.seed,
+            skip_existing=not args.no_skip_existing,
+            config=config,
+            incremental=args.incremental,
+            refresh_changed=args.incremental and args.refresh_changed,
+            distractor_strategy=args.strategy,
+        )
+        
+        progress = None if args.quiet else ThrottledProgress(print_progress, interval=0.5)
+        stats = RunStats(profile=args.profile)
+        if args.export:
+            exported = QuizExporter(generator).run(args.export, args.export_format, progress, stats=stats)
+            if not args.quiet:
+                sys.stderr.write("\n")
+            print_statistics(args, stats)
+            print(f"Export complete! Exported: {exported.exported}, Skipped: {exported.skipped}, "
+                  f"Failed: {exported.failed} ({exported.export_format}, {exported.size} bytes) → {exported.path}")
+            return 0 if exported.failed == 0 else 1
+            
+        if args.refresh_existing:
+            refreshed = QuizRefresher(generator).run(progress, stats=stats)
+            if not args.quiet:
+                sys.stderr.write("\n")
+            print_statistics(args, stats)
+            print(f"Refresh complete! Updated: {refreshed.updated}, Unchanged: {refreshed.unchanged}, "
+                  f"Unmatched: {refreshed.unmatched}, Failed: {refreshed.failed} "
+                  f"({refreshed.seconds:.2f}s)")
+            return 0 if refreshed.failed == 0 else 1
+            
+        if args.convert_format:
+            converted = QuizFormatConverter(generator).run(args.convert_format, args.size_report,
+                                                           progress, stats=stats)
+            if not args.quiet and not args.size_report:
+                sys.stderr.write("\n")
+            print_statistics(args, stats)
+            print(converted.size_report())
+            return 0 if converted.failed == 0 else 1
+            
+        # Chỉ khi tạo quiz mới mới thêm trường Quiz (đổi schema)
+        if not generator.ensure_quiz_field():
+            print("Failed to add Quiz field to target note type", file=sys.stderr)
+            return 1
+            
+        result = generator.run(progress, stats=stats)
+        if not args.quiet:
+            sys.stderr.write("\n")
+        
+        print_statistics(args, stats)
+        print(f"Complete! Created: {result.created}, Refreshed: {result.refreshed}, "
+              f"Skipped: {result.skipped}, Failed: {result.failed}")
+        return 0 if result.failed == 0 else 1
+    finally:
+        col.close()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    return run(build_parser().parse_args(argv))
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
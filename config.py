@@ -0,0 +1,136 @@
+import json
+import os
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, Optional, Tuple
+from .normalize import ALL_RULES, DEFAULT_RULES
+from .quiz_format import DEFAULT_ENTRY, DEFAULT_SEPARATOR, QUIZ_FORMATS, QuizTemplate, get_template
+from .sampler import DISTRACTOR_STRATEGIES
+
+try:
+    from aqt import mw
+except ImportError:
+    mw = None
+
+# Thư mục user_files được Anki giữ lại khi cập nhật addon
+USER_FILES_DIR = os.path.join(os.path.dirname(__file__), "user_files")
+
+@dataclass(frozen=True)
+class QuizConfig:
+    """Cấu hình addon đã kiểm tra kiểu, giá trị mặc định giống config.json"""
+    default_quiz_deck_name: str = "Quiz Notes"
+    quiz_field_name: str = "Quiz"
+    max_random_cards: int = 3
+    distractor_strategy: str = "random"
+    skip_existing_cards: bool = True
+    prevent_duplicates: bool = True
+    normalize_rules: Tuple[str, ...] = DEFAULT_RULES
+    quiz_format: str = "inline"
+    # Mẫu một mục trong trường Quiz và chuỗi ngăn cách giữa các mục
+    quiz_template: str = DEFAULT_ENTRY
+    quiz_separator: str = DEFAULT_SEPARATOR
+    bulk_chunk_size: int = 500
+    rollback_on_cancel: bool = False
+    # Tên danh sách job (batch profile) được theo dõi để tự tạo quiz khi thêm note, rỗng là tắt
+    auto_generate_profile: str = ""
+    auto_generate_delay: int = 30
+    auto_generate_batch_size: int = 200
+    
+    @classmethod
+    def from_dict(cls, raw: Optional[Dict[str, Any]]) -> "QuizConfig":
+        """Tạo cấu hình từ dict, giá trị sai kiểu được thay bằng mặc định"""
+        raw = raw or {}
+        values = {}
+        for f in fields(cls):
+            if f.name not in raw:
+                continue
+            value = _coerce(raw[f.name], f.type)
+            if value is None:
+                print(f"Quiz Card Creator: invalid value for '{f.name}': {raw[f.name]!r}, using default")
+                continue
+            values[f.name] = value
+            
+        config = cls(**values)
+        return config._clamped()
+        
+    def _clamped(self) -> "QuizConfig":
+        """Giới hạn các giá trị số trong khoảng hợp lệ"""
+        try:
+            get_template(self.quiz_template, self.quiz_separator)
+            quiz_template, quiz_separator = self.quiz_template, self.quiz_separator
+        except ValueError as e:
+            print(f"Quiz Card Creator: {str(e)}, using default quiz template")
+            quiz_template, quiz_separator = DEFAULT_ENTRY, DEFAULT_SEPARATOR
+        return QuizConfig(**{
+            **asdict(self),
+            "max_random_cards": min(max(self.max_random_cards, 1), 10),
+            "bulk_chunk_size": max(self.bulk_chunk_size, 1),
+            "auto_generate_delay": max(self.auto_generate_delay, 1),
+            "auto_generate_batch_size": max(self.auto_generate_batch_size, 1),
+            "quiz_field_name": self.quiz_field_name.strip() or QuizConfig.quiz_field_name,
+            "normalize_rules": tuple(rule for rule in self.normalize_rules if rule in ALL_RULES),
+            "distractor_strategy": (self.distractor_strategy
+                                    if self.distractor_strategy in DISTRACTOR_STRATEGIES
+                                    else QuizConfig.distractor_strategy),
+            "quiz_format": self.quiz_format if self.quiz_format in QUIZ_FORMATS else QuizConfig.quiz_format,
+            "quiz_template": quiz_template,
+            "quiz_separator": quiz_separator,
+        })
+        
+    def template(self) -> QuizTemplate:
+        """Mẫu trường Quiz đã dựng sẵn"""
+        return get_template(self.quiz_template, self.quiz_separator)
+        
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+def _coerce(value: Any, type_name: Any) -> Any:
+    """Chuyển giá trị về đúng kiểu của trường, None nếu không hợp lệ"""
+    type_name = getattr(type_name, "__name__", type_name)
+    if type_name == "bool":
+        return value if isinstance(value, bool) else None
+    if type_name == "int":
+        if isinstance(value, bool):
+            return None
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+    if type_name == "str":
+        return value if isinstance(value, str) else None
+    if str(type_name).startswith(("Tuple", "typing.Tuple")):
+        if isinstance(value, (list, tuple)) and all(isinstance(item, str) for item in value):
+            return tuple(value)
+        return None
+    return value
+
+def load_config_file(path: Optional[str] = None) -> QuizConfig:
+    """Đọc cấu hình trực tiếp từ file config.json (dùng khi không có Anki GUI)"""
+    config_path = path or os.path.join(os.path.dirname(__file__), 'config.json')
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return QuizConfig.from_dict(json.load(f))
+    except (OSError, ValueError):
+        return QuizConfig()
+
+# Cấu hình đã đọc, xóa khi người dùng sửa cấu hình
+_cached_config: Optional[QuizConfig] = None
+
+def get_config() -> QuizConfig:
+    """Lấy cấu hình, chỉ đọc và kiểm tra một lần cho tới khi bị sửa"""
+    global _cached_config
+    if _cached_config is None:
+        if mw is not None and mw.addonManager is not None:
+            _cached_config = QuizConfig.from_dict(mw.addonManager.getConfig(__name__))
+        else:
+            _cached_config = load_config_file()
+    return _cached_config
+
+def invalidate_config(*args):
+    """Xóa cấu hình đã cache"""
+    global _cached_config
+    _cached_config = None
+
+def setup_config():
+    """Đăng ký xóa cache khi cấu hình được sửa trong Add-ons > Config"""
+    if mw is not None:
+        mw.addonManager.setConfigUpdatedAction(__name__, invalidate_config)
\ No newline at end of file
@@ -0,0 +1,165 @@
+import threading
+from dataclasses import dataclass, field
+from anki.collection import Collection, OpChanges
+from typing import Callable, Dict, List, Optional, Tuple
+from .generator import QuizGenerator
+from .queries import deck_note_ids, iter_note_fields, iter_quiz_contents
+from .quiz_format import FORMAT_REFERENCE, format_reference, parse_reference, resolve_references
+from .stats import RunStats
+
+CONVERT_UNDO_LABEL = "Convert Quiz Format"
+
+@dataclass
+class ConversionResult:
+    """Kết quả đổi dạng lưu trường Quiz, kèm kích thước trước/sau"""
+    to_format: str = ""
+    dry_run: bool = False
+    total: int = 0
+    converted: int = 0
+    unchanged: int = 0
+    unmatched: int = 0
+    failed: int = 0
+    cancelled: bool = False
+    bytes_before: int = 0
+    bytes_after: int = 0
+    changes: OpChanges = field(default_factory=OpChanges)
+    stats: Optional[RunStats] = None
+    
+    def size_report(self) -> str:
+        """Báo cáo kích thước trường Quiz trước/sau khi đổi"""
+        verb = "would be converted" if self.dry_run else "converted"
+        change = (self.bytes_after - self.bytes_before) * 100 / self.bytes_before if self.bytes_before else 0
+        return (f"{self.total} quiz notes: {self.converted} {verb} to {self.to_format} format, "
+                f"{self.unchanged} unchanged, {self.unmatched} without matching source notes.\n"
+                f"Quiz field size: {_format_bytes(self.bytes_before)} → {_format_bytes(self.bytes_after)} "
+                f"({change:+.0f}%)")
+
+def _format_bytes(size: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+class QuizFormatConverter:
+    """Đổi quiz note trong deck đích giữa dạng đầy đủ và dạng tham chiếu"""
+    
+    def __init__(self, generator: QuizGenerator):
+        self.generator = generator
+        self.col: Collection = generator.col
+        
+    def run(self, to_format: str, dry_run: bool = False,
+            progress: Optional[Callable] = None,
+            cancel_event: Optional[threading.Event] = None,
+            stats: Optional[RunStats] = None) -> ConversionResult:
+        """Đổi dạng lưu; dry_run chỉ tính kích thước, không ghi gì"""
+        stats = stats or RunStats()
+        stats.info.update({
+            "operation": "convert",
+            "to_format": to_format,
+            "dry_run": dry_run,
+            "source_deck_id": self.generator.source_deck_id,
+            "target_deck_id": self.generator.target_deck_id,
+        })
+        stats.start_profile()
+        try:
+            result = self._run(to_format, dry_run, stats, progress, cancel_event)
+        finally:
+            stats.stop_profile()
+            stats.finish()
+            
+        result.stats = stats
+        for name in ("total", "converted", "unchanged", "unmatched", "failed", "bytes_before", "bytes_after"):
+            stats.counters[name] = getattr(result, name)
+        return result
+        
+    def _run(self, to_format: str, dry_run: bool, stats: RunStats,
+             progress: Optional[Callable],
+             cancel_event: Optional[threading.Event]) -> ConversionResult:
+        col = self.col
+        generator = self.generator
+        result = ConversionResult(to_format=to_format, dry_run=dry_run)
+        to_reference = to_format == FORMAT_REFERENCE
+        template = generator.template
+        
+        source_ords = generator.models.field_ords(generator.source_model_id)
+        vocab_ord = source_ords.get(generator.vocab_field)
+        meaning_ord = source_ords.get(generator.meaning_field)
+        quiz_ord = generator.models.field_ords(generator.target_model_id).get(generator.quiz_field_name)
+        if vocab_ord is None or meaning_ord is None or quiz_ord is None:
+            return result
+            
+        # Dạng tham chiếu cần tìm note nguồn của từng cặp (vocab, meaning)
+        source_by_entry: Dict[Tuple[str, str], int] = {}
+        if to_reference:
+            with stats.stage("source_scan"):
+                source_ids = deck_note_ids(col, generator.source_deck_id, generator.source_model_id)
+                for nid, _, fields, _ in iter_note_fields(col, source_ids):
+                    if max(vocab_ord, meaning_ord) < len(fields):
+                        source_by_entry.setdefault((fields[vocab_ord], fields[meaning_ord]), nid)
+            
+        with stats.stage("quiz_scan"):
+            quiz_rows = list(iter_quiz_contents(col, generator.target_deck_id, generator.quiz_field_name,
+                                                generator.target_model_id))
+            result.total = len(quiz_rows)
+            
+        # Chỉ giữ (quiz note id, nội dung mới) của các note cần đổi
+        pending: List[Tuple[int, str]] = []
+        with stats.stage("convert"):
+            resolved = ([None] * len(quiz_rows) if to_reference else
+                        resolve_references(col, [content for _, _, content in quiz_rows]))
+            for (quiz_nid, _, content), entries in zip(quiz_rows, resolved):
+                result.bytes_before += len(content.encode("utf-8"))
+                converted = None
+                if to_reference and parse_reference(content) is None:
+                    source_ids = [source_by_entry.get(entry) for entry in template.parse(content)]
+                    if source_ids and None not in source_ids:
+                        converted = format_reference(source_ids, vocab_ord, meaning_ord)
+                    else:
+                        result.unmatched += 1
+                elif not to_reference and entries is not None:
+                    if entries:
+                        converted = template.format(entries)
+                    else:
+                        result.unmatched += 1
+                elif content:
+                    result.unchanged += 1
+                    
+                if converted is None:
+                    result.bytes_after += len(content.encode("utf-8"))
+                    continue
+                result.bytes_after += len(converted.encode("utf-8"))
+                pending.append((quiz_nid, converted))
+        result.converted = len(pending)
+        
+        if dry_run or not pending:
+            return result
+            
+        # Ghi theo lô, cả lần đổi là một bước undo
+        undo_entry = col.add_custom_undo_entry(CONVERT_UNDO_LABEL)
+        chunk_size = generator.config.bulk_chunk_size
+        written = 0
+        for start in range(0, len(pending), chunk_size):
+            if cancel_event is not None and cancel_event.is_set():
+                result.cancelled = True
+                break
+            chunk = pending[start:start + chunk_size]
+            try:
+                with stats.stage("db_writes"):
+                    notes = []
+                    for quiz_nid, content in chunk:
+                        note = col.get_note(quiz_nid)
+                        note.fields[quiz_ord] = content
+                        notes.append(note)
+                    col.update_notes(notes)
+                    col.merge_undo_entries(undo_entry)
+                written += len(chunk)
+            except Exception as e:
+                result.failed += len(chunk)
+                print(f"Error converting quiz notes: {str(e)}")
+            if progress:
+                progress(written + result.failed, len(pending), written, result.failed)
+        result.converted = written
+        
+        result.changes = col.merge_undo_entries(undo_entry)
+        return result
\ No newline at end of file
@@ -0,0 +1,60 @@
+from anki.collection import Collection, OpChanges
+from anki.decks import DeckId
+from anki.notes import Note
+from typing import Dict, List, Optional, Sequence, Tuple
+from .queries import note_type_counts
+
+# Số note theo note type của từng deck, theo collection
+_histograms: Dict[str, Dict[DeckId, Dict[int, int]]] = {}
+
+class NameList:
+    """Danh sách (tên, id) của deck hoặc note type, kèm vị trí theo id"""
+    
+    def __init__(self, entries: List[Tuple[str, int]]):
+        self.entries = entries
+        self.row_by_id: Dict[int, int] = {entry_id: row for row, (_, entry_id) in enumerate(entries)}
+        self.name_by_id: Dict[int, str] = {entry_id: name for name, entry_id in entries}
+
+# Tên deck/note type theo collection, dùng chung cho mọi lần mở dialog
+_names: Dict[Tuple[str, str], NameList] = {}
+
+def deck_names(col: Collection) -> NameList:
+    """Danh sách deck, chỉ đọc lại khi deck thay đổi"""
+    key = (col.path, "decks")
+    if key not in _names:
+        _names[key] = NameList([(deck.name, deck.id) for deck in col.decks.all_names_and_ids()])
+    return _names[key]
+
+def note_type_names(col: Collection) -> NameList:
+    """Danh sách note type, chỉ đọc lại khi note type thay đổi"""
+    key = (col.path, "notetypes")
+    if key not in _names:
+        _names[key] = NameList([(model.name, model.id) for model in col.models.all_names_and_ids()])
+    return _names[key]
+
+def invalidate_names(*args):
+    _names.clear()
+
+def deck_note_type_counts(col: Collection, deck_id: DeckId) -> Dict[int, int]:
+    """Lấy số note theo note type của deck, chỉ truy vấn khi chưa có trong cache"""
+    cache = _histograms.setdefault(col.path, {})
+    counts = cache.get(deck_id)
+    if counts is None:
+        counts = cache[deck_id] = note_type_counts(col, deck_id)
+    return counts
+
+def invalidate_histograms(*args):
+    """Xóa cache (note/deck thay đổi, đồng bộ, đóng profile)"""
+    _histograms.clear()
+
+def on_operation_did_execute(changes: OpChanges, handler: Optional[object]):
+    if changes.note or changes.card or changes.deck or changes.notetype:
+        invalidate_histograms()
+    if changes.deck or changes.notetype:
+        invalidate_names()
+
+def on_note_will_be_added(col: Collection, note: Note, deck_id: DeckId):
+    _histograms.pop(col.path, None)
+
+def on_notes_will_be_deleted(col: Collection, ids: Sequence[int]):
+    _histograms.pop(col.path, None)
\ No newline at end of file
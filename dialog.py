@@ -1,28 +1,43 @@
+from aqt import mw
+from aqt.operations import CollectionOp, QueryOp
 from aqt.qt import *
-from aqt.utils import showInfo, tooltip
-from anki.notes import Note
+from aqt.utils import askUser, showInfo, tooltip
 from anki.collection import Collection
-from anki.decks import DeckId, DeckManager
-from anki.models import ModelManager
-import random
-import json
-from typing import Set, List, Dict, Tuple
+from anki.decks import DeckId
+import threading
+from typing import List, Tuple, Optional
+from .deck_stats import deck_names, deck_note_type_counts, note_type_names
+from .pickers import NameListModel, NamePicker, counted_names
+from .progress import ThrottledProgress
+from .sampler import STRATEGY_BALANCED, STRATEGY_RANDOM, STRATEGY_SIMILAR
+from .stats import RunStats
+from .quiz_index import get_index
+from .config import QuizConfig, get_config
+from .generator import GenerationResult, PreparedRun, QuizGenerator, resolve_target_deck
+from .preview import QuizPreview
+from .refresh import QuizRefresher, RefreshResult
+from .convert import ConversionResult, QuizFormatConverter
+from .export import ExportResult, QuizExporter
+from .preview_dialog import PreviewDialog
+from .jobs import GenerationJob, load_jobs
+from .batch import BatchJob, BatchResult, delete_profile, load_profiles, run_batch, save_profile
 
 class QuizCardCreatorDialog(QDialog):
     def __init__(self, col: Collection, default_deck_id: DeckId, parent=None):
         super().__init__(parent)
         self.col = col
         self.default_deck_id = default_deck_id
-        self.deck_manager = DeckManager(col)
-        self.model_manager = ModelManager(col)
+        self.running = False
+        self.cancel_event = threading.Event()
         self.setup_ui()
         self.load_decks()
-        self.load_note_types()
         self.connect_signals()
+        self.refresh_resume_jobs()
         
     def setup_ui(self):
         """Thiết lập giao diện"""
         self.setWindowTitle("Quiz Card Creator")
+        config = self.get_config()
         
         # Layout chính với kích thước linh hoạt
         main_layout = QVBoxLayout(self)
@@ -38,16 +53,21 @@ class QuizCardCreatorDialog(QDialog):
         self.content_layout.setContentsMargins(10, 10, 10, 10)
         self.content_layout.setSpacing(8)
         
+        # Danh sách deck/note type đã cache, hai combo deck dùng chung một model
+        self.deck_model = NameListModel(deck_names(self.col), self)
+        self.note_type_model = NameListModel(note_type_names(self.col), self)
+        self.source_notetype_model = NameListModel(parent=self)
+        
         # 1. Deck lấy dữ liệu
         self.content_layout.addWidget(self.create_section_header("1. Source Deck"))
-        self.source_deck_combo = QComboBox()
+        self.source_deck_combo = NamePicker(self.deck_model)
         self.source_deck_combo.setMinimumWidth(300)
         self.content_layout.addWidget(self.source_deck_combo)
         self.content_layout.addSpacing(15)
         
         # 2. Note type lấy dữ liệu
         self.content_layout.addWidget(self.create_section_header("2. Source Note Type"))
-        self.source_notetype_combo = QComboBox()
+        self.source_notetype_combo = NamePicker(self.source_notetype_model)
         self.content_layout.addWidget(self.source_notetype_combo)
         self.content_layout.addSpacing(15)
         
@@ -65,7 +85,7 @@ class QuizCardCreatorDialog(QDialog):
         
         # 5. Note type thẻ xuất ra
         self.content_layout.addWidget(self.create_section_header("5. Target Note Type"))
-        self.target_notetype_combo = QComboBox()
+        self.target_notetype_combo = NamePicker(self.note_type_model)
         self.content_layout.addWidget(self.target_notetype_combo)
         self.content_layout.addSpacing(15)
         
@@ -73,12 +93,12 @@ class QuizCardCreatorDialog(QDialog):
         self.content_layout.addWidget(self.create_section_header("6. Save to Deck"))
         
         # Checkbox tạo deck mới
-        self.new_deck_checkbox = QCheckBox("Create new deck: 'Quiz Notes'")
+        self.new_deck_checkbox = QCheckBox(f"Create new deck: '{config.default_quiz_deck_name}'")
         self.new_deck_checkbox.setChecked(True)
         self.content_layout.addWidget(self.new_deck_checkbox)
         
         # Combo chọn deck có sẵn
-        self.target_deck_combo = QComboBox()
+        self.target_deck_combo = NamePicker(self.deck_model)
         self.target_deck_combo.setEnabled(False)
         self.content_layout.addWidget(self.target_deck_combo)
         self.content_layout.addSpacing(20)
@@ -88,38 +108,157 @@ class QuizCardCreatorDialog(QDialog):
         
         # Option: Skip existing quiz cards
         self.skip_existing_checkbox = QCheckBox("Skip notes that already have quiz cards")
-        self.skip_existing_checkbox.setChecked(True)
+        self.skip_existing_checkbox.setChecked(config.skip_existing_cards)
         self.skip_existing_checkbox.setToolTip("Prevent creating duplicate quiz cards for the same vocabulary")
         self.content_layout.addWidget(self.skip_existing_checkbox)
         
+        # Option: Chỉ xử lý note mới hoặc đã sửa từ lần chạy trước
+        self.incremental_checkbox = QCheckBox("Incremental: only notes added or changed since the last run")
+        self.incremental_checkbox.setToolTip("Remembers the last run for this source deck, note type and target deck")
+        self.content_layout.addWidget(self.incremental_checkbox)
+        
+        self.refresh_changed_checkbox = QCheckBox("Refresh quiz cards of changed source notes")
+        self.refresh_changed_checkbox.setToolTip("Copy edited vocabulary/meaning fields into the quiz notes created from them")
+        self.refresh_changed_checkbox.setEnabled(False)
+        self.content_layout.addWidget(self.refresh_changed_checkbox)
+        
+        # Nút xây lại chỉ mục từ vựng đã có quiz
+        index_layout = QHBoxLayout()
+        self.rebuild_index_btn = QPushButton("Rebuild quiz index")
+        self.rebuild_index_btn.setToolTip("Rescan all quiz notes and rebuild the index of quizzed vocabulary")
+        index_layout.addWidget(self.rebuild_index_btn)
+        self.refresh_existing_btn = QPushButton("Refresh existing quiz cards")
+        self.refresh_existing_btn.setToolTip("Update quiz cards in the target deck whose source fields or "
+                                             "distractor meanings changed, keeping their review history")
+        index_layout.addWidget(self.refresh_existing_btn)
+        self.convert_format_btn = QPushButton("Convert quiz format")
+        self.convert_format_btn.setToolTip("Rewrite quiz cards in the target deck to the quiz_format set in the "
+                                           "config, after showing how much space it saves")
+        index_layout.addWidget(self.convert_format_btn)
+        self.export_btn = QPushButton("Export dataset")
+        self.export_btn.setToolTip("Write the vocabulary, meanings and distractors to a JSONL or CSV file "
+                                   "(.gz to compress) without creating notes")
+        index_layout.addWidget(self.export_btn)
+        index_layout.addStretch()
+        self.content_layout.addLayout(index_layout)
+        
         # Option: Number of random cards
         random_layout = QHBoxLayout()
         random_layout.addWidget(QLabel("Number of random cards:"))
         self.random_count_spin = QSpinBox()
         self.random_count_spin.setRange(1, 10)
-        self.random_count_spin.setValue(3)
+        self.random_count_spin.setValue(config.max_random_cards)
         self.random_count_spin.setMinimumWidth(60)
         random_layout.addWidget(self.random_count_spin)
+        random_layout.addSpacing(10)
+        random_layout.addWidget(QLabel("Distractors:"))
+        self.strategy_combo = QComboBox()
+        self.strategy_combo.addItem("Random", STRATEGY_RANDOM)
+        self.strategy_combo.addItem("Similar spelling", STRATEGY_SIMILAR)
+        self.strategy_combo.addItem("Balanced", STRATEGY_BALANCED)
+        self.strategy_combo.setToolTip("Similar spelling picks look-alike words as distractors (harder quizzes). "
+                                       "Balanced uses every word as a distractor equally often")
+        self.strategy_combo.setCurrentIndex(max(self.strategy_combo.findData(config.distractor_strategy), 0))
+        random_layout.addWidget(self.strategy_combo)
+        random_layout.addSpacing(10)
+        random_layout.addWidget(QLabel("Seed:"))
+        self.seed_edit = QLineEdit()
+        self.seed_edit.setValidator(QIntValidator(0, 2147483647, self.seed_edit))
+        self.seed_edit.setPlaceholderText("random")
+        self.seed_edit.setToolTip("Runs with the same seed and source deck pick the same distractors")
+        self.seed_edit.setMaximumWidth(100)
+        random_layout.addWidget(self.seed_edit)
         random_layout.addStretch()
         self.content_layout.addLayout(random_layout)
         
+        # Option: Thống kê và profiling
+        self.show_stats_checkbox = QCheckBox("Show run statistics")
+        self.show_stats_checkbox.setToolTip("Show per-stage timings after the run (a JSON report is always saved in user_files)")
+        self.content_layout.addWidget(self.show_stats_checkbox)
+        self.profile_checkbox = QCheckBox("Profile run with cProfile")
+        self.profile_checkbox.setToolTip("Adds the slowest functions to the run report (makes the run slower)")
+        self.content_layout.addWidget(self.profile_checkbox)
+        
         self.content_layout.addSpacing(20)
         
-        # 8. Thanh tiến trình
+        # 8. Danh sách job chạy liên tiếp (batch)
+        self.content_layout.addWidget(self.create_section_header("8. Batch Jobs"))
+        self.batch_jobs: List[BatchJob] = []
+        self.batch_list = QListWidget()
+        self.batch_list.setMaximumHeight(120)
+        self.content_layout.addWidget(self.batch_list)
+        
+        batch_layout = QHBoxLayout()
+        self.add_job_btn = QPushButton("Add current settings")
+        self.add_job_btn.setToolTip("Add the selected source deck, note type, fields and target deck as a job")
+        self.remove_job_btn = QPushButton("Remove")
+        self.run_batch_btn = QPushButton("Run batch")
+        self.run_batch_btn.setToolTip("Run all jobs back to back in one background task (one undo step)")
+        batch_layout.addWidget(self.add_job_btn)
+        batch_layout.addWidget(self.remove_job_btn)
+        batch_layout.addStretch()
+        batch_layout.addWidget(self.run_batch_btn)
+        self.content_layout.addLayout(batch_layout)
+        
+        profile_layout = QHBoxLayout()
+        profile_layout.addWidget(QLabel("Profile:"))
+        self.profile_combo = QComboBox()
+        self.profile_combo.setEditable(True)
+        self.profile_combo.setMinimumWidth(160)
+        self.load_profile_btn = QPushButton("Load")
+        self.save_profile_btn = QPushButton("Save")
+        self.delete_profile_btn = QPushButton("Delete")
+        profile_layout.addWidget(self.profile_combo)
+        profile_layout.addWidget(self.load_profile_btn)
+        profile_layout.addWidget(self.save_profile_btn)
+        profile_layout.addWidget(self.delete_profile_btn)
+        profile_layout.addStretch()
+        self.content_layout.addLayout(profile_layout)
+        self.content_layout.addSpacing(20)
+        
+        # 9. Thanh tiến trình
         self.progress_label = QLabel("Ready")
         self.progress_bar = QProgressBar()
         self.progress_bar.setVisible(False)
         self.content_layout.addWidget(self.progress_label)
         self.content_layout.addWidget(self.progress_bar)
+        
+        # Bảng thống kê lần chạy
+        self.stats_view = QPlainTextEdit()
+        self.stats_view.setReadOnly(True)
+        self.stats_view.setMinimumHeight(160)
+        self.stats_view.setVisible(False)
+        self.content_layout.addWidget(self.stats_view)
         self.content_layout.addSpacing(20)
         
-        # 9. Nút hành động
+        # Job chưa xong (Anki bị tắt giữa chừng hoặc đã bấm Cancel)
+        self.pending_jobs: List[GenerationJob] = []
+        resume_layout = QHBoxLayout()
+        self.resume_label = QLabel()
+        self.resume_label.setWordWrap(True)
+        self.resume_btn = QPushButton("Resume job")
+        self.resume_btn.setToolTip("Continue the unfinished run after its last saved chunk, with the same settings and seed")
+        self.discard_job_btn = QPushButton("Discard")
+        resume_layout.addWidget(self.resume_label, 1)
+        resume_layout.addWidget(self.resume_btn)
+        resume_layout.addWidget(self.discard_job_btn)
+        self.resume_widget = QWidget()
+        self.resume_widget.setLayout(resume_layout)
+        self.resume_widget.setVisible(False)
+        self.content_layout.addWidget(self.resume_widget)
+        
+        # 10. Nút hành động
         button_layout = QHBoxLayout()
+        self.preview_btn = QPushButton("Preview")
+        self.preview_btn.setMinimumWidth(120)
+        self.preview_btn.setToolTip("Show the quiz cards that would be created without writing anything")
         self.create_btn = QPushButton("Create Quiz Cards")
         self.create_btn.setMinimumWidth(120)
         self.cancel_btn = QPushButton("Cancel")
         self.cancel_btn.setMinimumWidth(120)
         button_layout.addStretch()
+        button_layout.addWidget(self.preview_btn)
+        button_layout.addSpacing(10)
         button_layout.addWidget(self.create_btn)
         button_layout.addSpacing(10)
         button_layout.addWidget(self.cancel_btn)
@@ -143,41 +282,14 @@ class QuizCardCreatorDialog(QDialog):
         return label
     
     def load_decks(self):
-        """Tải danh sách deck"""
+        """Chọn deck mặc định, danh sách deck đã có sẵn trong model"""
         try:
-            decks = self.col.decks.all_names_and_ids()
-            self.deck_map = {}
-            
-            for deck in decks:
-                self.deck_map[str(deck.id)] = deck.name
-                self.source_deck_combo.addItem(deck.name, deck.id)
-                self.target_deck_combo.addItem(deck.name, deck.id)
-            
-            # Chọn deck mặc định
-            default_deck_name = self.deck_manager.name_if_exists(self.default_deck_id)
-            if default_deck_name:
-                index = self.source_deck_combo.findText(default_deck_name)
-                if index >= 0:
-                    self.source_deck_combo.setCurrentIndex(index)
-                    self.target_deck_combo.setCurrentIndex(index)
+            self.source_deck_combo.select_id(self.default_deck_id)
+            self.target_deck_combo.select_id(self.default_deck_id)
             
         except Exception as e:
             showInfo(f"Error loading decks: {str(e)}")
     
-    def load_note_types(self):
-        """Tải danh sách note type"""
-        try:
-            note_types = self.col.models.all_names_and_ids()
-            self.model_map = {}
-            
-            for model in note_types:
-                self.model_map[str(model.id)] = model.name
-                self.source_notetype_combo.addItem(model.name, model.id)
-                self.target_notetype_combo.addItem(model.name, model.id)
-            
-        except Exception as e:
-            showInfo(f"Error loading note types: {str(e)}")
-    
     def connect_signals(self):
         """Kết nối các tín hiệu"""
         # Khi chọn source deck, tải note types của deck đó
@@ -194,75 +306,44 @@ class QuizCardCreatorDialog(QDialog):
             lambda checked: self.target_deck_combo.setEnabled(not checked)
         )
         
+        # Chỉ làm mới quiz note trong chế độ incremental
+        self.incremental_checkbox.toggled.connect(self.refresh_changed_checkbox.setEnabled)
+        
         # Nút hành động
         self.create_btn.clicked.connect(self.create_quiz_cards)
+        self.preview_btn.clicked.connect(self.preview_quiz_cards)
         self.cancel_btn.clicked.connect(self.reject)
+        self.resume_btn.clicked.connect(self.resume_job)
+        self.discard_job_btn.clicked.connect(self.discard_job)
+        self.rebuild_index_btn.clicked.connect(self.rebuild_quiz_index)
+        self.refresh_existing_btn.clicked.connect(self.refresh_existing_quiz_cards)
+        self.convert_format_btn.clicked.connect(self.convert_quiz_format)
+        self.export_btn.clicked.connect(self.export_quiz_dataset)
+        
+        # Batch job và profile
+        self.add_job_btn.clicked.connect(self.add_batch_job)
+        self.remove_job_btn.clicked.connect(self.remove_batch_job)
+        self.run_batch_btn.clicked.connect(self.run_batch_jobs)
+        self.load_profile_btn.clicked.connect(self.load_batch_profile)
+        self.save_profile_btn.clicked.connect(self.save_batch_profile)
+        self.delete_profile_btn.clicked.connect(self.delete_batch_profile)
+        self.load_batch_profiles()
         
         # Tải dữ liệu ban đầu
         self.on_source_deck_changed()
     
-    def get_unique_note_ids_from_deck(self, deck_id: DeckId, model_id: int) -> List[int]:
-        """Lấy danh sách note ID duy nhất từ deck, không trùng lặp"""
-        try:
-            cids = self.col.decks.cids(deck_id, children=True)
-            if not cids:
-                return []
-            
-            # Sử dụng set để loại bỏ trùng lặp
-            note_ids = set()
-            for cid in cids:
-                card = self.col.get_card(cid)
-                note = self.col.get_note(card.nid)
-                if note.mid == model_id:
-                    note_ids.add(note.id)
-            
-            return list(note_ids)
-            
-        except Exception as e:
-            showInfo(f"Error getting unique notes: {str(e)}")
-            return []
-    
     def on_source_deck_changed(self):
-        """Khi thay đổi deck nguồn - tối ưu hiệu suất"""
+        """Khi thay đổi deck nguồn"""
         try:
             deck_id = self.source_deck_combo.currentData()
             if not deck_id:
                 return
             
-            # Lấy tất cả card trong deck
-            cids = self.col.decks.cids(deck_id, children=True)
-            if not cids:
-                self.source_notetype_combo.clear()
-                return
-            
-            # Sử dụng set để lấy note type duy nhất
-            note_type_ids = set()
-            
-            # Batch processing để tăng hiệu suất
-            batch_size = 100
-            for i in range(0, len(cids), batch_size):
-                batch_cids = cids[i:i+batch_size]
-                
-                # Lấy note IDs từ card IDs
-                placeholders = ','.join('?' for _ in batch_cids)
-                query = f"SELECT nid FROM cards WHERE id IN ({placeholders})"
-                nids = self.col.db.list(query, *batch_cids)
-                
-                if nids:
-                    # Lấy model IDs từ note IDs
-                    nid_placeholders = ','.join('?' for _ in nids)
-                    model_query = f"SELECT mid FROM notes WHERE id IN ({nid_placeholders})"
-                    mids = self.col.db.list(model_query, *nids)
-                    note_type_ids.update(mids)
-                
-                QApplication.processEvents()
+            # Số note theo note type của deck, một truy vấn GROUP BY và được cache
+            counts = deck_note_type_counts(self.col, deck_id)
             
             # Cập nhật combo box
-            self.source_notetype_combo.clear()
-            
-            for model_id, model_name in self.model_map.items():
-                if int(model_id) in note_type_ids:
-                    self.source_notetype_combo.addItem(model_name, int(model_id))
+            self.source_notetype_combo.set_names(counted_names(self.note_type_model.names, counts))
             
             if self.source_notetype_combo.count() > 0:
                 self.source_notetype_combo.setCurrentIndex(0)
@@ -307,263 +388,596 @@ class QuizCardCreatorDialog(QDialog):
         # Ở đây chúng ta có thể thêm kiểm tra trường Quiz
         pass
     
-    def get_config(self):
-        """Đọc cấu hình từ file"""
-        import os
-        config_path = os.path.join(os.path.dirname(__file__), 'config.json')
-        default_config = {
-            "default_quiz_deck_name": "Quiz Notes",
-            "quiz_field_name": "Quiz",
-            "max_random_cards": 3,
-            "skip_existing_cards": True,
-            "prevent_duplicates": True
-        }
-        
-        try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return default_config
+    def get_config(self) -> QuizConfig:
+        """Lấy cấu hình (đã cache, chỉ đọc lại khi bị sửa)"""
+        return get_config()
     
-    def ensure_quiz_field(self, model_id):
-        """Đảm bảo note type có trường Quiz"""
+    def rebuild_quiz_index(self):
+        """Xây lại chỉ mục từ vựng đã có quiz"""
         try:
             config = self.get_config()
-            quiz_field_name = config['quiz_field_name']
-            
-            model = self.col.models.get(model_id)
-            if not model:
-                return False
-            
-            # Kiểm tra xem trường Quiz đã tồn tại chưa
-            for field in model['flds']:
-                if field['name'] == quiz_field_name:
-                    return True
-            
-            # Thêm trường Quiz mới
-            field = self.col.models.new_field(quiz_field_name)
-            self.col.models.add_field(model, field)
-            self.col.models.save(model, updateReqs=False)
-            
-            return True
+            get_index(self.col, config.quiz_field_name).rebuild()
+            tooltip("Quiz index rebuilt")
             
         except Exception as e:
-            showInfo(f"Error adding quiz field: {str(e)}")
-            return False
+            showInfo(f"Error rebuilding quiz index: {str(e)}")
     
-    def get_existing_quiz_notes(self, target_deck_id: DeckId, target_model_id: int, 
-                               vocab_field: str, source_note_ids: List[int]) -> Set[str]:
-        """Lấy danh sách từ vựng đã có quiz card"""
-        try:
-            existing_vocabs = set()
-            
-            # Lấy tất cả note trong deck đích
-            cids = self.col.decks.cids(target_deck_id, children=True)
-            if not cids:
-                return existing_vocabs
-            
-            for cid in cids:
-                card = self.col.get_card(cid)
-                note = self.col.get_note(card.nid)
-                
-                # Chỉ kiểm tra note có cùng model
-                if note.mid != target_model_id:
-                    continue
-                
-                # Kiểm tra tag để xác định đây là quiz card
-                if hasattr(note, 'tags') and 'quiz_generated' in note.tags:
-                    # Tìm từ vựng gốc từ quiz card
-                    config = self.get_config()
-                    quiz_field_name = config['quiz_field_name']
-                    
-                    if quiz_field_name in note:
-                        quiz_content = note[quiz_field_name]
-                        # Quiz content có dạng: [vocab1][meaning1]|[vocab2][meaning2]
-                        # Chúng ta cần lấy vocab1, vocab2, vocab3
-                        parts = quiz_content.split('|')
-                        for part in parts:
-                            if part.startswith('[') and '][' in part:
-                                # Lấy phần từ vựng (giữa [ và ][)
-                                vocab_start = part.find('[') + 1
-                                vocab_end = part.find('][')
-                                if vocab_end > vocab_start:
-                                    vocab = part[vocab_start:vocab_end]
-                                    existing_vocabs.add(vocab)
-            
-            return existing_vocabs
-            
-        except Exception as e:
-            print(f"Error getting existing quiz notes: {str(e)}")
-            return set()
+    def get_seed(self) -> Optional[int]:
+        """Seed người dùng nhập, None nếu để trống"""
+        text = self.seed_edit.text().strip()
+        return int(text) if text else None
     
-    def get_vocab_from_note(self, note: Note, vocab_field: str) -> str:
-        """Lấy từ vựng từ note"""
-        try:
-            return note[vocab_field] if vocab_field in note else ""
-        except:
-            return ""
+    def build_generator(self, create_deck: bool = True) -> Optional[Tuple[QuizGenerator, RunStats]]:
+        """Tạo QuizGenerator từ lựa chọn trên giao diện (chưa ghi gì vào collection)"""
+        # Lấy thông tin từ giao diện
+        source_deck_id = self.source_deck_combo.currentData()
+        source_model_id = self.source_notetype_combo.currentData()
+        target_model_id = self.target_notetype_combo.currentData()
+        vocab_field = self.vocab_field_combo.currentData()
+        meaning_field = self.meaning_field_combo.currentData()
+        skip_existing = self.skip_existing_checkbox.isChecked()
+        incremental = self.incremental_checkbox.isChecked()
+        refresh_changed = incremental and self.refresh_changed_checkbox.isChecked()
+        random_count = self.random_count_spin.value()
+        distractor_strategy = self.strategy_combo.currentData()
+        seed = self.get_seed()
+        
+        if not all([source_deck_id, source_model_id, target_model_id, vocab_field, meaning_field]):
+            showInfo("Please fill all required fields")
+            return None
+        
+        stats = RunStats(profile=self.profile_checkbox.isChecked())
+        with stats.stage("config_load"):
+            config = self.get_config()
+        
+        # Xác định deck đích
+        if self.new_deck_checkbox.isChecked():
+            if create_deck:
+                # Tìm hoặc tạo deck mới
+                deck_id = resolve_target_deck(self.col, config.default_quiz_deck_name)
+            else:
+                # Xem trước không tạo deck, deck được tạo khi Commit
+                deck_id = self.col.decks.id_for_name(config.default_quiz_deck_name) or 0
+        else:
+            deck_id = self.target_deck_combo.currentData()
+        
+        generator = QuizGenerator(
+            self.col,
+            source_deck_id=source_deck_id,
+            source_model_id=source_model_id,
+            vocab_field=vocab_field,
+            meaning_field=meaning_field,
+            target_model_id=target_model_id,
+            target_deck_id=deck_id,
+            random_count=random_count,
+            seed=seed,
+            skip_existing=skip_existing,
+            config=config,
+            incremental=incremental,
+            refresh_changed=refresh_changed,
+            distractor_strategy=distractor_strategy,
+        )
+        return generator, stats
     
     def create_quiz_cards(self):
         """Tạo thẻ quiz với kiểm tra trùng lặp"""
         try:
-            # Lấy thông tin từ giao diện
-            source_deck_id = self.source_deck_combo.currentData()
-            source_model_id = self.source_notetype_combo.currentData()
-            target_model_id = self.target_notetype_combo.currentData()
-            vocab_field = self.vocab_field_combo.currentData()
-            meaning_field = self.meaning_field_combo.currentData()
-            skip_existing = self.skip_existing_checkbox.isChecked()
-            random_count = self.random_count_spin.value()
-            
-            if not all([source_deck_id, source_model_id, target_model_id, vocab_field, meaning_field]):
-                showInfo("Please fill all required fields")
+            built = self.build_generator()
+            if built is None:
                 return
+            generator, stats = built
             
             # Đảm bảo trường Quiz tồn tại trong note type đích
-            if not self.ensure_quiz_field(target_model_id):
+            if not generator.ensure_quiz_field():
                 showInfo("Failed to add Quiz field to target note type")
                 return
             
-            # Xác định deck đích
-            if self.new_deck_checkbox.isChecked():
-                config = self.get_config()
-                deck_name = config['default_quiz_deck_name']
-                
-                # Tìm hoặc tạo deck mới
-                deck_id = self.deck_manager.id_for_name(deck_name)
-                if not deck_id:
-                    deck_id = self.deck_manager.id(deck_name, create=True)
-            else:
-                deck_id = self.target_deck_combo.currentData()
-            
-            # Lấy danh sách note duy nhất (không trùng lặp)
-            unique_note_ids = self.get_unique_note_ids_from_deck(source_deck_id, source_model_id)
-            if not unique_note_ids:
-                showInfo("No unique notes found in source deck")
+        except Exception as e:
+            showInfo(f"Error creating quiz cards: {str(e)}")
+            return
+        
+        self.start_generation(generator, stats)
+    
+    def preview_quiz_cards(self):
+        """Xem trước quiz note, chỉ đọc dữ liệu trong background"""
+        try:
+            built = self.build_generator(create_deck=False)
+            if built is None:
                 return
+            generator, stats = built
             
-            # Nếu skip existing, lấy danh sách từ vựng đã có quiz
-            existing_vocabs = set()
-            if skip_existing:
-                existing_vocabs = self.get_existing_quiz_notes(
-                    deck_id, target_model_id, vocab_field, unique_note_ids
-                )
-            
-            # Hiển thị thanh tiến trình
-            self.progress_bar.setVisible(True)
-            self.progress_bar.setMaximum(len(unique_note_ids))
-            self.progress_label.setText(f"Processing 0/{len(unique_note_ids)} notes")
-            QApplication.processEvents()
-            
-            config = self.get_config()
-            quiz_field_name = config['quiz_field_name']
-            
-            created_count = 0
-            skipped_count = 0
-            failed_count = 0
-            
-            # Lấy tất cả note để dùng cho việc lấy ngẫu nhiên
-            all_source_notes = []
-            all_vocab_meaning_map = {}  # vocab -> meaning
+        except Exception as e:
+            showInfo(f"Error creating preview: {str(e)}")
+            return
+        
+        op = QueryOp(
+            parent=self,
+            op=lambda col: QuizPreview(generator, stats),
+            success=lambda preview: self.show_preview(preview, stats),
+        )
+        op.failure(lambda e: showInfo(f"Error creating preview: {str(e)}"))
+        op.with_progress("Preparing preview...").run_in_background()
+    
+    def show_preview(self, preview: QuizPreview, stats: RunStats):
+        """Mở bảng xem trước, Commit sẽ ghi đúng các quiz đã xem"""
+        if len(preview) == 0:
+            showInfo("No notes to preview")
+            return
+        
+        dialog = PreviewDialog(preview, self)
+        if not dialog.exec():
+            return
+        
+        # Deck đích và trường Quiz chỉ được tạo khi ghi thật
+        generator = preview.generator
+        if not generator.target_deck_id:
+            generator.target_deck_id = resolve_target_deck(self.col, generator.config.default_quiz_deck_name)
+        if not generator.ensure_quiz_field():
+            showInfo("Failed to add Quiz field to target note type")
+            return
+        self.start_generation(generator, stats, preview.prepared)
+    
+    def refresh_existing_quiz_cards(self):
+        """Cập nhật quiz note đã có theo note nguồn, không tạo lại"""
+        try:
+            built = self.build_generator(create_deck=False)
+            if built is None:
+                return
+            generator, stats = built
+            if not generator.target_deck_id:
+                showInfo("The target deck does not exist yet")
+                return
             
-            for note_id in unique_note_ids:
-                try:
-                    note = self.col.get_note(note_id)
-                    vocab = self.get_vocab_from_note(note, vocab_field)
-                    meaning = note[meaning_field] if meaning_field in note else ""
-                    
-                    if vocab and meaning:
-                        all_source_notes.append(note)
-                        all_vocab_meaning_map[vocab] = meaning
-                except:
-                    pass
+        except Exception as e:
+            showInfo(f"Error refreshing quiz cards: {str(e)}")
+            return
+        
+        self.cancel_event = threading.Event()
+        self.set_running(True)
+        refresher = QuizRefresher(generator)
+        cancel_event = self.cancel_event
+        
+        def run(col: Collection) -> RefreshResult:
+            progress = ThrottledProgress(
+                lambda *args: mw.taskman.run_on_main(lambda: self.update_progress(*args))
+            )
+            return refresher.run(progress, cancel_event, stats)
+        
+        op = CollectionOp(parent=self, op=run)
+        op.success(self.on_refresh_finished)
+        op.failure(self.on_generation_failed)
+        op.run_in_background()
+    
+    def on_refresh_finished(self, result: RefreshResult):
+        """Báo số quiz note đã cập nhật và thời gian chạy"""
+        self.set_running(False)
+        status = "Cancelled" if result.cancelled else "Refresh complete"
+        self.progress_label.setText(
+            f"{status}! Updated: {result.updated}, Unchanged: {result.unchanged}, "
+            f"Unmatched: {result.unmatched}, Failed: {result.failed} ({result.seconds:.2f}s)"
+        )
+        self.show_run_statistics(result, self.show_stats_checkbox.isChecked())
+        tooltip(f"Updated {result.updated} of {result.total} quiz cards in {result.seconds:.2f}s")
+    
+    def convert_quiz_format(self):
+        """Đổi dạng lưu trường Quiz theo config, xem báo cáo kích thước trước khi ghi"""
+        try:
+            built = self.build_generator(create_deck=False)
+            if built is None:
+                return
+            generator, stats = built
+            if not generator.target_deck_id:
+                showInfo("The target deck does not exist yet")
+                return
             
-            # Tạo quiz cards
-            for i, note_id in enumerate(unique_note_ids):
-                try:
-                    note = self.col.get_note(note_id)
-                    vocab = self.get_vocab_from_note(note, vocab_field)
-                    meaning = note[meaning_field] if meaning_field in note else ""
-                    
-                    if not vocab or not meaning:
-                        skipped_count += 1
-                        continue
-                    
-                    # Kiểm tra xem đã có quiz card cho từ vựng này chưa
-                    if skip_existing and vocab in existing_vocabs:
-                        skipped_count += 1
-                        continue
-                    
-                    # Lấy các note ngẫu nhiên (trừ note hiện tại)
-                    available_notes = [n for n in all_source_notes 
-                                     if n.id != note_id and self.get_vocab_from_note(n, vocab_field) != vocab]
-                    
-                    if len(available_notes) < random_count:
-                        # Không đủ note để lấy ngẫu nhiên
-                        skipped_count += 1
-                        continue
-                    
-                    # Chọn ngẫu nhiên
-                    random_notes = random.sample(available_notes, random_count)
-                    
-                    # Tạo chuỗi quiz
-                    quiz_parts = []
-                    for random_note in random_notes:
-                        random_vocab = self.get_vocab_from_note(random_note, vocab_field)
-                        random_meaning = random_note[meaning_field] if meaning_field in random_note else ""
-                        
-                        if random_vocab and random_meaning:
-                            quiz_parts.append(f"[{random_vocab}][{random_meaning}]")
-                    
-                    if not quiz_parts:
-                        failed_count += 1
-                        continue
-                    
-                    # Tạo note mới
-                    target_model = self.col.models.get(target_model_id)
-                    new_note = Note(self.col, target_model)
-                    
-                    # Sao chép tất cả các trường từ note gốc
-                    for field in note.keys():
-                        if field in new_note:
-                            new_note[field] = note[field]
-                    
-                    # Thêm dữ liệu quiz
-                    new_note[quiz_field_name] = "|".join(quiz_parts)
-                    
-                    # Thêm tag để nhận biết
-                    new_note.tags.append("quiz_generated")
-                    
-                    # Thêm note
-                    self.col.add_note(new_note, deck_id)
-                    created_count += 1
-                    
-                    # Thêm vào danh sách từ vựng đã tạo
-                    existing_vocabs.add(vocab)
-                    
-                except Exception as e:
-                    failed_count += 1
-                    print(f"Error processing note {note_id}: {str(e)}")
-                
-                # Cập nhật tiến trình
-                self.progress_bar.setValue(i + 1)
-                self.progress_label.setText(f"Processing: {i + 1}/{len(unique_note_ids)} - "
-                                          f"Created: {created_count}, Skipped: {skipped_count}")
-                QApplication.processEvents()
+        except Exception as e:
+            showInfo(f"Error converting quiz cards: {str(e)}")
+            return
+        
+        converter = QuizFormatConverter(generator)
+        to_format = generator.config.quiz_format
+        
+        def on_report(report: ConversionResult):
+            if not report.converted:
+                showInfo(report.size_report())
+                return
+            if askUser(f"{report.size_report()}\n\nConvert now?", parent=self):
+                self.start_conversion(converter, to_format, stats)
+        
+        op = QueryOp(
+            parent=self,
+            op=lambda col: converter.run(to_format, dry_run=True),
+            success=on_report,
+        )
+        op.failure(self.on_generation_failed)
+        op.with_progress("Measuring quiz cards...").run_in_background()
+    
+    def start_conversion(self, converter: QuizFormatConverter, to_format: str, stats: RunStats):
+        self.cancel_event = threading.Event()
+        self.set_running(True)
+        cancel_event = self.cancel_event
+        
+        def run(col: Collection) -> ConversionResult:
+            progress = ThrottledProgress(
+                lambda *args: mw.taskman.run_on_main(lambda: self.update_progress(*args))
+            )
+            return converter.run(to_format, progress=progress, cancel_event=cancel_event, stats=stats)
+        
+        op = CollectionOp(parent=self, op=run)
+        op.success(self.on_conversion_finished)
+        op.failure(self.on_generation_failed)
+        op.run_in_background()
+    
+    def on_conversion_finished(self, result: ConversionResult):
+        self.set_running(False)
+        status = "Cancelled" if result.cancelled else "Conversion complete"
+        self.progress_label.setText(f"{status}! {result.size_report()}")
+        self.show_run_statistics(result, self.show_stats_checkbox.isChecked())
+        tooltip(f"Converted {result.converted} quiz cards to {result.to_format} format")
+    
+    def export_quiz_dataset(self):
+        """Xuất bộ quiz ra file trong background, chỉ đọc collection"""
+        path, selected = QFileDialog.getSaveFileName(
+            self, "Export Quiz Dataset", "quiz_dataset.jsonl",
+            "JSON Lines (*.jsonl *.jsonl.gz);;CSV (*.csv *.csv.gz)"
+        )
+        if not path:
+            return
+        if not path.endswith((".jsonl", ".jsonl.gz", ".csv", ".csv.gz")):
+            path += ".csv" if selected.startswith("CSV") else ".jsonl"
+        try:
+            built = self.build_generator(create_deck=False)
+            if built is None:
+                return
+            generator, stats = built
             
-            # Hoàn thành
-            self.progress_label.setText(
-                f"Complete! Created: {created_count}, Skipped: {skipped_count}, Failed: {failed_count}"
+        except Exception as e:
+            showInfo(f"Error exporting quiz dataset: {str(e)}")
+            return
+        
+        exporter = QuizExporter(generator)
+        self.cancel_event = threading.Event()
+        self.set_running(True)
+        cancel_event = self.cancel_event
+        
+        def run(col: Collection) -> ExportResult:
+            progress = ThrottledProgress(
+                lambda *args: mw.taskman.run_on_main(lambda: self.update_progress(*args))
             )
+            return exporter.run(path, progress=progress, cancel_event=cancel_event, stats=stats)
+        
+        op = QueryOp(parent=self, op=run, success=self.on_export_finished)
+        op.failure(self.on_generation_failed)
+        op.run_in_background()
+    
+    def on_export_finished(self, result: ExportResult):
+        self.set_running(False)
+        if result.cancelled:
+            self.progress_label.setText("Export cancelled, no file was written")
+            return
+        self.progress_label.setText(f"Export complete! Exported: {result.exported}, "
+                                    f"Skipped: {result.skipped}, Failed: {result.failed} → {result.path}")
+        self.show_run_statistics(result, self.show_stats_checkbox.isChecked())
+        tooltip(f"Exported {result.exported} quiz records")
+    
+    def start_generation(self, generator: QuizGenerator, stats: RunStats,
+                         prepared: Optional[PreparedRun] = None):
+        """Chạy tạo thẻ quiz trong background"""
+        # Lưu job trước khi ghi để có thể chạy tiếp nếu Anki bị tắt giữa chừng
+        if generator.job is None:
+            try:
+                generator.start_job()
+            except OSError as e:
+                print(f"Error saving generation job: {str(e)}")
+        self.cancel_event = threading.Event()
+        self.set_running(True)
+        
+        op = CollectionOp(
+            parent=self,
+            op=lambda col: self.generate_quiz_notes(generator, self.cancel_event, stats, prepared),
+        )
+        op.success(self.on_generation_finished)
+        op.failure(self.on_generation_failed)
+        op.run_in_background()
+    
+    def set_running(self, running: bool):
+        """Cập nhật giao diện khi bắt đầu/kết thúc chạy"""
+        self.running = running
+        self.create_btn.setEnabled(not running)
+        self.preview_btn.setEnabled(not running)
+        self.resume_btn.setEnabled(not running)
+        self.refresh_existing_btn.setEnabled(not running)
+        self.convert_format_btn.setEnabled(not running)
+        self.export_btn.setEnabled(not running)
+        self.run_batch_btn.setEnabled(not running)
+        self.cancel_btn.setEnabled(True)
+        self.progress_bar.setVisible(running)
+        if running:
+            self.progress_bar.setMaximum(0)
+            self.progress_label.setText("Loading notes...")
+    
+    def update_progress(self, done: int, total: int, created: int, skipped: int):
+        """Cập nhật thanh tiến trình (chạy trên main thread)"""
+        if not self.running:
+            return
+        self.progress_bar.setMaximum(total)
+        self.progress_bar.setValue(done)
+        self.progress_label.setText(f"Processing: {done}/{total} - "
+                                    f"Created: {created}, Skipped: {skipped}")
+    
+    def reject(self):
+        """Nút Cancel: hủy lần chạy đang diễn ra hoặc đóng dialog"""
+        if self.running:
+            self.cancel_event.set()
+            self.cancel_btn.setEnabled(False)
+            self.progress_label.setText("Cancelling...")
+            return
+        super().reject()
+    
+    def generate_quiz_notes(self, generator: QuizGenerator, cancel_event: threading.Event,
+                            stats: RunStats, prepared: Optional[PreparedRun] = None) -> GenerationResult:
+        """Tạo quiz note (chạy ngoài GUI thread, không truy cập widget)"""
+        # Báo tiến trình về main thread, giới hạn tần suất cập nhật
+        progress = ThrottledProgress(
+            lambda *args: mw.taskman.run_on_main(lambda: self.update_progress(*args))
+        )
+        return generator.run(progress, cancel_event, stats, prepared)
+    
+    def refresh_resume_jobs(self):
+        """Hiện nút Resume job nếu collection có job chưa xong"""
+        self.pending_jobs = load_jobs(self.col.path)
+        self.resume_widget.setVisible(bool(self.pending_jobs))
+        if self.pending_jobs:
+            more = f" (+{len(self.pending_jobs) - 1} more)" if len(self.pending_jobs) > 1 else ""
+            self.resume_label.setText(f"Unfinished job {self.pending_jobs[0].label()}{more}")
+    
+    def resume_job(self):
+        """Chạy tiếp job mới nhất từ lô cuối cùng đã ghi"""
+        if not self.pending_jobs:
+            return
+        job = self.pending_jobs[0]
+        try:
+            stats = RunStats(profile=self.profile_checkbox.isChecked())
+            with stats.stage("config_load"):
+                config = self.get_config()
+            generator = QuizGenerator.from_job(self.col, job, config)
+            if not generator.ensure_quiz_field():
+                showInfo("Failed to add Quiz field to target note type")
+                return
             
-            if created_count > 0:
-                tooltip(f"Successfully created {created_count} quiz cards\n"
-                       f"Skipped {skipped_count} duplicate/existing cards")
+        except Exception as e:
+            showInfo(f"Error resuming job: {str(e)}")
+            return
+        
+        self.start_generation(generator, stats)
+    
+    def discard_job(self):
+        """Bỏ job chưa xong, các quiz note đã ghi vẫn được giữ"""
+        if not self.pending_jobs:
+            return
+        if askUser("Discard the unfinished job? Quiz cards it already created are kept.", parent=self):
+            self.pending_jobs[0].discard()
+            self.refresh_resume_jobs()
+    
+    def on_generation_finished(self, result: GenerationResult):
+        """Hiển thị kết quả sau khi chạy xong"""
+        self.set_running(False)
+        self.refresh_resume_jobs()
+        
+        if result.source_total == 0:
+            showInfo("No unique notes found in source deck")
+            return
+        if result.total == 0:
+            showInfo("No notes were added or changed since the last run")
+            return
+        
+        # Hoàn thành
+        status = "Cancelled" if result.cancelled else "Complete"
+        self.progress_label.setText(
+            f"{status}! Created: {result.created}, Skipped: {result.skipped}, Failed: {result.failed}"
+        )
+        show_stats = self.show_stats_checkbox.isChecked()
+        self.show_run_statistics(result, show_stats)
+        
+        if result.rolled_back:
+            tooltip(f"Cancelled, removed {result.rolled_back} quiz cards")
+        elif result.created > 0 or result.refreshed > 0:
+            tooltip(f"Successfully created {result.created} quiz cards\n"
+                   f"Refreshed {result.refreshed} quiz cards\n"
+                   f"Skipped {result.skipped} duplicate/existing cards")
+            # Giữ dialog mở khi người dùng muốn xem thống kê
+            if not result.cancelled and not show_stats:
                 self.accept()
-            else:
-                showInfo("No quiz cards were created. Check if cards already exist.")
+        elif not result.cancelled:
+            showInfo("No quiz cards were created. Check if cards already exist.")
+    
+    def show_run_statistics(self, result: GenerationResult, show: bool):
+        """Lưu báo cáo JSON và hiển thị thống kê nếu được chọn"""
+        if not result.stats:
+            return
+        
+        report_path = ""
+        try:
+            report_path = result.stats.save_report()
+        except Exception as e:
+            print(f"Error saving run report: {str(e)}")
+        
+        if show:
+            lines = result.stats.summary_lines()
+            if report_path:
+                lines.append(f"Report: {report_path}")
+            if result.stats.profile_text:
+                lines.extend(["", result.stats.profile_text])
+            self.stats_view.setPlainText("\n".join(lines))
+            self.stats_view.setVisible(True)
+    
+    def current_batch_job(self) -> Optional[BatchJob]:
+        """Tạo job từ lựa chọn hiện tại (lưu theo tên)"""
+        source_deck_id = self.source_deck_combo.currentData()
+        source_model_id = self.source_notetype_combo.currentData()
+        target_model_id = self.target_notetype_combo.currentData()
+        vocab_field = self.vocab_field_combo.currentData()
+        meaning_field = self.meaning_field_combo.currentData()
+        if not all([source_deck_id, source_model_id, target_model_id, vocab_field, meaning_field]):
+            return None
+        
+        if self.new_deck_checkbox.isChecked():
+            target_deck = self.get_config().default_quiz_deck_name
+        else:
+            target_deck = self.col.decks.name(self.target_deck_combo.currentData())
+        target_note_type = ""
+        if target_model_id != source_model_id:
+            target_note_type = self.col.models.get(target_model_id)['name']
+        
+        return BatchJob(
+            source_deck=self.col.decks.name(source_deck_id),
+            note_type=self.col.models.get(source_model_id)['name'],
+            vocab_field=vocab_field,
+            meaning_field=meaning_field,
+            target_deck=target_deck,
+            target_note_type=target_note_type,
+        )
+    
+    def refresh_batch_list(self):
+        self.batch_list.clear()
+        for job in self.batch_jobs:
+            self.batch_list.addItem(job.label())
+    
+    def add_batch_job(self):
+        """Thêm lựa chọn hiện tại vào danh sách job"""
+        job = self.current_batch_job()
+        if job is None:
+            showInfo("Please fill all required fields")
+            return
+        if job in self.batch_jobs:
+            tooltip("This job is already in the list")
+            return
+        self.batch_jobs.append(job)
+        self.refresh_batch_list()
+    
+    def remove_batch_job(self):
+        row = self.batch_list.currentRow()
+        if 0 <= row < len(self.batch_jobs):
+            del self.batch_jobs[row]
+            self.refresh_batch_list()
+    
+    def load_batch_profiles(self, select: str = ""):
+        """Tải tên các profile đã lưu vào combo"""
+        try:
+            names = sorted(load_profiles())
+        except Exception as e:
+            print(f"Error loading batch profiles: {str(e)}")
+            names = []
+        self.profile_combo.clear()
+        self.profile_combo.addItems(names)
+        if select:
+            self.profile_combo.setCurrentText(select)
+    
+    def load_batch_profile(self):
+        """Thay danh sách job bằng profile đã chọn"""
+        name = self.profile_combo.currentText().strip()
+        jobs = load_profiles().get(name)
+        if jobs is None:
+            showInfo(f"Profile not found: {name}")
+            return
+        self.batch_jobs = jobs
+        self.refresh_batch_list()
+    
+    def save_batch_profile(self):
+        """Lưu danh sách job hiện tại dưới tên trong combo"""
+        name = self.profile_combo.currentText().strip()
+        if not name or not self.batch_jobs:
+            showInfo("Enter a profile name and add at least one job")
+            return
+        try:
+            save_profile(name, self.batch_jobs)
+            self.load_batch_profiles(select=name)
+            tooltip(f"Saved profile '{name}' ({len(self.batch_jobs)} jobs)")
             
         except Exception as e:
-            showInfo(f"Error creating quiz cards: {str(e)}")
-        finally:
-            self.progress_bar.setVisible(False)
\ No newline at end of file
+            showInfo(f"Error saving profile: {str(e)}")
+    
+    def delete_batch_profile(self):
+        name = self.profile_combo.currentText().strip()
+        if not name:
+            return
+        try:
+            delete_profile(name)
+            self.load_batch_profiles()
+            
+        except Exception as e:
+            showInfo(f"Error deleting profile: {str(e)}")
+    
+    def run_batch_jobs(self):
+        """Chạy tất cả job liên tiếp trong một tác vụ background"""
+        if not self.batch_jobs:
+            showInfo("Add at least one job to the batch")
+            return
+        
+        jobs = list(self.batch_jobs)
+        config = self.get_config()
+        stats = RunStats(profile=self.profile_checkbox.isChecked())
+        incremental = self.incremental_checkbox.isChecked()
+        options = {
+            "random_count": self.random_count_spin.value(),
+            "seed": self.get_seed(),
+            "skip_existing": self.skip_existing_checkbox.isChecked(),
+            "incremental": incremental,
+            "refresh_changed": incremental and self.refresh_changed_checkbox.isChecked(),
+            "distractor_strategy": self.strategy_combo.currentData(),
+        }
+        
+        self.cancel_event = threading.Event()
+        self.set_running(True)
+        cancel_event = self.cancel_event
+        
+        def run(col: Collection) -> BatchResult:
+            progress = ThrottledProgress(
+                lambda *args: mw.taskman.run_on_main(lambda: self.update_batch_progress(*args))
+            )
+            return run_batch(col, jobs, config, progress, cancel_event, stats, **options)
+        
+        op = CollectionOp(parent=self, op=run)
+        op.success(self.on_batch_finished)
+        op.failure(self.on_generation_failed)
+        op.run_in_background()
+    
+    def update_batch_progress(self, job_index: int, job_count: int, done: int, total: int,
+                              created: int, skipped: int):
+        """Cập nhật tiến trình batch (chạy trên main thread)"""
+        if not self.running:
+            return
+        self.update_progress(done, total, created, skipped)
+        self.progress_label.setText(f"Job {job_index + 1}/{job_count}: " + self.progress_label.text())
+    
+    def on_batch_finished(self, result: BatchResult):
+        """Hiển thị kết quả từng job sau khi chạy batch"""
+        self.set_running(False)
+        status = "Cancelled" if result.cancelled else "Complete"
+        self.progress_label.setText(
+            f"{status}! Jobs: {len(result.jobs)}, Created: {result.total('created')}, "
+            f"Skipped: {result.total('skipped')}, Failed: {result.total('failed')}, "
+            f"Errors: {result.errors}"
+        )
+        self.show_run_statistics(result, self.show_stats_checkbox.isChecked())
+        
+        # Luôn hiện kết quả từng job bên dưới thống kê
+        lines = []
+        for item in result.jobs:
+            if item.error:
+                lines.append(f"{item.job.label()}: {item.error}")
+            elif item.result:
+                lines.append(f"{item.job.label()}: created {item.result.created}, "
+                             f"skipped {item.result.skipped}, failed {item.result.failed}")
+        if self.stats_view.isVisible():
+            lines = [self.stats_view.toPlainText(), ""] + lines
+        self.stats_view.setPlainText("\n".join(lines))
+        self.stats_view.setVisible(True)
+        tooltip(f"Batch finished: created {result.total('created')} quiz cards")
+    
+    def on_generation_failed(self, error: Exception):
+        """Báo lỗi khi chạy background thất bại"""
+        self.set_running(False)
+        self.refresh_resume_jobs()
+        self.progress_label.setText("Ready")
+        showInfo(f"Error creating quiz cards: {str(error)}")
\ No newline at end of file
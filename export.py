@@ -0,0 +1,155 @@
+import csv
+import gzip
+import json
+import os
+import threading
+from dataclasses import dataclass
+from typing import Callable, List, Optional, TextIO
+from .generator import QuizGenerator
+from .stats import RunStats
+
+# Định dạng file xuất, thêm đuôi .gz để nén
+EXPORT_JSONL = "jsonl"
+EXPORT_CSV = "csv"
+EXPORT_FORMATS = (EXPORT_JSONL, EXPORT_CSV)
+GZIP_SUFFIX = ".gz"
+
+@dataclass
+class ExportResult:
+    """Kết quả xuất bộ quiz ra file"""
+    path: str = ""
+    export_format: str = EXPORT_JSONL
+    total: int = 0
+    exported: int = 0
+    skipped: int = 0
+    failed: int = 0
+    cancelled: bool = False
+    size: int = 0
+    stats: Optional[RunStats] = None
+
+def export_format_for(path: str) -> str:
+    """Định dạng theo đuôi file (.csv, .csv.gz; còn lại là JSONL)"""
+    name = path[:-len(GZIP_SUFFIX)] if path.endswith(GZIP_SUFFIX) else path
+    return EXPORT_CSV if name.lower().endswith(".csv") else EXPORT_JSONL
+
+def open_export(path: str, compress: bool = False) -> TextIO:
+    """Mở file để ghi dạng text, có thể nén gzip"""
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+def csv_header(distractor_count: int) -> List[str]:
+    header = ["note_id", "vocab", "meaning"]
+    for n in range(1, distractor_count + 1):
+        header += [f"distractor_{n}_note_id", f"distractor_{n}_vocab", f"distractor_{n}_meaning"]
+    return header
+
+class QuizExporter:
+    """Xuất (vocab, meaning, từ gây nhiễu) ra JSONL/CSV theo từng dòng, không ghi gì vào collection"""
+    
+    def __init__(self, generator: QuizGenerator):
+        self.generator = generator
+        
+    def run(self, path: str, export_format: Optional[str] = None,
+            progress: Optional[Callable] = None,
+            cancel_event: Optional[threading.Event] = None,
+            stats: Optional[RunStats] = None) -> ExportResult:
+        """Ghi vào file tạm rồi đổi tên, file đích chỉ xuất hiện khi đã ghi xong"""
+        stats = stats or RunStats()
+        export_format = export_format or export_format_for(path)
+        stats.info.update({
+            "operation": "export",
+            "export_format": export_format,
+            "source_deck_id": self.generator.source_deck_id,
+            "source_model_id": self.generator.source_model_id,
+        })
+        result = ExportResult(path=path, export_format=export_format)
+        part_path = path + ".part"
+        stats.start_profile()
+        try:
+            with open_export(part_path, path.endswith(GZIP_SUFFIX)) as f:
+                self._write(f, result, stats, progress, cancel_event)
+            if result.cancelled:
+                os.remove(part_path)
+            else:
+                os.replace(part_path, path)
+                result.size = os.path.getsize(path)
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+        finally:
+            stats.stop_profile()
+            stats.finish()
+            
+        result.stats = stats
+        for name in ("total", "exported", "skipped", "failed", "size"):
+            stats.counters[name] = getattr(result, name)
+        return result
+        
+    def _write(self, f: TextIO, result: ExportResult, stats: RunStats,
+               progress: Optional[Callable], cancel_event: Optional[threading.Event]):
+        generator = self.generator
+        # Cùng bước đọc note nguồn, dựng pool và tra quiz đã có như khi tạo note
+        prepared = generator.prepare(stats)
+        sampler = prepared.sampler
+        result.total = len(prepared.note_ids)
+        if sampler is None:
+            return
+        existing_vocabs = set(prepared.existing_vocabs)
+        
+        writer = None
+        if result.export_format == EXPORT_CSV:
+            writer = csv.writer(f)
+            writer.writerow(csv_header(generator.random_count))
+            
+        # Vocab/meaning đã có trong pool, không cần đọc lại bảng notes
+        for i, note_id in enumerate(prepared.note_ids):
+            if cancel_event is not None and cancel_event.is_set():
+                result.cancelled = True
+                break
+            try:
+                position = sampler.index_by_note.get(note_id)
+                if position is None or note_id in prepared.linked:
+                    result.skipped += 1
+                    continue
+                vocab = sampler.vocabs[position]
+                vocab_key = sampler.keys[position]
+                if generator.skip_existing and vocab_key in existing_vocabs:
+                    result.skipped += 1
+                    continue
+                    
+                with stats.stage("sampling"):
+                    picked = generator.pick_distractors(prepared, note_id, vocab)
+                if picked is None:
+                    result.skipped += 1
+                    continue
+                    
+                with stats.stage("write"):
+                    if writer is not None:
+                        row = [note_id, vocab, sampler.meanings[position]]
+                        for j in picked:
+                            row += [sampler.note_ids[j], sampler.vocabs[j], sampler.meanings[j]]
+                        writer.writerow(row)
+                    else:
+                        record = {
+                            "note_id": note_id,
+                            "vocab": vocab,
+                            "meaning": sampler.meanings[position],
+                            "distractors": [{"note_id": sampler.note_ids[j], "vocab": sampler.vocabs[j],
+                                             "meaning": sampler.meanings[j]} for j in picked],
+                        }
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                result.exported += 1
+                existing_vocabs.add(vocab_key)
+                
+            except OSError:
+                # Không ghi được file: dừng, file tạm bị xóa
+                raise
+            except Exception as e:
+                result.failed += 1
+                print(f"Error exporting note {note_id}: {str(e)}")
+                
+            finally:
+                if progress:
+                    progress(i + 1, result.total, result.exported, result.skipped)
\ No newline at end of file
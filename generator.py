@@ -0,0 +1,540 @@
+import bisect
+import random
+import threading
+from dataclasses import dataclass, field
+from anki.collection import Collection, OpChanges
+from anki.decks import DeckId
+from anki.notes import Note
+from anki.errors import NotFoundError
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from .config import QuizConfig
+from .deck_stats import invalidate_names
+from .jobs import GenerationJob, new_job
+from .mapping import FieldMappingPlan, compile_plan
+from .normalize import normalize_many
+from .queries import (changed_note_ids, deck_note_ids, deck_notes_watermark,
+                      ModelCache, iter_note_fields, iter_note_records)
+from .quiz_format import FORMAT_REFERENCE, format_reference
+from .quiz_index import get_index
+from .sampler import DistractorSampler, make_sampler
+from .stats import RunStats
+from .writer import BulkNoteWriter
+
+@dataclass
+class GenerationResult:
+    """Kết quả một lần tạo quiz"""
+    total: int = 0
+    processed: int = 0
+    created: int = 0
+    skipped: int = 0
+    failed: int = 0
+    cancelled: bool = False
+    rolled_back: int = 0
+    refreshed: int = 0
+    source_total: int = 0
+    changes: OpChanges = field(default_factory=OpChanges)
+    stats: Optional[RunStats] = None
+
+@dataclass
+class PreparedRun:
+    """Dữ liệu đọc trước khi ghi, dùng chung cho xem trước và lần ghi thật"""
+    note_ids: List[int] = field(default_factory=list)
+    source_total: int = 0
+    # None khi chỉ xử lý một danh sách note cụ thể, không cập nhật mốc incremental
+    watermark: Optional[Tuple[int, int]] = (0, 0)
+    linked: Dict[int, List[int]] = field(default_factory=dict)
+    sampler: Optional[DistractorSampler] = None
+    existing_vocabs: Set[str] = field(default_factory=set)
+    # note id → chỉ số từ gây nhiễu đã bốc khi xem trước
+    assignments: Dict[int, List[int]] = field(default_factory=dict)
+
+def ensure_quiz_field(col: Collection, model_id: int, quiz_field_name: str) -> bool:
+    """Đảm bảo note type có trường Quiz"""
+    model = col.models.get(model_id)
+    if not model:
+        return False
+        
+    # Kiểm tra xem trường Quiz đã tồn tại chưa
+    for fld in model['flds']:
+        if fld['name'] == quiz_field_name:
+            return True
+        
+    # Thêm trường Quiz mới
+    fld = col.models.new_field(quiz_field_name)
+    col.models.add_field(model, fld)
+    col.models.save(model, updateReqs=False)
+    
+    return True
+
+# Khóa cấu hình collection lưu mốc (mod, id) của lần chạy trước
+WATERMARK_CONFIG_KEY = "quizCardCreatorWatermarks"
+
+def watermark_key(source_deck_id: DeckId, source_model_id: int, target_deck_id: DeckId) -> str:
+    return f"{source_deck_id}:{source_model_id}:{target_deck_id}"
+
+def load_watermark(col: Collection, key: str) -> Optional[Dict[str, int]]:
+    """Đọc mốc của lần chạy trước, None nếu chưa chạy"""
+    watermarks = col.get_config(WATERMARK_CONFIG_KEY, {}) or {}
+    return watermarks.get(key)
+
+def save_watermark(col: Collection, key: str, max_mod: int, max_id: int):
+    """Lưu mốc vào cấu hình collection (được đồng bộ cùng collection)"""
+    watermarks = dict(col.get_config(WATERMARK_CONFIG_KEY, {}) or {})
+    watermarks[key] = {"mod": max_mod, "id": max_id}
+    col.set_config(WATERMARK_CONFIG_KEY, watermarks)
+
+def resolve_target_deck(col: Collection, deck_name: str) -> DeckId:
+    """Tìm hoặc tạo deck đích theo tên"""
+    deck_id = col.decks.id_for_name(deck_name)
+    if not deck_id:
+        deck_id = col.decks.id(deck_name, create=True)
+        # Tạo deck không qua op nên hook không xóa danh sách tên deck đã cache
+        invalidate_names()
+    return deck_id
+
+class QuizGenerator:
+    """Engine tạo quiz note, không phụ thuộc Qt (dùng chung cho dialog và CLI)"""
+    
+    def __init__(self, col: Collection, source_deck_id: DeckId, source_model_id: int,
+                 vocab_field: str, meaning_field: str, target_model_id: int,
+                 target_deck_id: DeckId, random_count: int = 3, seed: Optional[int] = None,
+                 skip_existing: bool = True, config: Optional[QuizConfig] = None,
+                 incremental: bool = False, refresh_changed: bool = False,
+                 distractor_strategy: Optional[str] = None,
+                 model_cache: Optional[ModelCache] = None,
+                 writer: Optional[BulkNoteWriter] = None,
+                 job: Optional[GenerationJob] = None):
+        self.col = col
+        self.source_deck_id = source_deck_id
+        self.source_model_id = source_model_id
+        self.vocab_field = vocab_field
+        self.meaning_field = meaning_field
+        self.target_model_id = target_model_id
+        self.target_deck_id = target_deck_id
+        self.random_count = random_count
+        self.seed = seed
+        self.skip_existing = skip_existing
+        # Chỉ xử lý note mới/đã sửa từ lần chạy trước, có thể làm mới quiz note cũ
+        self.incremental = incremental
+        self.refresh_changed = refresh_changed
+        # Cấu hình được truyền vào một lần, không đọc lại trong vòng lặp
+        self.config = config or QuizConfig()
+        self.quiz_field_name = self.config.quiz_field_name
+        self.template = self.config.template()
+        self.distractor_strategy = distractor_strategy or self.config.distractor_strategy
+        # Chạy theo batch: dùng chung cache note type và bộ ghi (một bước undo cho cả batch)
+        self.models = model_cache or ModelCache(col)
+        self.writer = writer
+        # Job lưu trong user_files: ghi nhận từng lô đã ghi để chạy tiếp sau khi Anki bị tắt
+        self.job = job
+        
+    @classmethod
+    def from_job(cls, col: Collection, job: GenerationJob,
+                 config: Optional[QuizConfig] = None) -> "QuizGenerator":
+        """Tạo lại generator của một job chưa xong"""
+        return cls(col, seed=job.seed, config=config, job=job, **job.params)
+        
+    def job_params(self) -> Dict[str, Any]:
+        """Tham số cần để tạo lại generator khi chạy tiếp job"""
+        return {
+            "source_deck_id": self.source_deck_id,
+            "source_model_id": self.source_model_id,
+            "vocab_field": self.vocab_field,
+            "meaning_field": self.meaning_field,
+            "target_model_id": self.target_model_id,
+            "target_deck_id": self.target_deck_id,
+            "random_count": self.random_count,
+            "skip_existing": self.skip_existing,
+            "incremental": self.incremental,
+            "refresh_changed": self.refresh_changed,
+            "distractor_strategy": self.distractor_strategy,
+        }
+        
+    def start_job(self) -> GenerationJob:
+        """Lưu lần chạy thành job; seed cố định để lần chạy tiếp bốc giống hệt"""
+        if self.seed is None:
+            self.seed = random.SystemRandom().randrange(1 << 31)
+        self.job = new_job(self.col.path, self.job_params(), self.seed)
+        return self.job
+        
+    def ensure_quiz_field(self) -> bool:
+        """Đảm bảo note type đích có trường Quiz"""
+        ok = ensure_quiz_field(self.col, self.target_model_id, self.quiz_field_name)
+        # Note type có thể vừa được sửa, đọc lại ở lần dùng sau
+        self.models.invalidate(self.target_model_id)
+        return ok
+        
+    def compile_plan(self) -> FieldMappingPlan:
+        """Plan dựng quiz note: note type đích và vị trí trường được tra một lần"""
+        return compile_plan(self.col, self.models, self.source_model_id,
+                            self.target_model_id, self.quiz_field_name)
+        
+    def normalize_keys(self, texts: List[str]) -> List[str]:
+        """Khóa so sánh từ vựng theo normalize_rules trong config"""
+        return normalize_many(texts, self.config.normalize_rules)
+        
+    def get_existing_quiz_notes(self, vocabs: Iterable[str]) -> Set[str]:
+        """Lấy danh sách từ vựng (hoặc khóa đã chuẩn hóa khi prevent_duplicates) đã có quiz card"""
+        if not self.target_deck_id:
+            # Deck đích chưa được tạo (khi xem trước) nên chưa có quiz nào
+            return set()
+        index = get_index(self.col, self.quiz_field_name, self.config.normalize_rules, self.template)
+        
+        if self.config.prevent_duplicates:
+            # "<b>Cat</b>" và "cat" được xem là cùng một từ
+            found = index.has_quiz_for(vocabs, self.target_deck_id, self.target_model_id)
+            return set(self.normalize_keys(list(found)))
+        # Chỉ tra cứu các từ vựng nguồn trong chỉ mục, không quét deck đích
+        return index.vocabs_with_quiz(vocabs, self.target_deck_id, self.target_model_id)
+        
+    @property
+    def watermark_key(self) -> str:
+        return watermark_key(self.source_deck_id, self.source_model_id, self.target_deck_id)
+        
+    def refresh_quiz_notes(self, changed: List[Tuple[int, List[str]]],
+                           linked: Dict[int, List[int]], plan: FieldMappingPlan) -> int:
+        """Chép lại các trường đã sửa từ note nguồn sang quiz note, ghi theo lô"""
+        col = self.col
+        chunk_size = self.config.bulk_chunk_size
+        batch: List[Note] = []
+        refreshed = 0
+        for source_nid, fields in changed:
+            for quiz_nid in linked.get(source_nid, []):
+                try:
+                    quiz_note = col.get_note(quiz_nid)
+                except NotFoundError:
+                    continue
+                if plan.copy_fields(fields, quiz_note.fields):
+                    batch.append(quiz_note)
+                if len(batch) >= chunk_size:
+                    col.update_notes(batch)
+                    refreshed += len(batch)
+                    batch = []
+        if batch:
+            col.update_notes(batch)
+            refreshed += len(batch)
+        return refreshed
+        
+    def prepare(self, stats: Optional[RunStats] = None) -> PreparedRun:
+        """Đọc note nguồn, dựng pool và tra quiz đã có; không ghi gì vào collection"""
+        col = self.col
+        stats = stats or RunStats()
+        
+        # Lấy danh sách note duy nhất (không trùng lặp)
+        with stats.stage("discovery"):
+            unique_note_ids = deck_note_ids(col, self.source_deck_id, self.source_model_id)
+            # Mốc của lần chạy này, lấy trước khi tạo note để không bỏ sót note sửa trong lúc chạy
+            new_watermark = deck_notes_watermark(col, self.source_deck_id, self.source_model_id)
+        prepared = PreparedRun(note_ids=unique_note_ids, source_total=len(unique_note_ids),
+                               watermark=new_watermark)
+        if not unique_note_ids:
+            return prepared
+            
+        # Chế độ incremental: chỉ xử lý note thêm hoặc sửa sau lần chạy trước
+        watermark = load_watermark(col, self.watermark_key) if self.incremental else None
+        if watermark:
+            with stats.stage("incremental_filter"):
+                prepared.note_ids = changed_note_ids(col, self.source_deck_id, self.source_model_id,
+                                                     watermark["mod"], watermark["id"])
+                # Note đã có từ trước nhưng vừa sửa: tìm quiz note đã tạo từ nó
+                modified_ids = [nid for nid in prepared.note_ids if nid <= watermark["id"]]
+                prepared.linked = get_index(col, self.quiz_field_name).quiz_notes_for_sources(modified_ids)
+            stats.counters["changed_notes"] = len(prepared.note_ids)
+        # Chạy tiếp job: bỏ các note thuộc lô đã ghi, giữ note cần làm mới quiz
+        if self.job is not None and self.job.cursor:
+            start = bisect.bisect_right(prepared.note_ids, self.job.cursor)
+            # Sau lô ghi lỗi con trỏ không tiến, nhưng các lô sau đó đã ghi liên kết (commit_chunk): bỏ qua
+            after = [nid for nid in prepared.note_ids[start:] if nid not in prepared.linked]
+            written = get_index(col, self.quiz_field_name).quiz_notes_for_sources(after)
+            prepared.note_ids = ([nid for nid in prepared.note_ids[:start] if nid in prepared.linked]
+                                 + [nid for nid in prepared.note_ids[start:] if nid not in written])
+            stats.counters["resumed_after"] = self.job.cursor
+        if not prepared.note_ids:
+            return prepared
+            
+        with stats.stage("pool_build"):
+            # Lấy (id, vocab, meaning) của tất cả note để dùng cho việc lấy ngẫu nhiên
+            pool_records = iter_note_records(col, unique_note_ids, self.source_model_id,
+                                             self.vocab_field, self.meaning_field)
+            
+            # Pool dạng mảng; chỉ mục từ gần giống được dùng lại khi deck nguồn không đổi
+            cache_key = (col.path, self.source_deck_id, self.source_model_id, self.vocab_field,
+                         self.meaning_field, prepared.source_total, new_watermark)
+            if self.config.prevent_duplicates:
+                cache_key += (self.config.normalize_rules,)
+            prepared.sampler = make_sampler(pool_records, random.Random(self.seed),
+                                            self.distractor_strategy, cache_key,
+                                            self.make_normalizer(stats))
+        self._lookup_existing(prepared, stats)
+        return prepared
+        
+    def prepare_notes(self, note_ids: Iterable[int], sampler: Optional[DistractorSampler] = None,
+                      stats: Optional[RunStats] = None) -> PreparedRun:
+        """Chuẩn bị cho một danh sách note cụ thể (tự tạo quiz khi thêm note), dùng lại pool đã dựng"""
+        col = self.col
+        stats = stats or RunStats()
+        note_ids = sorted(note_ids)
+        # Không có mốc: lần chạy này không thay cho một lần chạy incremental
+        prepared = PreparedRun(note_ids=note_ids, watermark=None)
+        with stats.stage("pool_build"):
+            if sampler is None:
+                pool_ids = deck_note_ids(col, self.source_deck_id, self.source_model_id)
+                pool_records = iter_note_records(col, pool_ids, self.source_model_id,
+                                                 self.vocab_field, self.meaning_field)
+                sampler = make_sampler(pool_records, random.Random(self.seed),
+                                       self.distractor_strategy, None, self.make_normalizer())
+            else:
+                # Chỉ đọc các note mới và thêm vào pool
+                sampler.extend(iter_note_records(col, note_ids, self.source_model_id,
+                                                 self.vocab_field, self.meaning_field))
+        prepared.sampler = sampler
+        prepared.source_total = len(sampler)
+        self._lookup_existing(prepared, stats)
+        return prepared
+        
+    def make_normalizer(self, stats: Optional[RunStats] = None) -> Optional[Callable[[List[str]], List[str]]]:
+        """Hàm tính khóa so sánh cho sampler, None nếu so sánh nguyên văn"""
+        if not self.config.prevent_duplicates:
+            return None
+        if stats is None:
+            return self.normalize_keys
+        
+        def normalizer(texts: List[str]) -> List[str]:
+            with stats.stage("normalization"):
+                return self.normalize_keys(texts)
+        return normalizer
+        
+    def _lookup_existing(self, prepared: PreparedRun, stats: RunStats):
+        stats.counters["pool_size"] = len(prepared.sampler)
+        stats.counters["distinct_vocabs"] = len(prepared.sampler.key_counts)
+        
+        # Nếu skip existing, lấy danh sách từ vựng đã có quiz
+        if self.skip_existing:
+            with stats.stage("existing_lookup"):
+                prepared.existing_vocabs = self.get_existing_quiz_notes(prepared.sampler.vocab_counts)
+            stats.counters["existing_vocabs"] = len(prepared.existing_vocabs)
+        
+    def note_rng(self, note_id: int) -> Optional[random.Random]:
+        """Bộ sinh ngẫu nhiên riêng cho từng note khi có seed (kết quả không phụ thuộc thứ tự)"""
+        if self.seed is None:
+            return None
+        return random.Random(f"{self.seed}:{note_id}")
+        
+    def pick_distractors(self, prepared: PreparedRun, note_id: int, vocab: str) -> Optional[List[int]]:
+        """Chỉ số từ gây nhiễu cho một note, ưu tiên kết quả đã xem trước"""
+        picked = prepared.assignments.get(note_id)
+        if picked is None:
+            picked = prepared.sampler.sample(note_id, vocab, self.random_count, self.note_rng(note_id))
+        return picked
+        
+    def commit_chunk(self, writer: BulkNoteWriter, pairs_start: int, cursor: int,
+                     failed_before: int) -> int:
+        """Lưu liên kết của lô vừa ghi và ghi nhật ký job, trả về vị trí liên kết đã lưu"""
+        source_pairs = writer.source_pairs[pairs_start:]
+        if source_pairs:
+            get_index(self.col, self.quiz_field_name).record_sources(source_pairs)
+        # Đã có lô ghi lỗi: giữ con trỏ ở lô thành công trước đó để Resume ghi lại các note lỗi
+        if writer.failed != failed_before:
+            cursor = 0
+        self.job.record_chunk(cursor, len(source_pairs))
+        return len(writer.source_pairs)
+        
+    def run(self, progress: Optional[Callable] = None,
+            cancel_event: Optional[threading.Event] = None,
+            stats: Optional[RunStats] = None,
+            prepared: Optional[PreparedRun] = None) -> GenerationResult:
+        """Tạo quiz note cho toàn bộ deck nguồn"""
+        stats = stats or RunStats()
+        stats.info.update({
+            "source_deck_id": self.source_deck_id,
+            "source_model_id": self.source_model_id,
+            "target_model_id": self.target_model_id,
+            "target_deck_id": self.target_deck_id,
+            "random_count": self.random_count,
+            "seed": self.seed,
+            "skip_existing": self.skip_existing,
+            "bulk_chunk_size": self.config.bulk_chunk_size,
+            "incremental": self.incremental,
+            "refresh_changed": self.refresh_changed,
+            "distractor_strategy": self.distractor_strategy,
+            "prevent_duplicates": self.config.prevent_duplicates,
+            "normalize_rules": ",".join(self.config.normalize_rules),
+            "quiz_format": self.config.quiz_format,
+        })
+        
+        stats.start_profile()
+        try:
+            result = self._run(stats, progress, cancel_event, prepared)
+        finally:
+            stats.stop_profile()
+            stats.finish()
+        
+        result.stats = stats
+        for name in ("total", "created", "skipped", "failed", "refreshed"):
+            stats.counters[name] = getattr(result, name)
+        return result
+    
+    def _run(self, stats: RunStats, progress: Optional[Callable],
+             cancel_event: Optional[threading.Event],
+             prepared: Optional[PreparedRun] = None) -> GenerationResult:
+        col = self.col
+        vocab_field = self.vocab_field
+        meaning_field = self.meaning_field
+        skip_existing = self.skip_existing
+        deck_id = self.target_deck_id
+        quiz_field_name = self.quiz_field_name
+        
+        result = GenerationResult()
+        
+        # Đọc dữ liệu cần thiết (hoặc dùng lại dữ liệu đã đọc khi xem trước)
+        prepared = prepared or self.prepare(stats)
+        new_watermark = prepared.watermark
+        work_note_ids = prepared.note_ids
+        linked = prepared.linked
+        sampler = prepared.sampler
+        result.source_total = prepared.source_total
+        if not prepared.source_total:
+            if self.job is not None:
+                self.job.discard()
+            return result
+        result.total = len(work_note_ids)
+        if not work_note_ids:
+            if new_watermark is not None:
+                save_watermark(col, self.watermark_key, *new_watermark)
+            if self.job is not None:
+                self.job.discard()
+            return result
+            
+        # Gom note mới và ghi theo lô, cả lần chạy là một bước undo
+        writer = self.writer or BulkNoteWriter(col, self.config.bulk_chunk_size)
+        writer.stats = stats
+        written_before, failed_before = writer.written, writer.failed
+        notes_before, pairs_before = len(writer.note_ids), len(writer.source_pairs)
+        committed = written_before + failed_before
+        last_note_id = 0
+        existing_vocabs = set(prepared.existing_vocabs)
+        
+        # Vị trí trường trong note nguồn, tính một lần cho cả lần chạy
+        source_ords = self.models.field_ords(self.source_model_id)
+        vocab_ord = source_ords.get(vocab_field)
+        meaning_ord = source_ords.get(meaning_field)
+        reference_format = self.config.quiz_format == FORMAT_REFERENCE
+        template = self.template
+        plan = self.compile_plan()
+        
+        # Tạo quiz cards, đọc trường thô theo trang thay vì tải từng Note
+        changed_sources: List[Tuple[int, List[str]]] = []
+        note_rows = iter_note_fields(col, work_note_ids)
+        for i, (note_id, _, fields, _) in enumerate(note_rows):
+            if cancel_event is not None and cancel_event.is_set():
+                result.cancelled = True
+                break
+                
+            try:
+                # Note nguồn đã có quiz note: làm mới thay vì tạo thêm
+                if note_id in linked:
+                    if self.refresh_changed:
+                        changed_sources.append((note_id, fields))
+                    else:
+                        result.skipped += 1
+                    continue
+                    
+                vocab = fields[vocab_ord] if vocab_ord is not None else ""
+                meaning = fields[meaning_ord] if meaning_ord is not None else ""
+                
+                if not vocab or not meaning:
+                    result.skipped += 1
+                    continue
+                    
+                # Kiểm tra xem đã có quiz card cho từ vựng này chưa
+                vocab_key = sampler.key_for(note_id, vocab)
+                if skip_existing and vocab_key in existing_vocabs:
+                    result.skipped += 1
+                    continue
+                    
+                # Lấy các note ngẫu nhiên (trừ note hiện tại và note cùng từ vựng)
+                with stats.stage("sampling"):
+                    picked = self.pick_distractors(prepared, note_id, vocab)
+                
+                if picked is None:
+                    # Không đủ note để lấy ngẫu nhiên
+                    result.skipped += 1
+                    continue
+                    
+                with stats.stage("note_construction"):
+                    # Tạo chuỗi quiz (dạng tham chiếu chỉ lưu id note nguồn)
+                    if reference_format:
+                        quiz_content = format_reference((sampler.note_ids[i] for i in picked),
+                                                        vocab_ord, meaning_ord)
+                    else:
+                        quiz_content = template.format(sampler.entries(picked))
+                        
+                    if not quiz_content:
+                        result.failed += 1
+                        continue
+                        
+                    # Tạo note mới: sao chép trường theo plan, thêm dữ liệu quiz và tag để nhận biết
+                    new_note = plan.new_note(fields, quiz_content)
+                
+                # Đưa note vào hàng đợi ghi theo lô
+                writer.add(new_note, deck_id, note_id)
+                result.created += 1
+                
+                # Vừa ghi xong một lô: mọi note đến note_id đã được xử lý
+                if self.job is not None and writer.written + writer.failed != committed:
+                    committed = writer.written + writer.failed
+                    pairs_before = self.commit_chunk(writer, pairs_before, note_id, failed_before)
+                
+                # Thêm vào danh sách từ vựng đã tạo
+                existing_vocabs.add(vocab_key)
+                
+            except Exception as e:
+                result.failed += 1
+                print(f"Error processing note {note_id}: {str(e)}")
+                
+            finally:
+                last_note_id = note_id
+                result.processed = i + 1
+                if progress:
+                    progress(result.processed, result.total, result.created, result.skipped)
+            
+        # Ghi phần note còn lại
+        writer.flush()
+        if self.job is not None and last_note_id:
+            pairs_before = self.commit_chunk(writer, pairs_before, last_note_id, failed_before)
+        result.created = writer.written - written_before
+        result.failed += writer.failed - failed_before
+        created_ids = writer.note_ids[notes_before:]
+        source_pairs = writer.source_pairs[pairs_before:]
+        
+        if changed_sources:
+            with stats.stage("refresh"):
+                try:
+                    result.refreshed = self.refresh_quiz_notes(changed_sources, linked, plan)
+                except Exception as e:
+                    result.failed += len(changed_sources)
+                    print(f"Error refreshing quiz notes: {str(e)}")
+                    
+        # Hủy giữa chừng: giữ lại các note đã ghi hoặc hoàn tác tất cả
+        if result.cancelled and self.config.rollback_on_cancel and created_ids:
+            col.remove_notes(created_ids)
+            if self.job is not None:
+                # Liên kết đã ghi theo từng lô của job cũng bị xóa, không phụ thuộc hook xóa note
+                get_index(col, quiz_field_name).remove_sources(created_ids)
+                self.job.discard()
+            result.rolled_back = result.created
+            result.created = 0
+        else:
+            # Ghi liên kết quiz note → note nguồn cho lần chạy incremental sau, chỉ cho note được giữ
+            if source_pairs:
+                get_index(col, quiz_field_name).record_sources(source_pairs)
+            if not result.cancelled:
+                # Chỉ cập nhật mốc khi chạy xong, lần sau sẽ xử lý lại phần còn thiếu
+                if new_watermark is not None:
+                    save_watermark(col, self.watermark_key, *new_watermark)
+                # Còn lô ghi lỗi: giữ job để Resume thử lại từ lô thành công cuối cùng
+                if self.job is not None and writer.failed == failed_before:
+                    self.job.discard()
+                    
+        result.changes = col.merge_undo_entries(writer.undo_entry)
+        return result
\ No newline at end of file
@@ -0,0 +1,106 @@
+import json
+import os
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+from .config import USER_FILES_DIR
+
+# Mỗi job gồm file tham số (ghi một lần) và nhật ký các lô đã ghi (chỉ ghi thêm)
+JOBS_DIR = os.path.join(USER_FILES_DIR, "jobs")
+
+@dataclass
+class GenerationJob:
+    """Một lần tạo quiz có thể chạy tiếp: tham số, seed và con trỏ trên note id nguồn đã sắp xếp"""
+    job_id: str
+    collection: str
+    # Tham số khởi tạo QuizGenerator (deck, note type, trường, tùy chọn)
+    params: Dict[str, Any]
+    seed: int
+    created: float = field(default_factory=time.time)
+    # Note id nguồn lớn nhất thuộc lô cuối cùng đã ghi
+    cursor: int = 0
+    chunks: int = 0
+    created_notes: int = 0
+    jobs_dir: str = JOBS_DIR
+    
+    @property
+    def path(self) -> str:
+        return os.path.join(self.jobs_dir, f"job_{self.job_id}.json")
+        
+    @property
+    def journal_path(self) -> str:
+        return os.path.join(self.jobs_dir, f"job_{self.job_id}.journal")
+        
+    def save(self):
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        data = {name: value for name, value in asdict(self).items()
+                if name not in ("cursor", "chunks", "created_notes", "jobs_dir")}
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        
+    def record_chunk(self, cursor: int, created_notes: int):
+        """Ghi nhận một lô đã ghi vào collection, dòng nhật ký được fsync trước khi trả về"""
+        self.cursor = max(self.cursor, cursor)
+        self.chunks += 1
+        self.created_notes += created_notes
+        line = json.dumps({"chunk": self.chunks, "cursor": self.cursor,
+                           "notes": created_notes, "time": round(time.time(), 3)})
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        
+    def discard(self):
+        """Xóa job khi đã chạy xong hoặc bị hủy"""
+        for path in (self.path, self.journal_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        
+    def label(self) -> str:
+        started = time.strftime("%Y-%m-%d %H:%M", time.localtime(self.created))
+        return f"{started}: {self.created_notes} quiz notes in {self.chunks} chunks, resume after note {self.cursor}"
+        
+    @classmethod
+    def load(cls, path: str) -> Optional["GenerationJob"]:
+        """Đọc job và nhật ký; dòng cuối ghi dở (khi Anki bị tắt đột ngột) được bỏ qua"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                job = cls(jobs_dir=os.path.dirname(path), **json.load(f))
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Error loading job {path}: {str(e)}")
+            return None
+        try:
+            with open(job.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    job.cursor = max(job.cursor, int(entry["cursor"]))
+                    job.chunks += 1
+                    job.created_notes += int(entry.get("notes", 0))
+        except FileNotFoundError:
+            pass
+        return job
+
+def new_job(collection: str, params: Dict[str, Any], seed: int,
+            jobs_dir: str = JOBS_DIR) -> GenerationJob:
+    """Tạo và lưu job mới trước khi bắt đầu ghi"""
+    job = GenerationJob(job_id=uuid.uuid4().hex[:12], collection=collection,
+                        params=params, seed=seed, jobs_dir=jobs_dir)
+    job.save()
+    return job
+
+def load_jobs(collection: str, jobs_dir: str = JOBS_DIR) -> List[GenerationJob]:
+    """Các job chưa xong của collection, mới nhất trước"""
+    try:
+        names = os.listdir(jobs_dir)
+    except FileNotFoundError:
+        return []
+    jobs = [GenerationJob.load(os.path.join(jobs_dir, name)) for name in names
+            if name.startswith("job_") and name.endswith(".json")]
+    jobs = [job for job in jobs if job is not None and job.collection == collection]
+    return sorted(jobs, key=lambda job: job.created, reverse=True)
\ No newline at end of file
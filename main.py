@@ -2,12 +2,16 @@ from aqt import mw, gui_hooks
 from aqt.browser import Browser
 from aqt.qt import *
 from aqt.utils import showInfo, tooltip
+from anki import hooks
 from anki.notes import Note
 from anki.collection import Collection
 from anki.decks import DeckId
 import random
 import os
-from .dialog import QuizCardCreatorDialog
+from .config import setup_config
+from .queries import first_card_deck_id
+from . import auto_generate, deck_stats, quiz_format, quiz_index, similarity
+from .quiz_index import get_index
 
 # Biến toàn cục để theo dõi menu đã được thêm chưa
 _menu_added = False
@@ -16,6 +20,37 @@ def setup_addon():
     """Thiết lập addon"""
     gui_hooks.browser_menus_did_init.append(add_menu_to_browser)
     
+    # Xóa cache cấu hình khi người dùng sửa cấu hình
+    setup_config()
+    
+    # Giữ chỉ mục từ vựng đã có quiz luôn cập nhật
+    hooks.note_will_be_added.append(quiz_index.on_note_will_be_added)
+    hooks.note_will_flush.append(quiz_index.on_note_will_flush)
+    hooks.notes_will_be_deleted.append(quiz_index.on_notes_will_be_deleted)
+    gui_hooks.operation_did_execute.append(quiz_index.on_operation_did_execute)
+    gui_hooks.sync_did_finish.append(quiz_index.mark_all_stale)
+    gui_hooks.profile_will_close.append(quiz_index.close_indexes)
+    gui_hooks.profile_will_close.append(similarity.clear_cache)
+    
+    # Số note theo note type của deck nguồn, xóa khi note/deck thay đổi
+    hooks.note_will_be_added.append(deck_stats.on_note_will_be_added)
+    hooks.notes_will_be_deleted.append(deck_stats.on_notes_will_be_deleted)
+    gui_hooks.operation_did_execute.append(deck_stats.on_operation_did_execute)
+    gui_hooks.sync_did_finish.append(deck_stats.invalidate_histograms)
+    gui_hooks.profile_will_close.append(deck_stats.invalidate_histograms)
+    gui_hooks.sync_did_finish.append(deck_stats.invalidate_names)
+    gui_hooks.profile_will_close.append(deck_stats.invalidate_names)
+    
+    # Giải quiz dạng tham chiếu khi hiển thị thẻ: {{quiz:Quiz}}
+    hooks.field_filter.append(quiz_format.on_field_filter)
+    
+    # Tự tạo quiz cho note mới trong các deck được theo dõi (auto_generate_profile)
+    gui_hooks.profile_did_open.append(auto_generate.on_profile_did_open)
+    gui_hooks.profile_will_close.append(auto_generate.on_profile_will_close)
+    gui_hooks.operation_did_execute.append(auto_generate.on_operation_did_execute)
+    gui_hooks.sync_did_finish.append(auto_generate.on_sync_did_finish)
+    hooks.notes_will_be_deleted.append(auto_generate.on_notes_will_be_deleted)
+    
     # Thêm vào menu Tools của Anki
     if mw:
         setup_main_menu()
@@ -44,6 +79,11 @@ def add_menu_to_browser(browser: Browser):
     
     _menu_added = True
 
+def create_dialog(col: Collection, deck_id: DeckId, parent) -> QDialog:
+    """Module dialog (và các module chỉ dùng trong dialog) chỉ được import khi mở lần đầu"""
+    from .dialog import QuizCardCreatorDialog
+    return QuizCardCreatorDialog(col, deck_id, parent)
+
 def open_dialog_from_browser(browser: Browser):
     """Mở dialog từ Browser"""
     try:
@@ -51,19 +91,15 @@ def open_dialog_from_browser(browser: Browser):
         selected_nids = browser.selectedNotes()
         
         if selected_nids:
-            # Lấy note đầu tiên để xác định deck
-            note = browser.col.get_note(selected_nids[0])
-            cards = browser.col.db.list("SELECT id FROM cards WHERE nid = ?", note.id)
-            if cards:
-                first_card = browser.col.get_card(cards[0])
-                deck_id = first_card.did
-            else:
+            # Lấy deck của note đầu tiên
+            deck_id = first_card_deck_id(browser.col, selected_nids[0])
+            if not deck_id:
                 deck_id = browser.col.decks.selected()
         else:
             deck_id = browser.col.decks.selected()
         
         # Mở dialog
-        dialog = QuizCardCreatorDialog(browser.col, deck_id, browser)
+        dialog = create_dialog(browser.col, deck_id, browser)
         dialog.exec()
         
     except Exception as e:
@@ -77,34 +113,16 @@ def open_dialog_from_main():
     
     try:
         deck_id = mw.col.decks.selected()
-        dialog = QuizCardCreatorDialog(mw.col, deck_id, mw)
+        dialog = create_dialog(mw.col, deck_id, mw)
         dialog.exec()
         
     except Exception as e:
         showInfo(f"Error: {str(e)}")
 
 def check_for_existing_quiz_cards(col: Collection, vocab: str, deck_id: DeckId, quiz_field_name: str) -> bool:
-    """Kiểm tra xem từ vựng đã có quiz card chưa"""
+    """Kiểm tra xem từ vựng đã có quiz card chưa (giữ lại cho tương thích, dùng has_quiz_for)"""
     try:
-        # Lấy tất cả card trong deck
-        cids = col.decks.cids(deck_id, children=True)
-        if not cids:
-            return False
-        
-        for cid in cids:
-            card = col.get_card(cid)
-            note = col.get_note(card.nid)
-            
-            # Kiểm tra tag quiz_generated
-            if 'tags' in note and 'quiz_generated' in note.tags:
-                # Kiểm tra nội dung quiz field
-                if quiz_field_name in note:
-                    quiz_content = note[quiz_field_name]
-                    # Tìm từ vựng trong quiz content
-                    if f"[{vocab}]" in quiz_content:
-                        return True
-        
-        return False
+        return vocab in get_index(col, quiz_field_name).has_quiz_for([vocab], deck_id)
         
     except Exception as e:
         print(f"Error checking existing quiz cards: {str(e)}")
@@ -0,0 +1,48 @@
+import copy
+from anki.collection import Collection
+from anki.notes import Note
+from anki.utils import guid64
+from typing import List, Tuple
+from .queries import QUIZ_TAG, ModelCache
+
+class FieldMappingPlan:
+    """Cách dựng quiz note từ danh sách trường thô của note nguồn, tính một lần cho cả lần chạy"""
+    
+    def __init__(self, prototype: Note, copies: List[Tuple[int, int]], quiz_ord: int):
+        # Note mẫu của note type đích, mỗi quiz note là một bản sao nên không gọi backend từng note
+        self.prototype = prototype
+        # Các cặp (ord nguồn, ord đích) của trường cùng tên, trừ trường Quiz
+        self.copies = copies
+        self.quiz_ord = quiz_ord
+        self.field_count = len(prototype.fields)
+        
+    def copy_fields(self, fields: List[str], target: List[str]) -> bool:
+        """Chép trường nguồn vào danh sách trường đích, True nếu có trường thay đổi"""
+        modified = False
+        for source_ord, target_ord in self.copies:
+            if source_ord < len(fields) and target_ord < len(target) and target[target_ord] != fields[source_ord]:
+                target[target_ord] = fields[source_ord]
+                modified = True
+        return modified
+        
+    def new_note(self, fields: List[str], quiz_content: str) -> Note:
+        """Quiz note mới (chưa ghi) từ trường của note nguồn"""
+        note = copy.copy(self.prototype)
+        note.guid = guid64()
+        note.fields = [""] * self.field_count
+        self.copy_fields(fields, note.fields)
+        note.fields[self.quiz_ord] = quiz_content
+        note.tags = [QUIZ_TAG]
+        return note
+
+def compile_plan(col: Collection, models: ModelCache, source_model_id: int,
+                 target_model_id: int, quiz_field_name: str) -> FieldMappingPlan:
+    """Dựng plan từ note type nguồn/đích; lỗi nếu note type đích thiếu trường Quiz"""
+    target_model = models.get(target_model_id)
+    target_ords = models.field_ords(target_model_id)
+    if not target_model or quiz_field_name not in target_ords:
+        raise ValueError(f"Note type has no {quiz_field_name} field")
+    source_ords = models.field_ords(source_model_id)
+    copies = [(source_ord, target_ords[name]) for name, source_ord in source_ords.items()
+              if name in target_ords and name != quiz_field_name]
+    return FieldMappingPlan(Note(col, target_model), copies, target_ords[quiz_field_name])
\ No newline at end of file
@@ -0,0 +1,83 @@
+import html
+import re
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+try:
+    from aqt import mw
+except ImportError:
+    mw = None
+
+# Các bước chuẩn hóa có thể bật/tắt trong config (normalize_rules)
+RULE_CLOZE = "cloze"
+RULE_FURIGANA = "furigana"
+RULE_HTML = "html"
+RULE_NFC = "nfc"
+RULE_CASEFOLD = "casefold"
+RULE_WHITESPACE = "whitespace"
+ALL_RULES = (RULE_CLOZE, RULE_FURIGANA, RULE_HTML, RULE_NFC, RULE_CASEFOLD, RULE_WHITESPACE)
+DEFAULT_RULES = ALL_RULES
+
+# Chỉ dùng process pool khi số từ cần chuẩn hóa đủ lớn
+PARALLEL_MIN_TEXTS = 20000
+PARALLEL_CHUNK_SIZE = 5000
+
+# Số kết quả giữ lại, khóa theo (quy tắc, nội dung trường)
+MEMO_SIZE = 200000
+
+_CLOZE_RE = re.compile(r"\{\{c\d+::(.*?)(?:::.*?)?\}\}", re.DOTALL)
+_RUBY_RT_RE = re.compile(r"<rt>.*?</rt>|<rp>.*?</rp>", re.IGNORECASE | re.DOTALL)
+# Cú pháp furigana của Anki: 漢字[かんじ]
+_FURIGANA_RE = re.compile(r" ?([^ >\[]+?)\[(.+?)\]")
+_TAG_RE = re.compile(r"<[^>]*>")
+_SPACE_RE = re.compile(r"\s+")
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _normalize(text: str, rules: Tuple[str, ...]) -> str:
+    if RULE_CLOZE in rules:
+        text = _CLOZE_RE.sub(r"\1", text)
+    if RULE_FURIGANA in rules:
+        text = _RUBY_RT_RE.sub("", text)
+        text = _FURIGANA_RE.sub(r"\1", text)
+    if RULE_HTML in rules:
+        text = html.unescape(_TAG_RE.sub("", text))
+    if RULE_NFC in rules:
+        text = unicodedata.normalize("NFC", text)
+    if RULE_CASEFOLD in rules:
+        text = text.casefold()
+    if RULE_WHITESPACE in rules:
+        text = _SPACE_RE.sub(" ", text)
+    return text.strip()
+
+def normalize_vocab(text: str, rules: Sequence[str] = DEFAULT_RULES) -> str:
+    """Khóa so sánh từ vựng: bỏ cloze/furigana/HTML, chuẩn NFC, không phân biệt hoa thường"""
+    return _normalize(text, tuple(rules))
+
+def _normalize_chunk(args: Tuple[List[str], Tuple[str, ...]]) -> List[str]:
+    texts, rules = args
+    return [_normalize(text, rules) for text in texts]
+
+def _can_use_processes() -> bool:
+    # Trong Anki, sys.executable là chương trình Anki chứ không phải Python nên không tạo process con
+    return mw is None
+
+def normalize_many(texts: Sequence[str], rules: Sequence[str] = DEFAULT_RULES,
+                   workers: Optional[int] = None) -> List[str]:
+    """Chuẩn hóa nhiều từ, mỗi nội dung khác nhau chỉ xử lý một lần"""
+    rules = tuple(rules)
+    unique = list(dict.fromkeys(texts))
+    if len(unique) >= PARALLEL_MIN_TEXTS and _can_use_processes() and workers != 1:
+        chunks = [(unique[i:i + PARALLEL_CHUNK_SIZE], rules)
+                  for i in range(0, len(unique), PARALLEL_CHUNK_SIZE)]
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                normalized = [key for chunk in pool.map(_normalize_chunk, chunks) for key in chunk]
+            mapping = dict(zip(unique, normalized))
+        except (OSError, RuntimeError) as e:
+            print(f"Error starting normalization workers, normalizing in-process: {str(e)}")
+            mapping = {text: _normalize(text, rules) for text in unique}
+    else:
+        mapping = {text: _normalize(text, rules) for text in unique}
+    return [mapping[text] for text in texts]
\ No newline at end of file
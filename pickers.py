@@ -0,0 +1,79 @@
+from aqt.qt import *
+from typing import Dict, List, Optional, Tuple
+from .deck_stats import NameList
+
+class NameListModel(QAbstractListModel):
+    """Model chỉ đọc trên danh sách (tên, id) đã cache, view chỉ lấy các dòng đang hiển thị"""
+    
+    def __init__(self, names: Optional[NameList] = None, parent=None):
+        super().__init__(parent)
+        self.names = names or NameList([])
+        
+    def set_names(self, names: NameList):
+        self.beginResetModel()
+        self.names = names
+        self.endResetModel()
+        
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.names.entries)
+        
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        name, entry_id = self.names.entries[index.row()]
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return name
+        if role == Qt.ItemDataRole.UserRole:
+            return entry_id
+        return None
+
+class NamePicker(QComboBox):
+    """Combo chọn deck/note type: gõ để lọc theo một phần tên, không thêm từng item"""
+    
+    def __init__(self, model: NameListModel, parent=None):
+        super().__init__(parent)
+        self.setEditable(True)
+        self.setInsertPolicy(QComboBox.InsertPolicy.NoInsert)
+        # Không đo độ rộng của mọi tên khi hiển thị
+        self.setSizeAdjustPolicy(QComboBox.SizeAdjustPolicy.AdjustToMinimumContentsLengthWithIcon)
+        self.setMinimumContentsLength(30)
+        self.setModel(model)
+        view = QListView(self)
+        view.setUniformItemSizes(True)
+        self.setView(view)
+        
+        completer = QCompleter(model, self)
+        completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        completer.setFilterMode(Qt.MatchFlag.MatchContains)
+        completer.setCompletionMode(QCompleter.CompletionMode.PopupCompletion)
+        completer.popup().setUniformItemSizes(True)
+        self.setCompleter(completer)
+        # Chữ gõ dở không khớp tên nào: hiện lại mục đang chọn
+        self.lineEdit().editingFinished.connect(self.restore_text)
+        
+    def names(self) -> NameList:
+        return self.model().names
+        
+    def select_id(self, entry_id: Optional[int]) -> bool:
+        row = self.names().row_by_id.get(entry_id)
+        if row is None:
+            return False
+        self.setCurrentIndex(row)
+        return True
+        
+    def set_names(self, names: NameList):
+        """Đổi danh sách, giữ mục đang chọn nếu còn"""
+        current = self.currentData()
+        self.model().set_names(names)
+        if not self.select_id(current):
+            self.setCurrentIndex(0 if names.entries else -1)
+        
+    def restore_text(self):
+        if self.currentIndex() >= 0 and self.currentText() != self.itemText(self.currentIndex()):
+            self.setEditText(self.itemText(self.currentIndex()))
+
+def counted_names(names: NameList, counts: Dict[int, int]) -> NameList:
+    """Note type có note trong deck, kèm số note"""
+    entries: List[Tuple[str, int]] = [(f"{name} ({counts[model_id]:,} notes)", model_id)
+                                      for name, model_id in names.entries if counts.get(model_id)]
+    return NameList(entries)
\ No newline at end of file
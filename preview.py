@@ -0,0 +1,81 @@
+import random
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from .generator import PreparedRun, QuizGenerator
+from .stats import RunStats
+
+# Số dòng tạo thêm mỗi lần cuộn bảng xem trước
+PREVIEW_PAGE_SIZE = 50
+
+STATUS_CREATE = "Create"
+STATUS_REFRESH = "Refresh existing quiz"
+STATUS_MISSING = "Skip: missing vocabulary or meaning"
+STATUS_EXISTING = "Skip: vocabulary already has a quiz"
+STATUS_LINKED = "Skip: source already has a quiz"
+STATUS_POOL = "Skip: not enough notes for distractors"
+
+@dataclass
+class PreviewRow:
+    note_id: int
+    vocab: str
+    meaning: str
+    status: str
+    quiz: str = ""
+
+class QuizPreview:
+    """Xem trước quiz note theo từng trang, chỉ đọc collection"""
+    
+    def __init__(self, generator: QuizGenerator, stats: Optional[RunStats] = None):
+        # Seed cố định để lần ghi thật bốc giống hệt các dòng chưa xem
+        if generator.seed is None:
+            generator.seed = random.SystemRandom().randrange(1 << 31)
+        self.generator = generator
+        self.prepared: PreparedRun = generator.prepare(stats)
+        self.rows: Dict[int, PreviewRow] = {}
+        
+        # Từ vựng lặp lại: chỉ note đầu tiên (theo id) được tạo quiz, giống lần ghi thật
+        self.first_by_vocab: Dict[str, int] = {}
+        sampler = self.prepared.sampler
+        if sampler is not None and generator.skip_existing:
+            work_ids = set(self.prepared.note_ids)
+            for note_id, key in zip(sampler.note_ids, sampler.keys):
+                if note_id in work_ids and note_id not in self.prepared.linked:
+                    self.first_by_vocab.setdefault(key, note_id)
+        
+    def __len__(self) -> int:
+        return len(self.prepared.note_ids) if self.prepared.sampler is not None else 0
+        
+    def row(self, index: int) -> PreviewRow:
+        """Dòng thứ index, chỉ tạo nội dung quiz khi được xem lần đầu"""
+        row = self.rows.get(index)
+        if row is None:
+            row = self.rows[index] = self._build_row(self.prepared.note_ids[index])
+        return row
+        
+    def page(self, start: int, count: int = PREVIEW_PAGE_SIZE) -> List[PreviewRow]:
+        return [self.row(i) for i in range(start, min(start + count, len(self)))]
+        
+    def _build_row(self, note_id: int) -> PreviewRow:
+        generator = self.generator
+        prepared = self.prepared
+        sampler = prepared.sampler
+        position = sampler.index_by_note.get(note_id)
+        vocab = sampler.vocabs[position] if position is not None else ""
+        meaning = sampler.meanings[position] if position is not None else ""
+        
+        if note_id in prepared.linked:
+            status = STATUS_REFRESH if generator.refresh_changed else STATUS_LINKED
+            return PreviewRow(note_id, vocab, meaning, status)
+        if position is None:
+            return PreviewRow(note_id, vocab, meaning, STATUS_MISSING)
+        key = sampler.keys[position]
+        if generator.skip_existing and (key in prepared.existing_vocabs
+                                        or self.first_by_vocab.get(key) != note_id):
+            return PreviewRow(note_id, vocab, meaning, STATUS_EXISTING)
+            
+        picked = generator.pick_distractors(prepared, note_id, vocab)
+        if picked is None:
+            return PreviewRow(note_id, vocab, meaning, STATUS_POOL)
+        # Lần ghi thật dùng đúng các từ gây nhiễu đã hiển thị
+        prepared.assignments[note_id] = picked
+        return PreviewRow(note_id, vocab, meaning, STATUS_CREATE, generator.template.format(sampler.entries(picked)))
\ No newline at end of file
@@ -0,0 +1,88 @@
+from aqt.qt import *
+from typing import Any
+from .preview import PREVIEW_PAGE_SIZE, STATUS_CREATE, QuizPreview
+
+class PreviewTableModel(QAbstractTableModel):
+    """Bảng xem trước tải dần từng trang khi cuộn xuống"""
+    
+    COLUMNS = ["Note ID", "Vocabulary", "Meaning", "Status", "Quiz"]
+    
+    def __init__(self, preview: QuizPreview, parent=None):
+        super().__init__(parent)
+        self.preview = preview
+        self.loaded = 0
+        self.fetchMore(QModelIndex())
+        
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else self.loaded
+        
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.COLUMNS)
+        
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        return not parent.isValid() and self.loaded < len(self.preview)
+        
+    def fetchMore(self, parent: QModelIndex):
+        """Chỉ tạo nội dung quiz cho trang tiếp theo"""
+        if parent.isValid():
+            return
+        count = min(PREVIEW_PAGE_SIZE, len(self.preview) - self.loaded)
+        if count <= 0:
+            return
+        self.preview.page(self.loaded, count)
+        self.beginInsertRows(QModelIndex(), self.loaded, self.loaded + count - 1)
+        self.loaded += count
+        self.endInsertRows()
+        
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        row = self.preview.row(index.row())
+        if role == Qt.ItemDataRole.DisplayRole:
+            return [str(row.note_id), row.vocab, row.meaning, row.status, row.quiz][index.column()]
+        if role == Qt.ItemDataRole.ForegroundRole and row.status != STATUS_CREATE:
+            return QBrush(QColor("gray"))
+        return None
+        
+    def headerData(self, section: int, orientation: Qt.Orientation,
+                   role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+class PreviewDialog(QDialog):
+    """Xem trước quiz note, Commit để ghi đúng nội dung đã xem"""
+    
+    def __init__(self, preview: QuizPreview, parent=None):
+        super().__init__(parent)
+        self.preview = preview
+        self.setWindowTitle("Quiz Card Preview")
+        layout = QVBoxLayout(self)
+        
+        generator = preview.generator
+        layout.addWidget(QLabel(
+            f"{len(preview)} source notes (seed {generator.seed}). "
+            f"Nothing is written until you click Commit."
+        ))
+        
+        self.model = PreviewTableModel(preview, self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.verticalHeader().setVisible(False)
+        layout.addWidget(self.table)
+        
+        button_layout = QHBoxLayout()
+        self.commit_btn = QPushButton("Commit")
+        self.commit_btn.setToolTip("Create the quiz cards exactly as previewed")
+        self.close_btn = QPushButton("Close")
+        button_layout.addStretch()
+        button_layout.addWidget(self.commit_btn)
+        button_layout.addSpacing(10)
+        button_layout.addWidget(self.close_btn)
+        layout.addLayout(button_layout)
+        
+        self.commit_btn.clicked.connect(self.accept)
+        self.close_btn.clicked.connect(self.reject)
+        self.resize(900, 600)
\ No newline at end of file
@@ -0,0 +1,19 @@
+import time
+from typing import Callable
+
+# Khoảng thời gian tối thiểu giữa hai lần cập nhật giao diện (giây)
+DEFAULT_INTERVAL = 0.1
+
+class ThrottledProgress:
+    """Gọi callback tiến trình tối đa một lần mỗi interval giây"""
+    
+    def __init__(self, callback: Callable, interval: float = DEFAULT_INTERVAL):
+        self.callback = callback
+        self.interval = interval
+        self.last_update = 0.0
+        
+    def __call__(self, *args, force: bool = False):
+        now = time.monotonic()
+        if force or now - self.last_update >= self.interval:
+            self.last_update = now
+            self.callback(*args)
\ No newline at end of file
@@ -0,0 +1,174 @@
+from anki.collection import Collection
+from anki.decks import DeckId
+from anki.utils import ids2str, split_fields
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+# Tag đánh dấu các note do addon tạo ra
+QUIZ_TAG = "quiz_generated"
+
+# Số note đọc trong mỗi trang khi duyệt bảng notes
+DEFAULT_PAGE_SIZE = 1000
+
+def deck_ids_with_children(col: Collection, deck_id: DeckId) -> List[DeckId]:
+    """Lấy ID của deck và tất cả deck con"""
+    return list(col.decks.deck_and_child_ids(deck_id))
+
+def deck_note_ids(col: Collection, deck_id: DeckId, model_id: Optional[int] = None) -> List[int]:
+    """Lấy note ID duy nhất trong deck (kèm deck con) bằng một truy vấn SQL"""
+    dids = ids2str(deck_ids_with_children(col, deck_id))
+    query = f"SELECT id FROM notes WHERE id IN (SELECT nid FROM cards WHERE did IN {dids})"
+    args = []
+    if model_id:
+        query += " AND mid = ?"
+        args.append(model_id)
+    query += " ORDER BY id"
+    return col.db.list(query, *args)
+
+def note_type_counts(col: Collection, deck_id: DeckId) -> Dict[int, int]:
+    """Số note theo từng note type trong deck (gồm deck con), một truy vấn GROUP BY"""
+    dids = ids2str(deck_ids_with_children(col, deck_id))
+    return dict(col.db.all(
+        f"SELECT mid, count() FROM notes WHERE id IN (SELECT nid FROM cards WHERE did IN {dids}) "
+        f"GROUP BY mid"
+    ))
+
+def changed_note_ids(col: Collection, deck_id: DeckId, model_id: int,
+                     since_mod: int, since_id: int) -> List[int]:
+    """Lấy note trong deck được thêm hoặc sửa sau mốc (mod, id) của lần chạy trước"""
+    dids = ids2str(deck_ids_with_children(col, deck_id))
+    return col.db.list(
+        f"SELECT id FROM notes WHERE id IN (SELECT nid FROM cards WHERE did IN {dids}) "
+        f"AND mid = ? AND (mod > ? OR id > ?) ORDER BY id",
+        model_id, since_mod, since_id
+    )
+
+def deck_notes_watermark(col: Collection, deck_id: DeckId, model_id: int) -> Tuple[int, int]:
+    """Lấy (mod lớn nhất, id lớn nhất) của các note trong deck"""
+    dids = ids2str(deck_ids_with_children(col, deck_id))
+    max_mod, max_id = col.db.first(
+        f"SELECT coalesce(max(mod), 0), coalesce(max(id), 0) FROM notes "
+        f"WHERE id IN (SELECT nid FROM cards WHERE did IN {dids}) AND mid = ?",
+        model_id
+    )
+    return max_mod, max_id
+
+def iter_tagged_notes(col: Collection, deck_id: Optional[DeckId], tag: str = QUIZ_TAG,
+                      model_id: Optional[int] = None) -> Iterator[Tuple[int, int, str]]:
+    """Duyệt (id, mid, flds) của các note có tag trong deck, không tạo đối tượng Note"""
+    # Cột tags lưu dạng " tag1 tag2 " nên có thể lọc bằng LIKE
+    query = "SELECT id, mid, flds FROM notes WHERE tags LIKE ?"
+    args = [f"% {tag} %"]
+    if deck_id:
+        dids = ids2str(deck_ids_with_children(col, deck_id))
+        query += f" AND id IN (SELECT nid FROM cards WHERE did IN {dids})"
+    if model_id:
+        query += " AND mid = ?"
+        args.append(model_id)
+    for nid, mid, flds in col.db.execute(query, *args):
+        yield nid, mid, flds
+
+def field_ords(col: Collection, model_ids: Iterable[int], field_name: str) -> Dict[int, int]:
+    """Lấy vị trí (ord) của một trường theo từng note type"""
+    ords = {}
+    for model_id in set(model_ids):
+        model = col.models.get(model_id)
+        if not model:
+            continue
+        field_map = col.models.field_map(model)
+        if field_name in field_map:
+            ords[model_id] = field_map[field_name][0]
+    return ords
+
+def get_field(flds: str, field_ord: int) -> str:
+    """Lấy nội dung trường theo vị trí từ chuỗi flds thô"""
+    fields = split_fields(flds)
+    return fields[field_ord] if field_ord < len(fields) else ""
+
+def model_field_ords(col: Collection, model_id: int) -> Dict[str, int]:
+    """Bảng tên trường → vị trí (ord) của một note type"""
+    model = col.models.get(model_id)
+    if not model:
+        return {}
+    return {name: field_ord for name, (field_ord, _) in col.models.field_map(model).items()}
+
+class ModelCache:
+    """Cache note type và vị trí trường, dùng chung giữa nhiều lần chạy/job"""
+    
+    def __init__(self, col: Collection):
+        self.col = col
+        self.models: Dict[int, Dict] = {}
+        self.ords: Dict[int, Dict[str, int]] = {}
+        
+    def get(self, model_id: int) -> Optional[Dict]:
+        if model_id not in self.models:
+            self.models[model_id] = self.col.models.get(model_id)
+        return self.models[model_id]
+        
+    def field_ords(self, model_id: int) -> Dict[str, int]:
+        if model_id not in self.ords:
+            self.ords[model_id] = model_field_ords(self.col, model_id)
+        return self.ords[model_id]
+        
+    def invalidate(self, model_id: Optional[int] = None):
+        """Xóa cache khi note type bị sửa (vd. vừa thêm trường Quiz)"""
+        if model_id is None:
+            self.models.clear()
+            self.ords.clear()
+        else:
+            self.models.pop(model_id, None)
+            self.ords.pop(model_id, None)
+
+def iter_note_fields(col: Collection, note_ids: Sequence[int],
+                     page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[Tuple[int, int, List[str], str]]:
+    """Đọc (id, mid, danh sách trường, tags) theo trang từ bảng notes, không tạo đối tượng Note"""
+    for i in range(0, len(note_ids), page_size):
+        page = note_ids[i:i + page_size]
+        rows = col.db.all(f"SELECT id, mid, flds, tags FROM notes WHERE id IN {ids2str(page)} ORDER BY id")
+        for nid, mid, flds, tags in rows:
+            yield nid, mid, split_fields(flds), tags
+
+def iter_note_records(col: Collection, note_ids: Sequence[int], model_id: int,
+                      vocab_field: str, meaning_field: str,
+                      page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[Tuple[int, str, str]]:
+    """Đọc (id, vocab, meaning) theo trang, bộ nhớ không phụ thuộc kích thước deck"""
+    ords = model_field_ords(col, model_id)
+    vocab_ord = ords.get(vocab_field)
+    meaning_ord = ords.get(meaning_field)
+    for nid, mid, fields, _ in iter_note_fields(col, note_ids, page_size):
+        vocab = fields[vocab_ord] if vocab_ord is not None and vocab_ord < len(fields) else ""
+        meaning = fields[meaning_ord] if meaning_ord is not None and meaning_ord < len(fields) else ""
+        yield nid, vocab, meaning
+
+def iter_quiz_contents(col: Collection, deck_id: Optional[DeckId], quiz_field_name: str,
+                       model_id: Optional[int] = None) -> Iterator[Tuple[int, int, str]]:
+    """Duyệt (note id, mid, nội dung Quiz) của các quiz note trong deck"""
+    ord_cache: Dict[int, Optional[int]] = {}
+    for nid, mid, flds in iter_tagged_notes(col, deck_id, QUIZ_TAG, model_id):
+        if mid not in ord_cache:
+            ord_cache[mid] = field_ords(col, [mid], quiz_field_name).get(mid)
+        field_ord = ord_cache[mid]
+        if field_ord is None:
+            continue
+        yield nid, mid, get_field(flds, field_ord)
+
+def quiz_notes_signature(col: Collection, tag: str = QUIZ_TAG) -> str:
+    """Chữ ký (số lượng, mod lớn nhất) của các quiz note để phát hiện thay đổi"""
+    count, max_mod = col.db.first(
+        "SELECT count(), coalesce(max(mod), 0) FROM notes WHERE tags LIKE ?", f"% {tag} %"
+    )
+    return f"{count}:{max_mod}"
+
+def filter_notes_in_deck(col: Collection, note_ids: Iterable[int], deck_id: DeckId) -> Set[int]:
+    """Lọc các note có thẻ nằm trong deck (kèm deck con)"""
+    note_ids = list(note_ids)
+    if not note_ids:
+        return set()
+    dids = ids2str(deck_ids_with_children(col, deck_id))
+    return set(col.db.list(
+        f"SELECT DISTINCT nid FROM cards WHERE did IN {dids} AND nid IN {ids2str(note_ids)}"
+    ))
+
+def first_card_deck_id(col: Collection, note_id: int) -> Optional[DeckId]:
+    """Lấy deck của thẻ đầu tiên thuộc note"""
+    did = col.db.scalar("SELECT did FROM cards WHERE nid = ? ORDER BY ord LIMIT 1", note_id)
+    return DeckId(did) if did else None
\ No newline at end of file
@@ -0,0 +1,119 @@
+import re
+from anki.collection import Collection
+from functools import lru_cache
+from typing import Iterable, List, Optional, Sequence, Tuple
+from .queries import iter_note_fields
+
+# Cách lưu trường Quiz
+FORMAT_INLINE = "inline"
+FORMAT_REFERENCE = "reference"
+QUIZ_FORMATS = (FORMAT_INLINE, FORMAT_REFERENCE)
+
+# Dạng tham chiếu: qcc1:<ord vocab>:<ord meaning>:<id note nguồn>,<id note nguồn>,...
+REFERENCE_VERSION = "qcc1"
+
+# Filter dùng trong mẫu thẻ: {{quiz:Quiz}} luôn hiển thị theo mẫu quiz_template
+FILTER_NAME = "quiz"
+
+# Mẫu mặc định của một mục quiz và chuỗi ngăn cách giữa các mục
+DEFAULT_ENTRY = "[{vocab}][{meaning}]"
+DEFAULT_SEPARATOR = "|"
+VOCAB_PLACEHOLDER = "{vocab}"
+MEANING_PLACEHOLDER = "{meaning}"
+
+class QuizTemplate:
+    """Mẫu trường Quiz (quiz_template, quiz_separator), dựng sẵn hàm format và regex tách một lần"""
+    
+    def __init__(self, entry: str = DEFAULT_ENTRY, separator: str = DEFAULT_SEPARATOR):
+        if entry.count(VOCAB_PLACEHOLDER) != 1 or entry.count(MEANING_PLACEHOLDER) != 1:
+            raise ValueError(f"Quiz template must contain {VOCAB_PLACEHOLDER} and {MEANING_PLACEHOLDER} once: {entry!r}")
+        if not separator or separator in entry:
+            raise ValueError(f"Invalid quiz separator: {separator!r}")
+        self.entry = entry
+        self.separator = separator
+        # Ngoặc nhọn khác trong mẫu là ký tự thường, không phải chỗ thay thế
+        escaped = entry.replace("{", "{{").replace("}", "}}")
+        self._format_entry = (escaped.replace("{{vocab}}", "{0}")
+                              .replace("{{meaning}}", "{1}").format)
+        pattern = (re.escape(entry)
+                   .replace(re.escape(VOCAB_PLACEHOLDER), "(?P<vocab>.*?)")
+                   .replace(re.escape(MEANING_PLACEHOLDER), "(?P<meaning>.*?)"))
+        self._entry_re = re.compile(pattern, re.DOTALL)
+        
+    @property
+    def key(self) -> str:
+        """Định danh mẫu, lưu trong chỉ mục để dựng lại khi mẫu thay đổi"""
+        return f"{self.entry}\x1f{self.separator}"
+        
+    def format(self, entries: Iterable[Tuple[str, str]]) -> str:
+        fmt = self._format_entry
+        return self.separator.join([fmt(vocab, meaning) for vocab, meaning in entries])
+        
+    def parse(self, content: str) -> List[Tuple[str, str]]:
+        """Các cặp (vocab, meaning), bỏ qua phần sai định dạng"""
+        entries = []
+        for part in content.split(self.separator):
+            match = self._entry_re.fullmatch(part)
+            if match:
+                entries.append((match.group("vocab"), match.group("meaning")))
+        return entries
+        
+    def vocabs(self, content: str) -> List[str]:
+        return [vocab for vocab, _ in self.parse(content)]
+
+@lru_cache(maxsize=16)
+def get_template(entry: str = DEFAULT_ENTRY, separator: str = DEFAULT_SEPARATOR) -> QuizTemplate:
+    """Mẫu đã dựng, dùng chung cho mọi lần chạy cùng cấu hình"""
+    return QuizTemplate(entry, separator)
+
+DEFAULT_TEMPLATE = get_template()
+
+def format_reference(note_ids: Iterable[int], vocab_ord: int, meaning_ord: int) -> str:
+    """Chuỗi quiz dạng tham chiếu, chỉ lưu id của note nguồn"""
+    return f"{REFERENCE_VERSION}:{vocab_ord}:{meaning_ord}:{','.join(str(nid) for nid in note_ids)}"
+
+def parse_reference(content: str) -> Optional[Tuple[int, int, List[int]]]:
+    """(ord vocab, ord meaning, id note nguồn), None nếu không phải dạng tham chiếu"""
+    if not content.startswith(REFERENCE_VERSION + ":"):
+        return None
+    try:
+        _, vocab_ord, meaning_ord, note_ids = content.strip().split(":", 3)
+        return int(vocab_ord), int(meaning_ord), [int(nid) for nid in note_ids.split(",") if nid]
+    except ValueError:
+        return None
+
+def resolve_references(col: Collection, contents: Sequence[str]) -> List[Optional[List[Tuple[str, str]]]]:
+    """Đổi nhiều nội dung dạng tham chiếu thành (vocab, meaning), đọc các note nguồn một lượt"""
+    parsed = [parse_reference(content) for content in contents]
+    wanted = sorted({nid for reference in parsed if reference for nid in reference[2]})
+    fields_by_note = {nid: fields for nid, _, fields, _ in iter_note_fields(col, wanted)}
+    
+    results: List[Optional[List[Tuple[str, str]]]] = []
+    for reference in parsed:
+        if reference is None:
+            results.append(None)
+            continue
+        vocab_ord, meaning_ord, note_ids = reference
+        entries = []
+        for nid in note_ids:
+            fields = fields_by_note.get(nid)
+            # Note nguồn đã bị xóa hoặc note type đã đổi: bỏ qua từ đó
+            if fields is None or max(vocab_ord, meaning_ord) >= len(fields):
+                continue
+            entries.append((fields[vocab_ord], fields[meaning_ord]))
+        results.append(entries)
+    return results
+
+def quiz_entries(col: Collection, content: str,
+                 template: QuizTemplate = DEFAULT_TEMPLATE) -> List[Tuple[str, str]]:
+    """Các cặp (vocab, meaning) của nội dung Quiz ở cả hai dạng"""
+    entries = resolve_references(col, [content])[0]
+    return template.parse(content) if entries is None else entries
+
+def on_field_filter(field_text: str, field_name: str, filter_name: str, ctx) -> str:
+    """Hook field_filter: giải tham chiếu khi hiển thị thẻ"""
+    if filter_name != FILTER_NAME or parse_reference(field_text) is None:
+        return field_text
+    # config import quiz_format nên chỉ import khi hook chạy
+    from .config import get_config
+    return get_config().template().format(quiz_entries(ctx.col(), field_text))
\ No newline at end of file
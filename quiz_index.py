@@ -0,0 +1,403 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from anki.collection import Collection
+from anki.decks import DeckId
+from anki.notes import Note
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+try:
+    from aqt import mw
+except ImportError:
+    mw = None
+from .config import USER_FILES_DIR, get_config
+from .normalize import DEFAULT_RULES, normalize_vocab
+from .quiz_format import DEFAULT_TEMPLATE, QuizTemplate, parse_reference, quiz_entries, resolve_references
+from .queries import QUIZ_TAG, filter_notes_in_deck, iter_quiz_contents, quiz_notes_signature
+
+# Giới hạn số tham số trong một câu lệnh IN (...) của SQLite
+SQL_CHUNK_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quiz_vocab (
+    vocab TEXT NOT NULL,
+    nid INTEGER NOT NULL,
+    mid INTEGER NOT NULL,
+    PRIMARY KEY (vocab, nid)
+);
+CREATE INDEX IF NOT EXISTS ix_quiz_vocab_nid ON quiz_vocab (nid);
+CREATE TABLE IF NOT EXISTS quiz_source (
+    quiz_nid INTEGER PRIMARY KEY,
+    source_nid INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_quiz_source_source ON quiz_source (source_nid);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def index_path(col: Collection) -> str:
+    """Đường dẫn file chỉ mục riêng cho từng collection"""
+    digest = hashlib.sha1(col.path.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(USER_FILES_DIR, f"quiz_index_{digest}.sqlite")
+
+class QuizVocabIndex:
+    """Chỉ mục vocab → quiz note lưu trong file SQLite riêng, cập nhật qua hook"""
+    
+    def __init__(self, col: Collection, quiz_field_name: str, path: Optional[str] = None):
+        self.col = col
+        self.quiz_field_name = quiz_field_name
+        self.path = path or index_path(col)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        # (note, mid, nội dung Quiz) của note mới thêm: chưa có id khi hook chạy, ghi sau mỗi lô
+        # (flush_pending) hoặc ở lần truy vấn sau
+        self.pending_notes: List[Tuple[Note, int, str]] = []
+        # Hook đã sửa chỉ mục nhưng chưa commit, commit một lần khi thao tác kết thúc
+        self.dirty = False
+        # Bảng băm từ vựng đã chuẩn hóa → quiz note, nạp khi tra cứu lần đầu
+        self.memory: Optional[Dict[str, Set[int]]] = None
+        self.normalize_rules: Tuple[str, ...] = DEFAULT_RULES
+        self.template: QuizTemplate = DEFAULT_TEMPLATE
+        
+    def close(self):
+        with self.lock:
+            self.db.commit()
+            self.db.close()
+        
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+        
+    def _set_meta(self, key: str, value: Optional[str]):
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+        
+    def set_normalize_rules(self, rules: Sequence[str]):
+        """Đổi quy tắc chuẩn hóa, bảng băm được nạp lại ở lần tra cứu sau"""
+        rules = tuple(rules)
+        with self.lock:
+            if rules != self.normalize_rules:
+                self.normalize_rules = rules
+                self.memory = None
+        
+    def _key(self, vocab: str) -> str:
+        return normalize_vocab(vocab, self.normalize_rules)
+        
+    def _load_memory(self):
+        memory: Dict[str, Set[int]] = {}
+        for vocab, nid in self.db.execute("SELECT vocab, nid FROM quiz_vocab"):
+            memory.setdefault(self._key(vocab), set()).add(nid)
+        self.memory = memory
+        
+    def _delete_rows(self, nids: List[int]):
+        """Xóa dòng của các note, cập nhật cả bảng băm trong bộ nhớ"""
+        placeholders = ','.join('?' for _ in nids)
+        if self.memory is not None:
+            query = f"SELECT vocab, nid FROM quiz_vocab WHERE nid IN ({placeholders})"
+            for vocab, nid in self.db.execute(query, nids).fetchall():
+                key = self._key(vocab)
+                note_ids = self.memory.get(key)
+                if note_ids is not None:
+                    note_ids.discard(nid)
+                    if not note_ids:
+                        del self.memory[key]
+        self.db.execute(f"DELETE FROM quiz_vocab WHERE nid IN ({placeholders})", nids)
+        
+    def _replace_rows(self, nid: int, mid: int, quiz_content: str):
+        self._delete_rows([nid])
+        vocabs = self._quiz_vocabs(quiz_content)
+        self.db.executemany(
+            "INSERT OR IGNORE INTO quiz_vocab (vocab, nid, mid) VALUES (?, ?, ?)",
+            [(vocab, nid, mid) for vocab in vocabs]
+        )
+        if self.memory is not None:
+            for vocab in vocabs:
+                self.memory.setdefault(self._key(vocab), set()).add(nid)
+        
+    def _quiz_vocabs(self, quiz_content: str) -> List[str]:
+        """Từ vựng trong nội dung Quiz, dạng tham chiếu được giải qua note nguồn"""
+        if parse_reference(quiz_content) is None:
+            return self.template.vocabs(quiz_content)
+        return [vocab for vocab, _ in quiz_entries(self.col, quiz_content, self.template)]
+        
+    def rebuild(self):
+        """Xây lại toàn bộ chỉ mục từ collection"""
+        with self.lock:
+            self.db.execute("DELETE FROM quiz_vocab")
+            rows = []
+            references = []
+            for nid, mid, quiz_content in iter_quiz_contents(self.col, None, self.quiz_field_name):
+                if parse_reference(quiz_content) is None:
+                    rows.extend((vocab, nid, mid) for vocab in self.template.vocabs(quiz_content))
+                else:
+                    references.append((nid, mid, quiz_content))
+            # Quiz dạng tham chiếu: đọc các note nguồn một lượt
+            resolved = resolve_references(self.col, [quiz_content for _, _, quiz_content in references])
+            for (nid, mid, _), entries in zip(references, resolved):
+                rows.extend((vocab, nid, mid) for vocab, _ in entries)
+            self.db.executemany(
+                "INSERT OR IGNORE INTO quiz_vocab (vocab, nid, mid) VALUES (?, ?, ?)", rows
+            )
+            self.pending_notes = []
+            self.memory = None
+            self.dirty = False
+            self._set_meta("quiz_field_name", self.quiz_field_name)
+            self._set_meta("quiz_template", self.template.key)
+            self._set_meta("signature", quiz_notes_signature(self.col))
+            self._set_meta("stale", None)
+            self.db.commit()
+        
+    def mark_stale(self):
+        """Đánh dấu cần xây lại (ví dụ sau khi đồng bộ)"""
+        with self.lock:
+            self._set_meta("stale", "1")
+            self.db.commit()
+        
+    def ensure_current(self):
+        """Đồng bộ chỉ mục trước khi truy vấn"""
+        with self.lock:
+            self._flush_pending()
+            signature = quiz_notes_signature(self.col)
+            
+            # Chữ ký chỉ được cập nhật khi thao tác có hook kết thúc (commit_changes);
+            # thay đổi không qua hook (vd. import .apkg) luôn làm chữ ký lệch và dựng lại
+            if (self._get_meta("stale") or self._get_meta("signature") != signature
+                    or self._get_meta("quiz_field_name") != self.quiz_field_name
+                    or (self._get_meta("quiz_template") or DEFAULT_TEMPLATE.key) != self.template.key):
+                self.rebuild()
+        
+    def _flush_pending(self):
+        remaining = []
+        for entry in self.pending_notes:
+            note, mid, quiz_content = entry
+            if not note.id:
+                remaining.append(entry)
+                continue
+            self._replace_rows(note.id, mid, quiz_content)
+            self.dirty = True
+        self.pending_notes = remaining
+        
+    def flush_pending(self):
+        """Ghi dòng cho các note vừa được gán id, không giữ Note tới hết thao tác"""
+        with self.lock:
+            self._flush_pending()
+        
+    def commit_changes(self):
+        """Sau một thao tác: commit các thay đổi từ hook và ghi nhận chữ ký mới"""
+        with self.lock:
+            self._flush_pending()
+            if not self.dirty:
+                return
+            self._set_meta("signature", quiz_notes_signature(self.col))
+            self.db.commit()
+            self.dirty = False
+        
+    def _quiz_content(self, note: Note) -> str:
+        return note[self.quiz_field_name] if self.quiz_field_name in note else ""
+        
+    def on_note_added(self, note: Note):
+        """Hook: note sắp được thêm"""
+        if QUIZ_TAG in note.tags:
+            with self.lock:
+                self.pending_notes.append((note, note.mid, self._quiz_content(note)))
+        
+    def on_note_flushed(self, note: Note):
+        """Hook: note sắp được lưu sau khi sửa"""
+        if not note.id:
+            return
+        with self.lock:
+            if QUIZ_TAG in note.tags:
+                self._replace_rows(note.id, note.mid, self._quiz_content(note))
+            elif self.db.execute("SELECT 1 FROM quiz_vocab WHERE nid = ? LIMIT 1", (note.id,)).fetchone():
+                # Note vừa bị gỡ tag quiz
+                self._delete_rows([note.id])
+            else:
+                # Không phải quiz note (phần lớn các lần lưu): không chạm vào chỉ mục
+                return
+            self.dirty = True
+        
+    def on_notes_deleted(self, note_ids: Iterable[int]):
+        """Hook: các note sắp bị xóa"""
+        note_ids = list(note_ids)
+        with self.lock:
+            # Note vừa thêm trong cùng thao tác rồi bị xóa (vd. hoàn tác khi hủy): không ghi dòng cho chúng
+            deleted = set(note_ids)
+            self.pending_notes = [entry for entry in self.pending_notes if entry[0].id not in deleted]
+            for i in range(0, len(note_ids), SQL_CHUNK_SIZE):
+                chunk = note_ids[i:i + SQL_CHUNK_SIZE]
+                placeholders = ','.join('?' for _ in chunk)
+                self._delete_rows(chunk)
+                self.db.execute(f"DELETE FROM quiz_source WHERE quiz_nid IN ({placeholders})", chunk)
+            self.dirty = True
+        
+    def lookup(self, vocabs: Iterable[str], model_id: Optional[int] = None) -> Dict[str, Set[int]]:
+        """Tra cứu quiz note chứa từng từ vựng"""
+        self.ensure_current()
+        vocabs = list(set(vocabs))
+        result: Dict[str, Set[int]] = {}
+        with self.lock:
+            for i in range(0, len(vocabs), SQL_CHUNK_SIZE):
+                chunk = vocabs[i:i + SQL_CHUNK_SIZE]
+                placeholders = ','.join('?' for _ in chunk)
+                query = f"SELECT vocab, nid FROM quiz_vocab WHERE vocab IN ({placeholders})"
+                args: List = list(chunk)
+                if model_id:
+                    query += " AND mid = ?"
+                    args.append(model_id)
+                for vocab, nid in self.db.execute(query, args):
+                    result.setdefault(vocab, set()).add(nid)
+        return result
+        
+    def record_sources(self, pairs: Iterable[Tuple[int, int]]):
+        """Ghi liên kết (quiz note, note nguồn) cho các quiz note vừa tạo"""
+        with self.lock:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO quiz_source (quiz_nid, source_nid) VALUES (?, ?)", pairs
+            )
+            self.db.commit()
+        
+    def remove_sources(self, quiz_nids: Iterable[int]):
+        """Xóa liên kết của các quiz note (vd. khi hoàn tác lần chạy bị hủy)"""
+        quiz_nids = list(quiz_nids)
+        with self.lock:
+            for i in range(0, len(quiz_nids), SQL_CHUNK_SIZE):
+                chunk = quiz_nids[i:i + SQL_CHUNK_SIZE]
+                placeholders = ','.join('?' for _ in chunk)
+                self.db.execute(f"DELETE FROM quiz_source WHERE quiz_nid IN ({placeholders})", chunk)
+            self.db.commit()
+        
+    def quiz_notes_for_sources(self, source_nids: Iterable[int]) -> Dict[int, List[int]]:
+        """Lấy các quiz note được tạo từ từng note nguồn"""
+        source_nids = list(source_nids)
+        result: Dict[int, List[int]] = {}
+        with self.lock:
+            for i in range(0, len(source_nids), SQL_CHUNK_SIZE):
+                chunk = source_nids[i:i + SQL_CHUNK_SIZE]
+                placeholders = ','.join('?' for _ in chunk)
+                query = f"SELECT source_nid, quiz_nid FROM quiz_source WHERE source_nid IN ({placeholders})"
+                for source_nid, quiz_nid in self.db.execute(query, chunk):
+                    result.setdefault(source_nid, []).append(quiz_nid)
+        return result
+        
+    def vocabs_with_quiz(self, vocabs: Iterable[str], deck_id: Optional[DeckId] = None,
+                         model_id: Optional[int] = None) -> Set[str]:
+        """Lấy các từ vựng đã có quiz note, chi phí theo số từ cần kiểm tra"""
+        matches = self.lookup(vocabs, model_id)
+        if not deck_id or not matches:
+            return set(matches)
+            
+        # Chỉ kiểm tra deck cho các note khớp, không quét cả deck đích
+        all_nids = set().union(*matches.values())
+        in_deck = filter_notes_in_deck(self.col, all_nids, deck_id)
+        return {vocab for vocab, nids in matches.items() if nids & in_deck}
+        
+    def _notes_of_model(self, nids: Iterable[int], model_id: int) -> Set[int]:
+        """Lọc các quiz note thuộc note type, theo cột mid đã lưu trong chỉ mục"""
+        nids = list(nids)
+        result: Set[int] = set()
+        with self.lock:
+            for i in range(0, len(nids), SQL_CHUNK_SIZE):
+                chunk = nids[i:i + SQL_CHUNK_SIZE]
+                placeholders = ','.join('?' for _ in chunk)
+                query = f"SELECT DISTINCT nid FROM quiz_vocab WHERE mid = ? AND nid IN ({placeholders})"
+                result.update(nid for (nid,) in self.db.execute(query, [model_id] + chunk))
+        return result
+        
+    def has_quiz_for(self, vocabs: Iterable[str], deck_id: Optional[DeckId] = None,
+                     model_id: Optional[int] = None) -> Set[str]:
+        """Các từ vựng đã có quiz note (so sánh sau chuẩn hóa), tra trong bộ nhớ"""
+        self.ensure_current()
+        hits: Dict[str, Set[int]] = {}
+        with self.lock:
+            if self.memory is None:
+                self._load_memory()
+            for vocab in vocabs:
+                note_ids = self.memory.get(self._key(vocab))
+                if note_ids:
+                    hits[vocab] = set(note_ids)
+        if model_id and hits:
+            # Quiz note thuộc note type khác không tính là trùng
+            of_model = self._notes_of_model(set().union(*hits.values()), model_id)
+            hits = {vocab: note_ids & of_model for vocab, note_ids in hits.items() if note_ids & of_model}
+        if not deck_id or not hits:
+            return set(hits)
+            
+        # Chỉ kiểm tra deck cho các note khớp
+        in_deck = filter_notes_in_deck(self.col, set().union(*hits.values()), deck_id)
+        return {vocab for vocab, note_ids in hits.items() if note_ids & in_deck}
+
+_indexes: Dict[str, QuizVocabIndex] = {}
+
+def get_index(col: Collection, quiz_field_name: str,
+              normalize_rules: Optional[Sequence[str]] = None,
+              template: Optional[QuizTemplate] = None) -> QuizVocabIndex:
+    """Lấy chỉ mục của collection, tạo mới nếu chưa có"""
+    index = _indexes.get(col.path)
+    if index is None or index.col is not col:
+        if index is not None:
+            index.close()
+        index = QuizVocabIndex(col, quiz_field_name)
+        _indexes[col.path] = index
+    index.quiz_field_name = quiz_field_name
+    if normalize_rules is not None:
+        index.set_normalize_rules(normalize_rules)
+    if template is not None:
+        # Đổi mẫu: chỉ mục được dựng lại ở lần truy vấn sau (ensure_current)
+        index.template = template
+    return index
+
+def has_quiz_for(vocabs: Iterable[str], col: Optional[Collection] = None,
+                 deck_id: Optional[DeckId] = None, model_id: Optional[int] = None) -> Set[str]:
+    """API công khai cho add-on/script khác: các từ vựng đã có quiz note"""
+    col = col or (mw.col if mw is not None else None)
+    if col is None:
+        return set()
+    config = get_config()
+    index = get_index(col, config.quiz_field_name, config.normalize_rules, config.template())
+    return index.has_quiz_for(vocabs, deck_id, model_id)
+
+def close_indexes():
+    """Đóng tất cả chỉ mục (khi đóng profile)"""
+    for index in _indexes.values():
+        index.close()
+    _indexes.clear()
+
+def _index_for(col: Optional[Collection]) -> Optional[QuizVocabIndex]:
+    if col is None:
+        return None
+    index = _indexes.get(col.path)
+    return index if index is not None and index.col is col else None
+
+def on_note_will_be_added(col: Collection, note: Note, deck_id: DeckId):
+    index = _index_for(col)
+    if index:
+        index.on_note_added(note)
+
+def on_note_will_flush(note: Note):
+    index = _index_for(note.col)
+    if index:
+        index.on_note_flushed(note)
+
+def flush_pending(col: Collection):
+    """Sau mỗi lần add_notes: ghi dòng chỉ mục cho các quiz note vừa thêm"""
+    index = _index_for(col)
+    if index:
+        index.flush_pending()
+
+def on_notes_will_be_deleted(col: Collection, note_ids):
+    index = _index_for(col)
+    if index:
+        index.on_notes_deleted(note_ids)
+
+def on_operation_did_execute(changes, handler):
+    """Hook: commit chỉ mục một lần cho mỗi thao tác thay vì mỗi note"""
+    for index in _indexes.values():
+        index.commit_changes()
+
+def mark_all_stale():
+    for index in _indexes.values():
+        index.mark_stale()
\ No newline at end of file
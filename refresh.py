@@ -0,0 +1,177 @@
+import threading
+from dataclasses import dataclass, field
+from anki.collection import Collection, OpChanges
+from anki.utils import split_fields
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from .generator import QuizGenerator
+from .queries import QUIZ_TAG, deck_note_ids, iter_note_fields, iter_tagged_notes
+from .quiz_index import get_index
+from .stats import RunStats
+
+REFRESH_UNDO_LABEL = "Refresh Quiz Cards"
+
+@dataclass
+class RefreshResult:
+    """Kết quả làm mới quiz note"""
+    total: int = 0
+    processed: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    unmatched: int = 0
+    failed: int = 0
+    cancelled: bool = False
+    seconds: float = 0.0
+    changes: OpChanges = field(default_factory=OpChanges)
+    stats: Optional[RunStats] = None
+
+def current_meaning(meanings_by_vocab: Dict[str, Set[str]], vocab: str, meaning: str) -> str:
+    """Nghĩa mới của một mục quiz: chỉ thay khi từ vựng có đúng một nghĩa và nghĩa cũ không còn"""
+    meanings = meanings_by_vocab.get(vocab)
+    if not meanings or meaning in meanings or len(meanings) != 1:
+        # Từ đồng hình (nhiều note cùng từ vựng, khác nghĩa): không biết mục thuộc note nào
+        return meaning
+    return next(iter(meanings))
+
+class QuizRefresher:
+    """Cập nhật quiz note đã có theo note nguồn, chỉ ghi các note thay đổi"""
+    
+    def __init__(self, generator: QuizGenerator):
+        self.generator = generator
+        self.col: Collection = generator.col
+        
+    def run(self, progress: Optional[Callable] = None,
+            cancel_event: Optional[threading.Event] = None,
+            stats: Optional[RunStats] = None) -> RefreshResult:
+        stats = stats or RunStats()
+        stats.info.update({
+            "operation": "refresh",
+            "source_deck_id": self.generator.source_deck_id,
+            "source_model_id": self.generator.source_model_id,
+            "target_model_id": self.generator.target_model_id,
+            "target_deck_id": self.generator.target_deck_id,
+        })
+        stats.start_profile()
+        try:
+            result = self._run(stats, progress, cancel_event)
+        finally:
+            stats.stop_profile()
+            stats.finish()
+            
+        result.stats = stats
+        result.seconds = stats.total_time
+        for name in ("total", "updated", "unchanged", "unmatched", "failed"):
+            stats.counters[name] = getattr(result, name)
+        return result
+        
+    def _run(self, stats: RunStats, progress: Optional[Callable],
+             cancel_event: Optional[threading.Event]) -> RefreshResult:
+        col = self.col
+        generator = self.generator
+        result = RefreshResult()
+        
+        target_ords = generator.models.field_ords(generator.target_model_id)
+        if generator.quiz_field_name not in target_ords:
+            return result
+        # Các cặp (ord nguồn, ord đích) của trường được sao chép sang quiz note
+        plan = generator.compile_plan()
+        copy_plan = plan.copies
+        quiz_ord = plan.quiz_ord
+        template = generator.template
+        source_ords = generator.models.field_ords(generator.source_model_id)
+        vocab_ord = source_ords.get(generator.vocab_field)
+        meaning_ord = source_ords.get(generator.meaning_field)
+        target_vocab_ord = target_ords.get(generator.vocab_field)
+        
+        # Giá trị cần sao chép của từng note nguồn và nghĩa hiện tại của từng từ vựng
+        copied: Dict[int, List[str]] = {}
+        meanings_by_vocab: Dict[str, Set[str]] = {}
+        source_by_vocab: Dict[str, int] = {}
+        with stats.stage("source_scan"):
+            source_ids = deck_note_ids(col, generator.source_deck_id, generator.source_model_id)
+            for nid, _, fields, _ in iter_note_fields(col, source_ids):
+                copied[nid] = [fields[source_ord] if source_ord < len(fields) else ""
+                               for source_ord, _ in copy_plan]
+                vocab = fields[vocab_ord] if vocab_ord is not None and vocab_ord < len(fields) else ""
+                meaning = fields[meaning_ord] if meaning_ord is not None and meaning_ord < len(fields) else ""
+                if vocab and meaning:
+                    meanings_by_vocab.setdefault(vocab, set()).add(meaning)
+                    source_by_vocab.setdefault(vocab, nid)
+            
+        # Liên kết quiz note → note nguồn đã ghi khi tạo, thiếu thì khớp theo từ vựng
+        index = get_index(col, generator.quiz_field_name)
+        with stats.stage("link_lookup"):
+            quiz_to_source = {quiz_nid: source_nid
+                              for source_nid, quiz_nids in index.quiz_notes_for_sources(source_ids).items()
+                              for quiz_nid in quiz_nids}
+        new_links: List[Tuple[int, int]] = []
+        
+        # Chỉ giữ (quiz note id, {ord: giá trị mới}) của các note cần sửa
+        pending: List[Tuple[int, Dict[int, str]]] = []
+        with stats.stage("diff"):
+            quiz_rows = list(iter_tagged_notes(col, generator.target_deck_id, QUIZ_TAG,
+                                               generator.target_model_id))
+            result.total = len(quiz_rows)
+            for quiz_nid, _, flds in quiz_rows:
+                fields = split_fields(flds)
+                source_nid = quiz_to_source.get(quiz_nid)
+                if source_nid is None and target_vocab_ord is not None and target_vocab_ord < len(fields):
+                    source_nid = source_by_vocab.get(fields[target_vocab_ord])
+                    if source_nid is not None:
+                        new_links.append((quiz_nid, source_nid))
+                if source_nid is None or source_nid not in copied:
+                    result.unmatched += 1
+                    continue
+                    
+                updates: Dict[int, str] = {}
+                for (_, target_ord), value in zip(copy_plan, copied[source_nid]):
+                    if target_ord < len(fields) and fields[target_ord] != value:
+                        updates[target_ord] = value
+                # Giữ nguyên từ gây nhiễu, chỉ cập nhật nghĩa đã sửa
+                quiz_content = fields[quiz_ord] if quiz_ord < len(fields) else ""
+                entries = template.parse(quiz_content)
+                refreshed = template.format((vocab, current_meaning(meanings_by_vocab, vocab, meaning))
+                                            for vocab, meaning in entries)
+                if entries and refreshed != quiz_content:
+                    updates[quiz_ord] = refreshed
+                    
+                if updates:
+                    pending.append((quiz_nid, updates))
+                else:
+                    result.unchanged += 1
+        stats.counters["pending_updates"] = len(pending)
+        
+        if new_links:
+            index.record_sources(new_links)
+            
+        if not pending:
+            result.processed = result.total
+            return result
+            
+        # Ghi theo lô, cả lần làm mới là một bước undo
+        undo_entry = col.add_custom_undo_entry(REFRESH_UNDO_LABEL)
+        chunk_size = generator.config.bulk_chunk_size
+        for start in range(0, len(pending), chunk_size):
+            if cancel_event is not None and cancel_event.is_set():
+                result.cancelled = True
+                break
+            chunk = pending[start:start + chunk_size]
+            try:
+                with stats.stage("db_writes"):
+                    notes = []
+                    for quiz_nid, updates in chunk:
+                        note = col.get_note(quiz_nid)
+                        for target_ord, value in updates.items():
+                            note.fields[target_ord] = value
+                        notes.append(note)
+                    col.update_notes(notes)
+                    col.merge_undo_entries(undo_entry)
+                result.updated += len(chunk)
+            except Exception as e:
+                result.failed += len(chunk)
+                print(f"Error refreshing quiz notes: {str(e)}")
+            result.processed = result.unchanged + result.unmatched + result.updated + result.failed
+            if progress:
+                progress(result.processed, result.total, result.updated, result.unchanged)
+            
+        result.changes = col.merge_undo_entries(undo_entry)
+        return result
\ No newline at end of file
@@ -0,0 +1,286 @@
+import random
+from collections import Counter
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+from .similarity import get_similarity_index
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Cách chọn từ gây nhiễu
+STRATEGY_RANDOM = "random"
+STRATEGY_SIMILAR = "similar"
+STRATEGY_BALANCED = "balanced"
+DISTRACTOR_STRATEGIES = (STRATEGY_RANDOM, STRATEGY_SIMILAR, STRATEGY_BALANCED)
+
+# Số lần bốc lại tối đa cho mỗi vị trí trước khi chuyển sang lọc tuần tự
+MAX_REJECTIONS = 32
+
+class DistractorSampler:
+    """Bốc từ gây nhiễu ngẫu nhiên từ pool (note id, vocab, meaning) dạng mảng"""
+    
+    def __init__(self, records: Iterable[Tuple[int, str, str]], rng: Optional[random.Random] = None,
+                 normalizer: Optional[Callable[[List[str]], List[str]]] = None):
+        self.rng = rng or random.Random()
+        self.normalizer = normalizer
+        self.note_ids: List[int] = []
+        self.vocabs: List[str] = []
+        self.meanings: List[str] = []
+        
+        for note_id, vocab, meaning in records:
+            # Chỉ giữ các note có đủ từ vựng và nghĩa
+            if vocab and meaning:
+                self.note_ids.append(note_id)
+                self.vocabs.append(vocab)
+                self.meanings.append(meaning)
+            
+        # Khóa so sánh "cùng từ vựng": từ vựng đã chuẩn hóa nếu có normalizer
+        self.keys: List[str] = normalizer(self.vocabs) if normalizer else self.vocabs
+        self.vocab_counts = Counter(self.vocabs)
+        self.key_counts = Counter(self.keys) if normalizer else self.vocab_counts
+        self.index_by_note: Dict[int, int] = {nid: i for i, nid in enumerate(self.note_ids)}
+        
+    def __len__(self) -> int:
+        return len(self.note_ids)
+        
+    def extend(self, records: Iterable[Tuple[int, str, str]]) -> int:
+        """Thêm note mới vào pool đã dựng, trả về vị trí đầu tiên được thêm"""
+        start = len(self.note_ids)
+        for note_id, vocab, meaning in records:
+            if vocab and meaning and note_id not in self.index_by_note:
+                self.index_by_note[note_id] = len(self.note_ids)
+                self.note_ids.append(note_id)
+                self.vocabs.append(vocab)
+                self.meanings.append(meaning)
+        new_vocabs = self.vocabs[start:]
+        self.vocab_counts.update(new_vocabs)
+        if self.normalizer:
+            # Không có normalizer thì keys và key_counts chính là vocabs và vocab_counts
+            new_keys = self.normalizer(new_vocabs)
+            self.keys.extend(new_keys)
+            self.key_counts.update(new_keys)
+        return start
+        
+    def key_for(self, note_id: int, vocab: str) -> str:
+        """Khóa so sánh của từ vựng, dùng lại khóa đã tính nếu note nằm trong pool"""
+        position = self.index_by_note.get(note_id)
+        if position is not None and self.vocabs[position] == vocab:
+            return self.keys[position]
+        return self.normalizer([vocab])[0] if self.normalizer else vocab
+        
+    def available_count(self, note_id: int, key: str) -> int:
+        """Số note có thể dùng làm từ gây nhiễu cho note hiện tại"""
+        count = len(self.note_ids) - self.key_counts.get(key, 0)
+        own_index = self.index_by_note.get(note_id)
+        if own_index is not None and self.keys[own_index] != key:
+            count -= 1
+        return count
+        
+    def _is_valid(self, index: int, note_id: int, key: str) -> bool:
+        return self.note_ids[index] != note_id and self.keys[index] != key
+        
+    def _fill(self, picked: List[int], note_id: int, key: str, k: int,
+              rng: Optional[random.Random] = None):
+        """Bổ sung chỉ số còn thiếu bằng cách bốc lại, lọc tuần tự nếu pool quá dày đặc"""
+        rng = rng or self.rng
+        size = len(self.note_ids)
+        chosen = set(picked)
+        rejections = 0
+        while len(picked) < k and rejections < MAX_REJECTIONS:
+            index = int(rng.random() * size)
+            if index in chosen or not self._is_valid(index, note_id, key):
+                rejections += 1
+                continue
+            chosen.add(index)
+            picked.append(index)
+            
+        if len(picked) < k:
+            # Hiếm gặp: phần lớn pool trùng từ vựng, lọc toàn bộ để chắc chắn đủ
+            candidates = [i for i in range(size)
+                          if i not in chosen and self._is_valid(i, note_id, key)]
+            picked.extend(rng.sample(candidates, k - len(picked)))
+        
+    def sample(self, note_id: int, vocab: str, k: int,
+               rng: Optional[random.Random] = None) -> Optional[List[int]]:
+        """Bốc k chỉ số từ gây nhiễu cho một note, None nếu không đủ note"""
+        key = self.key_for(note_id, vocab)
+        if self.available_count(note_id, key) < k:
+            return None
+        picked: List[int] = []
+        self._fill(picked, note_id, key, k, rng)
+        return picked
+        
+    def sample_all(self, queries: Sequence[Tuple[int, str]], k: int) -> List[Optional[List[int]]]:
+        """Bốc từ gây nhiễu cho cả deck trong một lượt"""
+        size = len(self.note_ids)
+        if size == 0:
+            return [None] * len(queries)
+            
+        # Sinh trước toàn bộ chỉ số ngẫu nhiên, sau đó chỉ sửa các vị trí bị loại
+        draws = self.rng.choices(range(size), k=len(queries) * k)
+        results: List[Optional[List[int]]] = []
+        for row, (note_id, vocab) in enumerate(queries):
+            key = self.key_for(note_id, vocab)
+            if self.available_count(note_id, key) < k:
+                results.append(None)
+                continue
+            picked = []
+            chosen = set()
+            for index in draws[row * k:(row + 1) * k]:
+                if index not in chosen and self._is_valid(index, note_id, key):
+                    chosen.add(index)
+                    picked.append(index)
+            if len(picked) < k:
+                self._fill(picked, note_id, key, k)
+            results.append(picked)
+        return results
+        
+    def entries(self, indices: Iterable[int]) -> List[Tuple[str, str]]:
+        """Lấy (vocab, meaning) theo danh sách chỉ số"""
+        return [(self.vocabs[i], self.meanings[i]) for i in indices]
+
+class SimilarDistractorSampler(DistractorSampler):
+    """Chọn từ gây nhiễu có cách viết gần giống từ vựng, thiếu thì bốc ngẫu nhiên"""
+    
+    def __init__(self, records: Iterable[Tuple[int, str, str]], rng: Optional[random.Random] = None,
+                 normalizer: Optional[Callable[[List[str]], List[str]]] = None,
+                 cache_key: Optional[Hashable] = None):
+        super().__init__(records, rng, normalizer)
+        self.positions_by_key: Dict[str, List[int]] = {}
+        for i, key in enumerate(self.keys):
+            self.positions_by_key.setdefault(key, []).append(i)
+        # Chỉ mục LSH dựng một lần cho cả lần chạy, dùng lại nếu deck không đổi
+        self.index = get_similarity_index(cache_key, self.positions_by_key)
+        # Chỉ mục lấy từ cache được các lần chạy khác dùng chung, không sửa trực tiếp
+        self.index_shared = cache_key is not None
+        
+    def extend(self, records: Iterable[Tuple[int, str, str]]) -> int:
+        start = super().extend(records)
+        if start < len(self.keys) and self.index_shared:
+            self.index = self.index.copy()
+            self.index_shared = False
+        for i in range(start, len(self.keys)):
+            key = self.keys[i]
+            self.positions_by_key.setdefault(key, []).append(i)
+            self.index.add(key)
+        return start
+        
+    def sample(self, note_id: int, vocab: str, k: int,
+               rng: Optional[random.Random] = None) -> Optional[List[int]]:
+        key = self.key_for(note_id, vocab)
+        if self.available_count(note_id, key) < k:
+            return None
+        rng = rng or self.rng
+        picked: List[int] = []
+        for similar_key in self.index.similar(key):
+            candidates = [i for i in self.positions_by_key.get(similar_key, ())
+                          if self.note_ids[i] != note_id]
+            if not candidates:
+                continue
+            picked.append(candidates[0] if len(candidates) == 1 else rng.choice(candidates))
+            if len(picked) >= k:
+                return picked
+        self._fill(picked, note_id, key, k, rng)
+        return picked
+        
+    def sample_all(self, queries: Sequence[Tuple[int, str]], k: int) -> List[Optional[List[int]]]:
+        return [self.sample(note_id, vocab, k) for note_id, vocab in queries]
+
+class BalancedDistractorSampler(DistractorSampler):
+    """Phân công từ gây nhiễu cho cả deck một lần, mỗi note được dùng làm từ gây nhiễu đúng k lần"""
+    
+    def __init__(self, records: Iterable[Tuple[int, str, str]], rng: Optional[random.Random] = None,
+                 normalizer: Optional[Callable[[List[str]], List[str]]] = None):
+        super().__init__(records, rng, normalizer)
+        # k → từ gây nhiễu của từng vị trí trong pool
+        self.assignments: Dict[int, List[Optional[List[int]]]] = {}
+        
+    def assign_all(self, k: int) -> List[Optional[List[int]]]:
+        """Từ gây nhiễu của mọi note trong pool, tính một lần cho mỗi k"""
+        rows = self.assignments.get(k)
+        if rows is None:
+            rows = self.assignments[k] = self._assign(k)
+        return rows
+        
+    def _assign(self, k: int) -> List[Optional[List[int]]]:
+        size = len(self.note_ids)
+        if size <= k:
+            return [None] * size
+        # Hoán vị bằng random của Python: cùng seed cho cùng kết quả dù có NumPy hay không
+        order = list(range(size))
+        self.rng.shuffle(order)
+        
+        # Note thứ i trong hoán vị nhận các note i+1..i+k: không tự trùng, mỗi note dùng đúng k lần
+        if np is not None:
+            rows, conflicts = self._shift_numpy(order, k)
+        else:
+            rows, conflicts = self._shift_python(order, k)
+            
+        # Sửa các dòng có từ gây nhiễu cùng từ vựng với note
+        for position in conflicts:
+            note_id, key = self.note_ids[position], self.keys[position]
+            if self.available_count(note_id, key) < k:
+                rows[position] = None
+                continue
+            picked = [i for i in rows[position] if self.keys[i] != key]
+            self._fill(picked, note_id, key, k)
+            rows[position] = picked
+        return rows
+        
+    def _shift_numpy(self, order: List[int], k: int) -> Tuple[List[List[int]], List[int]]:
+        order = np.asarray(order, dtype=np.int64)
+        rows = np.empty((len(order), k), dtype=np.int64)
+        rows[order] = np.stack([np.roll(order, -shift) for shift in range(1, k + 1)], axis=1)
+        codes = self._key_codes()
+        conflicts = np.nonzero((codes[rows] == codes[:, None]).any(axis=1))[0]
+        return rows.tolist(), conflicts.tolist()
+        
+    def _shift_python(self, order: List[int], k: int) -> Tuple[List[List[int]], List[int]]:
+        size = len(order)
+        rows: List[List[int]] = [[]] * size
+        conflicts = []
+        keys = self.keys
+        for i, position in enumerate(order):
+            row = [order[(i + shift) % size] for shift in range(1, k + 1)]
+            rows[position] = row
+            key = keys[position]
+            if any(keys[index] == key for index in row):
+                conflicts.append(position)
+        conflicts.sort()
+        return rows, conflicts
+        
+    def _key_codes(self):
+        """Mã số nguyên của khóa từ vựng, để so sánh trên mảng"""
+        codes: Dict[str, int] = {}
+        return np.fromiter((codes.setdefault(key, len(codes)) for key in self.keys),
+                           dtype=np.int64, count=len(self.keys))
+        
+    def sample(self, note_id: int, vocab: str, k: int,
+               rng: Optional[random.Random] = None) -> Optional[List[int]]:
+        position = self.index_by_note.get(note_id)
+        if position is None or self.vocabs[position] != vocab:
+            # Note ngoài pool: bốc ngẫu nhiên như bình thường
+            return super().sample(note_id, vocab, k, rng)
+        row = self.assign_all(k)[position]
+        return list(row) if row is not None else None
+        
+    def extend(self, records: Iterable[Tuple[int, str, str]]) -> int:
+        start = super().extend(records)
+        if len(self.note_ids) > start:
+            # Pool đổi: phân công lại ở lần bốc sau
+            self.assignments = {}
+        return start
+        
+    def sample_all(self, queries: Sequence[Tuple[int, str]], k: int) -> List[Optional[List[int]]]:
+        return [self.sample(note_id, vocab, k) for note_id, vocab in queries]
+
+def make_sampler(records: Iterable[Tuple[int, str, str]], rng: Optional[random.Random] = None,
+                 strategy: str = STRATEGY_RANDOM, cache_key: Optional[Hashable] = None,
+                 normalizer: Optional[Callable[[List[str]], List[str]]] = None) -> DistractorSampler:
+    """Tạo sampler theo cách chọn từ gây nhiễu"""
+    if strategy == STRATEGY_SIMILAR:
+        return SimilarDistractorSampler(records, rng, normalizer, cache_key)
+    if strategy == STRATEGY_BALANCED:
+        return BalancedDistractorSampler(records, rng, normalizer)
+    return DistractorSampler(records, rng, normalizer)
\ No newline at end of file
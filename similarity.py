@@ -0,0 +1,147 @@
+import random
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+# Độ dài n-gram ký tự dùng để so sánh cách viết
+NGRAM_SIZE = 3
+
+# MinHash LSH: LSH_BANDS dải, mỗi dải LSH_ROWS giá trị băm
+LSH_BANDS = 8
+LSH_ROWS = 2
+
+# Số ứng viên tối đa được chấm điểm cho mỗi truy vấn
+MAX_CANDIDATES = 300
+
+# Số chỉ mục giữ lại giữa các lần chạy
+MAX_CACHED_INDEXES = 4
+
+_PRIME = (1 << 61) - 1
+_params_rng = random.Random(NGRAM_SIZE)
+# Hệ số (a, b) cố định để chữ ký giống nhau giữa các lần chạy
+_HASH_PARAMS = [(_params_rng.randrange(1, _PRIME), _params_rng.randrange(0, _PRIME))
+                for _ in range(LSH_BANDS * LSH_ROWS)]
+
+def char_ngrams(text: str) -> Set[str]:
+    """Tập n-gram ký tự của từ (không phân biệt hoa thường, có đệm hai đầu)"""
+    padded = f" {text.strip().casefold()} "
+    if len(padded) <= NGRAM_SIZE:
+        return {padded}
+    return {padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)}
+
+def gram_hashes(gram: str) -> Tuple[int, ...]:
+    h = zlib.crc32(gram.encode("utf-8"))
+    return tuple((a * h + b) % _PRIME for a, b in _HASH_PARAMS)
+
+def minhash_signature(grams: Iterable[str], memo: Optional[Dict[str, Tuple[int, ...]]] = None) -> List[int]:
+    """Chữ ký MinHash, memo giữ giá trị băm của n-gram đã gặp (n-gram lặp lại rất nhiều)"""
+    if memo is None:
+        memo = {}
+    rows = []
+    for gram in grams:
+        hashes = memo.get(gram)
+        if hashes is None:
+            hashes = memo[gram] = gram_hashes(gram)
+        rows.append(hashes)
+    return [min(column) for column in zip(*rows)]
+
+class SimilarityIndex:
+    """Chỉ mục MinHash LSH trên n-gram ký tự, tìm từ có cách viết gần giống"""
+    
+    def __init__(self, vocabs: Iterable[str]):
+        self.vocabs: List[str] = []
+        self.grams: List[Set[str]] = []
+        self.band_keys: List[List[Tuple[int, ...]]] = []
+        self.position: Dict[str, int] = {}
+        self.buckets: List[Dict[Tuple[int, ...], List[int]]] = [{} for _ in range(LSH_BANDS)]
+        self.gram_memo: Dict[str, Tuple[int, ...]] = {}
+        
+        for vocab in vocabs:
+            self.add(vocab)
+        
+    def add(self, vocab: str):
+        """Thêm một từ vào chỉ mục, bỏ qua nếu đã có"""
+        if vocab in self.position:
+            return
+        grams = char_ngrams(vocab)
+        keys = self._band_keys(minhash_signature(grams, self.gram_memo))
+        index = len(self.vocabs)
+        self.position[vocab] = index
+        self.vocabs.append(vocab)
+        self.grams.append(grams)
+        self.band_keys.append(keys)
+        for band, key in enumerate(keys):
+            self.buckets[band].setdefault(key, []).append(index)
+        
+    def copy(self) -> "SimilarityIndex":
+        """Bản sao độc lập, dùng khi cần thêm từ vào chỉ mục đang được cache dùng chung"""
+        other = SimilarityIndex(())
+        other.vocabs = list(self.vocabs)
+        other.grams = list(self.grams)
+        other.band_keys = list(self.band_keys)
+        other.position = dict(self.position)
+        other.buckets = [{key: list(indices) for key, indices in bucket.items()} for bucket in self.buckets]
+        other.gram_memo = dict(self.gram_memo)
+        return other
+        
+    def __len__(self) -> int:
+        return len(self.vocabs)
+        
+    @staticmethod
+    def _band_keys(signature: List[int]) -> List[Tuple[int, ...]]:
+        return [tuple(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]) for band in range(LSH_BANDS)]
+        
+    def similar(self, vocab: str, limit: int = MAX_CANDIDATES) -> List[str]:
+        """Các từ khác gần giống vocab, sắp theo độ tương đồng Jaccard giảm dần"""
+        own = self.position.get(vocab)
+        if own is not None:
+            grams = self.grams[own]
+            keys = self.band_keys[own]
+        else:
+            grams = char_ngrams(vocab)
+            keys = self._band_keys(minhash_signature(grams, self.gram_memo))
+            
+        # Chỉ xét các từ chung ít nhất một dải, không so với toàn bộ pool;
+        # dừng ngay khi đủ limit ứng viên (một dải có thể chứa hàng nghìn từ)
+        candidates: Set[int] = set()
+        for band, key in enumerate(keys):
+            for index in self.buckets[band].get(key, ()):
+                if index != own:
+                    candidates.add(index)
+                    if len(candidates) >= limit:
+                        break
+            if len(candidates) >= limit:
+                break
+            
+        scored = []
+        for index in candidates:
+            other = self.grams[index]
+            scored.append((len(grams & other) / len(grams | other), index))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [self.vocabs[index] for _, index in scored[:limit]]
+
+# Chỉ mục đã dựng, dùng lại khi deck nguồn không thay đổi
+_cache: "OrderedDict[Hashable, SimilarityIndex]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+def get_similarity_index(key: Optional[Hashable], vocabs: Iterable[str]) -> SimilarityIndex:
+    """Lấy chỉ mục theo khóa (deck, note type, mốc thay đổi), dựng mới nếu chưa có"""
+    if key is None:
+        return SimilarityIndex(vocabs)
+    with _cache_lock:
+        index = _cache.get(key)
+        if index is not None:
+            _cache.move_to_end(key)
+            return index
+    index = SimilarityIndex(vocabs)
+    with _cache_lock:
+        _cache[key] = index
+        while len(_cache) > MAX_CACHED_INDEXES:
+            _cache.popitem(last=False)
+    return index
+
+def clear_cache():
+    """Xóa các chỉ mục đã cache (khi đóng profile)"""
+    with _cache_lock:
+        _cache.clear()
\ No newline at end of file
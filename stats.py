@@ -0,0 +1,124 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+from typing import Dict, List, Optional
+from .config import USER_FILES_DIR
+
+# Thư mục lưu báo cáo thống kê và số báo cáo giữ lại
+REPORTS_DIR = os.path.join(USER_FILES_DIR, "run_reports")
+MAX_REPORTS = 20
+
+# Số hàm hiển thị trong kết quả cProfile
+PROFILE_LINES = 30
+
+class _StageTimer:
+    """Context manager cộng dồn thời gian vào một bước"""
+    
+    __slots__ = ("stats", "name", "start")
+    
+    def __init__(self, stats: "RunStats", name: str):
+        self.stats = stats
+        self.name = name
+        self.start = 0.0
+        
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+        
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.stats.timings[self.name] = self.stats.timings.get(self.name, 0.0) + elapsed
+        self.stats.calls[self.name] = self.stats.calls.get(self.name, 0) + 1
+        return False
+
+class RunStats:
+    """Thời gian và bộ đếm cho từng bước của một lần tạo quiz"""
+    
+    def __init__(self, profile: bool = False):
+        self.timings: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {}
+        self.info: Dict[str, object] = {}
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.profiler = cProfile.Profile() if profile else None
+        self.profile_text = ""
+        # Thống kê riêng của từng lần chạy con (vd. từng job của batch)
+        self.children: List["RunStats"] = []
+        
+    def stage(self, name: str) -> _StageTimer:
+        """Đo thời gian một bước, gọi nhiều lần sẽ cộng dồn"""
+        return _StageTimer(self, name)
+        
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+        
+    def add_child(self, child: "RunStats"):
+        """Cộng dồn thời gian và bộ đếm của một lần chạy con, giữ báo cáo riêng của nó"""
+        for name, seconds in child.timings.items():
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+        for name, calls in child.calls.items():
+            self.calls[name] = self.calls.get(name, 0) + calls
+        for name, value in child.counters.items():
+            self.count(name, value)
+        self.children.append(child)
+        
+    def start_profile(self):
+        if self.profiler:
+            self.profiler.enable()
+        
+    def stop_profile(self):
+        """Dừng cProfile và lưu các hàm tốn thời gian nhất"""
+        if not self.profiler:
+            return
+        self.profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_LINES)
+        self.profile_text = out.getvalue()
+        
+    def finish(self):
+        self.finished = time.time()
+        
+    @property
+    def total_time(self) -> float:
+        return (self.finished or time.time()) - self.started
+        
+    def to_dict(self) -> Dict:
+        return {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "total_seconds": round(self.total_time, 4),
+            "stages": {name: {"seconds": round(seconds, 4), "calls": self.calls.get(name, 0)}
+                       for name, seconds in self.timings.items()},
+            "counters": dict(self.counters),
+            "info": dict(self.info),
+            "profile": self.profile_text,
+            "runs": [child.to_dict() for child in self.children],
+        }
+        
+    def summary_lines(self) -> List[str]:
+        """Các dòng tóm tắt để hiển thị trong dialog/CLI"""
+        lines = [f"Total: {self.total_time:.3f}s"]
+        for name, seconds in self.timings.items():
+            lines.append(f"  {name}: {seconds:.3f}s ({self.calls.get(name, 0)} calls)")
+        for name, value in self.counters.items():
+            lines.append(f"  {name}: {value}")
+        return lines
+        
+    def save_report(self, directory: str = REPORTS_DIR) -> str:
+        """Lưu báo cáo JSON vào user_files và xóa báo cáo cũ"""
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(self.started))
+        path = os.path.join(directory, f"run_{stamp}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+            
+        reports = sorted(name for name in os.listdir(directory) if name.startswith("run_"))
+        for name in reports[:-MAX_REPORTS]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+        return path
\ No newline at end of file
@@ -0,0 +1,33 @@
+import pytest
+
+pytest.importorskip("anki")
+
+from ..jobs import GenerationJob, load_jobs, new_job
+
+def test_journal_skips_torn_last_line(tmp_path):
+    job = new_job("collection.anki2", {"source_deck_id": 1}, seed=7, jobs_dir=str(tmp_path))
+    job.record_chunk(120, 50)
+    job.record_chunk(250, 40)
+    # Anki bị tắt khi đang ghi dòng thứ ba
+    with open(job.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"chunk": 3, "cursor": 9')
+        
+    loaded = GenerationJob.load(job.path)
+    assert loaded.cursor == 250
+    assert loaded.chunks == 2
+    assert loaded.created_notes == 90
+    assert loaded.seed == 7
+    assert loaded.params == {"source_deck_id": 1}
+
+def test_failed_chunk_keeps_cursor(tmp_path):
+    job = new_job("collection.anki2", {}, seed=1, jobs_dir=str(tmp_path))
+    job.record_chunk(100, 10)
+    job.record_chunk(0, 5)
+    assert GenerationJob.load(job.path).cursor == 100
+
+def test_load_jobs_filters_collection_and_discard(tmp_path):
+    kept = new_job("a.anki2", {}, seed=1, jobs_dir=str(tmp_path))
+    new_job("b.anki2", {}, seed=2, jobs_dir=str(tmp_path))
+    assert [job.job_id for job in load_jobs("a.anki2", str(tmp_path))] == [kept.job_id]
+    kept.discard()
+    assert load_jobs("a.anki2", str(tmp_path)) == []
\ No newline at end of file
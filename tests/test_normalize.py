@@ -0,0 +1,34 @@
+import pytest
+from ..normalize import (RULE_CASEFOLD, RULE_CLOZE, RULE_FURIGANA, RULE_HTML, RULE_NFC,
+                         RULE_WHITESPACE, normalize_many, normalize_vocab)
+
+@pytest.mark.parametrize("text, expected", [
+    ("<b>Cat</b>", "cat"),
+    ("  big   cat\n", "big cat"),
+    ("{{c1::猫::animal}}", "猫"),
+    ("{{c2::dog}}", "dog"),
+    ("漢字[かんじ]", "漢字"),
+    ("<ruby>猫<rt>ねこ</rt></ruby>", "猫"),
+    ("café", "café"),
+    ("Tom &amp; Jerry", "tom & jerry"),
+    ("STRASSE", "strasse"),
+])
+def test_default_rules(text, expected):
+    assert normalize_vocab(text) == expected
+
+@pytest.mark.parametrize("rules, text, expected", [
+    ((RULE_HTML,), "<i>Cat</i>", "Cat"),
+    ((RULE_CASEFOLD,), "<i>Cat</i>", "<i>cat</i>"),
+    ((RULE_WHITESPACE,), "a \t b", "a b"),
+    ((RULE_CLOZE,), "{{c1::Cat}}", "Cat"),
+    ((RULE_FURIGANA,), "猫[ねこ]", "猫"),
+    ((RULE_NFC,), "é", "é"),
+    ((), "  <b>Cat</b>  ", "<b>Cat</b>"),
+])
+def test_single_rules(rules, text, expected):
+    assert normalize_vocab(text, rules) == expected
+
+def test_normalize_many_keeps_order_and_duplicates():
+    texts = ["<b>Cat</b>", "dog", "CAT", "dog"]
+    assert normalize_many(texts, workers=1) == ["cat", "dog", "cat", "dog"]
+    assert normalize_many(texts, (RULE_HTML,), workers=1) == ["Cat", "dog", "CAT", "dog"]
\ No newline at end of file
@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip("anki")
+
+from ..quiz_format import QuizTemplate, format_reference, parse_reference
+
+ENTRIES = [("猫", "cat"), ("dog", "chó"), ("a [b]", "{x}")]
+
+@pytest.mark.parametrize("entry, separator", [
+    ("[{vocab}][{meaning}]", "|"),
+    ("{vocab} = {meaning}", ";;"),
+    ("<b>{vocab}</b>: {meaning}", "\n"),
+])
+def test_template_round_trip(entry, separator):
+    template = QuizTemplate(entry, separator)
+    content = template.format(ENTRIES)
+    assert template.parse(content) == ENTRIES
+    assert template.vocabs(content) == [vocab for vocab, _ in ENTRIES]
+
+def test_default_template_format():
+    assert QuizTemplate().format([("猫", "cat"), ("犬", "dog")]) == "[猫][cat]|[犬][dog]"
+
+def test_parse_skips_malformed_parts():
+    assert QuizTemplate().parse("[猫][cat]|broken|[犬][dog]") == [("猫", "cat"), ("犬", "dog")]
+
+@pytest.mark.parametrize("entry, separator", [
+    ("{vocab}", "|"),
+    ("{vocab}{vocab}{meaning}", "|"),
+    ("[{vocab}]|[{meaning}]", "|"),
+    ("[{vocab}][{meaning}]", ""),
+])
+def test_invalid_templates(entry, separator):
+    with pytest.raises(ValueError):
+        QuizTemplate(entry, separator)
+
+def test_reference_round_trip():
+    content = format_reference([11, 22, 33], 0, 1)
+    assert parse_reference(content) == (0, 1, [11, 22, 33])
+    assert parse_reference("[猫][cat]") is None
\ No newline at end of file
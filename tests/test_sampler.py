@@ -0,0 +1,58 @@
+import random
+from collections import Counter
+import pytest
+from ..normalize import normalize_many
+from ..sampler import BalancedDistractorSampler
+
+def make_records(size, duplicates=0):
+    """Pool (note id, vocab, meaning); duplicates note cuối trùng từ vựng (khác hoa thường) với note đầu"""
+    records = [(1000 + i, f"word{i}", f"meaning {i}") for i in range(size)]
+    for i in range(duplicates):
+        records[size - 1 - i] = (1000 + size - 1 - i, f"WORD{i}", f"meaning {size - 1 - i}")
+    return records
+
+def test_balanced_no_self_match():
+    sampler = BalancedDistractorSampler(make_records(200, duplicates=20), random.Random(7), normalize_many)
+    rows = sampler.assign_all(3)
+    for position, row in enumerate(rows):
+        assert row is not None and len(row) == 3
+        assert position not in row
+        assert len(set(row)) == 3
+        # Không lấy note cùng từ vựng (sau chuẩn hóa) làm từ gây nhiễu
+        assert all(sampler.keys[i] != sampler.keys[position] for i in row)
+
+@pytest.mark.parametrize("k", [1, 3, 5])
+def test_balanced_uses_each_note_exactly_k_times(k):
+    sampler = BalancedDistractorSampler(make_records(101), random.Random(1))
+    usage = Counter(i for row in sampler.assign_all(k) for i in row)
+    assert set(usage.values()) == {k}
+    assert len(usage) == 101
+
+def test_balanced_pool_too_small():
+    sampler = BalancedDistractorSampler(make_records(3), random.Random(1))
+    assert sampler.assign_all(3) == [None, None, None]
+
+def test_balanced_seed_is_reproducible():
+    records = make_records(500, duplicates=10)
+    first = BalancedDistractorSampler(records, random.Random(42), normalize_many).assign_all(4)
+    second = BalancedDistractorSampler(records, random.Random(42), normalize_many).assign_all(4)
+    other = BalancedDistractorSampler(records, random.Random(43), normalize_many).assign_all(4)
+    assert first == second
+    assert first != other
+
+def test_balanced_sample_matches_assignment():
+    sampler = BalancedDistractorSampler(make_records(50), random.Random(3))
+    rows = sampler.assign_all(3)
+    note_id, vocab = sampler.note_ids[10], sampler.vocabs[10]
+    assert sampler.sample(note_id, vocab, 3) == rows[10]
+
+def test_numpy_and_python_shift_agree():
+    pytest.importorskip("numpy")
+    sampler = BalancedDistractorSampler(make_records(300, duplicates=30), random.Random(5), normalize_many)
+    order = list(range(len(sampler)))
+    random.Random(9).shuffle(order)
+    for k in (1, 3, 6):
+        rows_np, conflicts_np = sampler._shift_numpy(order, k)
+        rows_py, conflicts_py = sampler._shift_python(order, k)
+        assert rows_np == rows_py
+        assert conflicts_np == conflicts_py
\ No newline at end of file
@@ -0,0 +1,72 @@
+from anki.collection import AddNoteRequest, Collection, OpChanges
+from anki.decks import DeckId
+from anki.notes import Note
+from typing import List, Optional, Tuple
+from .quiz_index import flush_pending
+from .stats import RunStats
+
+# Số note mặc định cho mỗi lần gọi add_notes
+DEFAULT_CHUNK_SIZE = 500
+
+# Tên bước undo cho một lần tạo quiz
+UNDO_LABEL = "Create Quiz Cards"
+
+class BulkNoteWriter:
+    """Gom note mới và ghi theo lô qua col.add_notes, gộp thành một bước undo"""
+    
+    def __init__(self, col: Collection, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 undo_label: str = UNDO_LABEL, stats: Optional[RunStats] = None):
+        self.col = col
+        self.stats = stats
+        self.chunk_size = max(1, int(chunk_size))
+        self.pending: List[AddNoteRequest] = []
+        self.pending_sources: List[Optional[int]] = []
+        self.written = 0
+        self.note_ids: List[int] = []
+        # Cặp (quiz note id, note nguồn) của các note đã ghi thành công
+        self.source_pairs: List[Tuple[int, int]] = []
+        self.failed = 0
+        self.last_error: Optional[Exception] = None
+        self.changes = OpChanges()
+        # Mọi lô ghi sau đó được gộp vào bước undo này
+        self.undo_entry = col.add_custom_undo_entry(undo_label)
+        
+    def add(self, note: Note, deck_id: DeckId, source_id: Optional[int] = None):
+        """Thêm note vào hàng đợi, tự ghi khi đủ một lô"""
+        self.pending.append(AddNoteRequest(note=note, deck_id=deck_id))
+        self.pending_sources.append(source_id)
+        if len(self.pending) >= self.chunk_size:
+            self.flush()
+        
+    def flush(self):
+        """Ghi các note đang chờ trong một lần gọi backend"""
+        if not self.pending:
+            return
+        requests, self.pending = self.pending, []
+        sources, self.pending_sources = self.pending_sources, []
+        try:
+            if self.stats:
+                with self.stats.stage("db_writes"):
+                    self._write(requests)
+            else:
+                self._write(requests)
+            self.written += len(requests)
+            self.note_ids.extend(request.note.id for request in requests)
+            self.source_pairs.extend((request.note.id, source_id)
+                                     for request, source_id in zip(requests, sources)
+                                     if source_id is not None)
+        except Exception as e:
+            self.failed += len(requests)
+            self.last_error = e
+            print(f"Error adding notes: {str(e)}")
+        
+    def _write(self, requests: List[AddNoteRequest]):
+        self.col.add_notes(requests)
+        self.changes = self.col.merge_undo_entries(self.undo_entry)
+        # Note đã có id: chỉ mục quiz không cần giữ Note của cả lần chạy
+        flush_pending(self.col)
+    
+    def finish(self) -> OpChanges:
+        """Ghi phần còn lại và trả về thay đổi của cả lần chạy"""
+        self.flush()
+        return self.changes
\ No newline at end of file